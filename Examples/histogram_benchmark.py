@@ -0,0 +1,60 @@
+# Timing of Scientific.Statistics.Histogram.Histogram and
+# WeightedHistogram compared to the former implementation, which
+# compared each data point to every bin index.
+#
+# Usage: python histogram_benchmark.py [number_of_points [number_of_bins]]
+#
+# The defaults are 10**6 points and 10**4 bins. The former
+# implementation is timed on the first 10**5 points only and
+# its time is extrapolated linearly.
+#
+
+from Scientific.Statistics.Histogram import Histogram, WeightedHistogram
+from Scientific import N
+import sys, time
+
+class OldHistogram(Histogram):
+
+    def addData(self, data):
+        n = (len(data)+999)/1000
+        for i in range(n):
+            self._addData(data[1000*i:1000*(i+1)])
+
+    def _addData(self, data):
+        data = N.array(data, N.Float)
+        data = N.repeat(data, N.logical_and(N.less_equal(data, self.max),
+                                            N.greater_equal(data, self.min)))
+        data = N.floor((data - self.min)/self.bin_width).astype(N.Int)
+        nbins = self.array.shape[0]
+        histo = N.int_sum(N.equal(N.arange(nbins)[:,N.NewAxis], data), -1)
+        histo[-1] = histo[-1] + N.int_sum(N.equal(nbins, data))
+        self.array[:, 1] =  self.array[:, 1] + histo
+
+n = 10**6
+nbins = 10**4
+if len(sys.argv) > 1:
+    n = int(sys.argv[1])
+if len(sys.argv) > 2:
+    nbins = int(sys.argv[2])
+nold = min(n, 10**5)
+
+data = N.sin(N.arange(n)*0.7)**3
+weights = N.cos(N.arange(n)*0.3)**2
+print "%d points, %d bins" % (n, nbins)
+
+start = time.time()
+old = OldHistogram(data[:nold], nbins, (-1., 1.))
+t_old = (time.time()-start)*n/nold
+print "Former implementation: %.1f s (extrapolated)" % t_old
+
+start = time.time()
+h = Histogram(data, nbins, (-1., 1.))
+t_new = time.time()-start
+print "Histogram: %.3f s, speedup %.0f" % (t_new, t_old/t_new)
+
+start = time.time()
+h = WeightedHistogram(data, weights, nbins, (-1., 1.))
+print "WeightedHistogram: %.3f s" % (time.time()-start)
+
+h = Histogram(data[:nold], nbins, (-1., 1.))
+print "Identical counts:", N.alltrue(h.getBinCounts() == old.getBinCounts())
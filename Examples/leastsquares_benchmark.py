@@ -0,0 +1,43 @@
+# Timing of Scientific.Functions.LeastSquares.leastSquaresFit with
+# data given as a list of points (one model call per point) and
+# as arrays (one vectorized model call per iteration).
+#
+# Usage: python leastsquares_benchmark.py [number_of_points]
+#
+# The default number of points is 20000.
+#
+
+from Scientific.Functions.LeastSquares import leastSquaresFit
+from Scientific import N
+import sys, time
+
+def model(param, t):
+    return param[0]*N.exp(-param[1]*t) + param[2]
+
+def jacobian(param, t):
+    e = N.exp(-param[1]*t)
+    return N.transpose(N.array([e, -param[0]*t*e, N.ones(t.shape)]))
+
+n = 20000
+if len(sys.argv) > 1:
+    n = int(sys.argv[1])
+
+t = N.arange(n)*(5./n)
+noise = 0.01*N.sin(1000.*t)
+y = 2.*N.exp(-1.5*t) + 0.3 + noise
+sigma = 0.01 + 0.*t
+initial = (1., 1., 0.)
+print "%d data points" % n
+
+start = time.time()
+result = leastSquaresFit(model, initial, zip(t, y, sigma))
+print "List of points: %.2f s" % (time.time()-start), result
+
+start = time.time()
+result = leastSquaresFit(model, initial, (t, y, sigma), vectorized=True)
+print "Arrays, automatic derivatives: %.3f s" % (time.time()-start), result
+
+start = time.time()
+result = leastSquaresFit(model, initial, (t, y, sigma), vectorized=True,
+                         jacobian=jacobian)
+print "Arrays, explicit Jacobian: %.3f s" % (time.time()-start), result
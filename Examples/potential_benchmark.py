@@ -0,0 +1,59 @@
+# Timing of a Lennard-Jones potential with gradients for many
+# particles, using Scientific.Physics.Potential.ArrayPotential
+# for all pairs at once and PotentialWithGradients pair by pair.
+#
+# Usage: python potential_benchmark.py [number_of_particles]
+#
+# The default number of particles is 10000. The pairs within a
+# cutoff of 2.5 sigma are obtained from a neighbor list.
+#
+
+from Scientific.Physics.Potential import ArrayPotential, \
+     PotentialWithGradients
+from Scientific.Geometry.NeighborList import NeighborList
+from Scientific.Geometry import Vector
+from Scientific import N
+import sys, time
+
+def lennardJones(r1, r2, epsilon, sigma):
+    s6 = (sigma*sigma/((r2-r1)*(r2-r1)))**3
+    return 4.*epsilon*(s6*s6-s6)
+
+n = 10000
+if len(sys.argv) > 1:
+    n = int(sys.argv[1])
+
+# Particles on a perturbed cubic lattice at liquid density
+m = int(round(n**(1./3.)+0.5))
+grid = N.indices((m, m, m))
+positions = 1.1*N.reshape(N.transpose(grid, (1, 2, 3, 0)), (-1, 3))[:n]
+positions = positions + 0.05*N.sin(N.arange(3*n)*1.7).reshape((n, 3))
+positions = positions.astype(N.Float)
+
+start = time.time()
+pairs = NeighborList(positions, 2.5).pairs()
+print "%d particles, %d pairs, neighbor list: %.2f s" \
+      % (n, len(pairs), time.time()-start)
+
+potential = ArrayPotential(lennardJones)
+start = time.time()
+energy, gradients = potential(positions, pairs, 1., 1.)
+print "ArrayPotential: %.2f s, energy %.6f" % (time.time()-start, energy)
+
+pair_potential = PotentialWithGradients(lennardJones)
+npairs = min(len(pairs), 2000)
+start = time.time()
+energy = 0.
+for i, j in pairs[:npairs]:
+    e, g = pair_potential(Vector(positions[i]), Vector(positions[j]),
+                          1., 1.)
+    energy = energy + e
+elapsed = time.time()-start
+print "PotentialWithGradients: %.2f s for %d pairs, " % (elapsed, npairs) \
+      + "estimated %.0f s for all pairs" % (elapsed*len(pairs)/npairs)
+
+potential = ArrayPotential(lennardJones, 'sparse')
+start = time.time()
+energy, gradients, (indices, blocks) = potential(positions, pairs, 1., 1.)
+print "ArrayPotential with sparse force constants: %.2f s, %d blocks" \
+      % (time.time()-start, len(blocks))
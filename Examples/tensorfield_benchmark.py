@@ -0,0 +1,41 @@
+# Timing and peak memory of the derivative operators of
+# Scientific.Geometry.TensorAnalysis.VectorField
+#
+# Usage: python tensorfield_benchmark.py [grid_size]
+#
+# The default grid size is 256, i.e. a field of 256**3 vectors.
+# The peak memory is the maximum resident set size of the process
+# as reported by the operating system.
+#
+
+from Scientific.Geometry.TensorAnalysis import VectorField
+from Scientific import N
+import resource, sys, time
+
+def peakMemory():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.
+
+n = 256
+if len(sys.argv) > 1:
+    n = int(sys.argv[1])
+
+axis = N.arange(n)*(1./n)
+values = N.zeros((n, n, n, 3), N.Float)
+values[..., 0] = N.sin(2.*N.pi*axis)[:, N.NewAxis, N.NewAxis]
+values[..., 1] = axis[N.NewAxis, :, N.NewAxis]**2
+values[..., 2] = N.cos(2.*N.pi*axis)[N.NewAxis, N.NewAxis, :]
+field = VectorField(3*(axis,), values)
+print "Grid size %d**3, field values: %.0f MB" % (n, values.nbytes/2.**20)
+print "Memory after setup: %.0f MB" % peakMemory()
+
+start = time.time()
+div, curl, strain = field.divergenceCurlAndStrain()
+print "divergenceCurlAndStrain: %.2f s, peak memory %.0f MB" \
+      % (time.time()-start, peakMemory())
+
+points = N.array([0.1, 0.1, 0.1]) + \
+         0.8*N.fmod(N.arange(300000.)[:, N.NewAxis]*[0.618, 0.414, 0.732], 1.)
+start = time.time()
+v = field.valuesAt(points)
+print "valuesAt for %d points: %.2f s" % (len(points), time.time()-start)
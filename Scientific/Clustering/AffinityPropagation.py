@@ -21,11 +21,22 @@ B.J. Frey & D. Dueck, Science 315, 972-976 (2007)
 """
 
 from Scientific import N
+from Scientific.Statistics import median
+import numpy as np
 import random
 
 class DataSet(object):
 
     """A collection of data items with similarities
+
+    The similarities, including one self term (i, i) per item, are
+    stored in compressed sparse row (CSR) form: the entries for item i
+    are those from row_pointers[i] to row_pointers[i+1]-1, sorted by
+    column_indices. All arrays used in the cluster identification are
+    indexed by these entries. Each iteration of the algorithm requires
+    the maximum and the second largest value in each row and a sum
+    over each column, which take a time proportional to the number
+    of similarities.
     """
 
     def __init__(self, items, similarities,
@@ -62,12 +73,12 @@ class DataSet(object):
         self.nitems = len(items)
         self._setupSimilarities(items, similarities,
                                 symmetric, minimal_similarity)
-        self._setupIndices()
 
     def _setupSimilarities(self, items, similarities,
                            symmetric, minimal_similarity):
-        self.similarities = []
-        self.index = {}
+        # The similarities are collected as three arrays (index1,
+        # index2, similarity) and then stored in compressed sparse row
+        # (CSR) form, including the self terms (i, i).
         self.smallest_similarity = None
         self.largest_similarity = None
         self.median_similarity = None
@@ -76,108 +87,82 @@ class DataSet(object):
         if isinstance(similarities, N.ArrayType):
             if similarities.shape != 2*(self.nitems,):
                 raise ValueError("Similarity array has wrong shape")
-            for i in range(self.nitems):
-                for k in range(self.nitems):
-                    if i != k:
-                        self._storeSimilarity(i, k, similarities[i, k],
-                                              minimal_similarity)
+            i, k = np.nonzero(~np.eye(self.nitems, dtype=bool))
+            s = similarities[i, k]
 
         # Check for callable similarity function
         elif callable(similarities):
+            pairs = []
             for i in range(self.nitems):
                 for k in range(i+1, self.nitems):
                     s = similarities(self.items[i], self.items[k])
-                    self._storeSimilarity(i, k, s, minimal_similarity)
+                    pairs.append((i, k, s))
                     if not symmetric:
                         s = similarities(self.items[k], self.items[i])
-                    self._storeSimilarity(k, i, s, minimal_similarity)
+                    pairs.append((k, i, s))
+            i, k, s = self._pairArrays(pairs)
 
         # Assume list of (i, k, s) triples
         else:
-            for i, k, s in similarities:
-                if i < 0 or i > self.nitems or k < 0 or k > self.nitems:
-                    raise ValueError("Index out of range in " + str((i, k, s)))
-                if i == k:
-                    raise ValueError("Equal indices in " + str((i, k, s)))
-                self._storeSimilarity(i, k, s, minimal_similarity)
-                if symmetric:
-                    self._storeSimilarity(k, i, s, minimal_similarity)
-
-        # Add indices for self terms
-        for i in range(self.nitems):
-            self._storeSimilarity(i, i, None, None)
-
-        # Convert similarities to array
-        self.nsimilarities = len(self.similarities)
-        self.similarities = N.array(self.similarities[:-self.nitems])
+            i, k, s = self._pairArrays(similarities)
+            bad = (i < 0) | (i >= self.nitems) | (k < 0) | (k >= self.nitems)
+            if np.any(bad):
+                first = np.nonzero(bad)[0][0]
+                raise ValueError("Index out of range in "
+                                 + str((i[first], k[first], s[first])))
+            bad = i == k
+            if np.any(bad):
+                first = np.nonzero(bad)[0][0]
+                raise ValueError("Equal indices in "
+                                 + str((i[first], k[first], s[first])))
+            if symmetric:
+                i, k = np.column_stack([i, k]).ravel(), \
+                       np.column_stack([k, i]).ravel()
+                s = np.repeat(s, 2)
+
+        if minimal_similarity is not None:
+            keep = s >= minimal_similarity
+            i = i[keep]
+            k = k[keep]
+            s = s[keep]
+        self._storeSimilarities(i, k, s)
 
         # Find smallest, largest, and median
         self.smallest_similarity = N.minimum.reduce(self.similarities)
         self.largest_similarity = N.maximum.reduce(self.similarities)
-        sort_indices = N.argsort(self.similarities)
-        ns = len(self.similarities)
-        if ns % 2 == 1:
-            self.median_similarity = self.similarities[sort_indices[ns/2]]
-        else:
-            self.median_similarity = \
-              (self.similarities[sort_indices[ns/2]]
-               + self.similarities[sort_indices[ns/2-1]])/2.
-
-    def _storeSimilarity(self, i, k, s, minimal_similarity):
-        if s >= minimal_similarity:
-            index_by_i = self.index.setdefault(i, {})
-            index_by_i[k] = len(self.similarities)
-            self.similarities.append(s)
-
-    def _setupIndices(self):
-        self._setupRIndices()
-        self._setupAIndices1()
-        self._setupAIndices2()
-        self._setupEIndices()
-
-    def _setupRIndices(self):
-        indices = []
-        for i in range(self.nsimilarities):
-            indices.append([])
-        for i in range(self.nitems):
-            for k1, index1 in self.index[i].items():
-                for k2, index2 in self.index[i].items():
-                    if k2 != k1:
-                        indices[index1].append(index2)
-        self.r_update_indices = [N.array(i) for i in indices]
-
-    def _setupAIndices1(self):
-        indices = N.zeros((self.nsimilarities,), N.Int)
-        for i in range(self.nitems):
-            for k, index in self.index[i].items():
-                indices[index] = self.index[k][k]
-        self.a_update_indices_1 = indices
-
-    def _setupAIndices2(self):
-        index_inv = {}
-        for i in range(self.nitems):
-            index_inv[i] = {}
-        for i in range(self.nitems):
-            for k, index in self.index[i].items():
-                index_inv[k][i] = index
-        indices = self.nsimilarities*[None]
-        for k in range(self.nitems):
-            all = index_inv[k].items()
-            for i, index in all:
-                indices[index] = N.array([x[1] for x in all
-                                          if x[0] != i and x[0] != k])
-        self.a_update_indices_2 = indices
-
-    def _setupEIndices(self):
-        indices = []
-        for i in range(self.nitems):
-            ii = []
-            ik = []
-            for k, index in self.index[i].items():
-                ii.append(index)
-                ik.append(k)
-            indices.append((N.array(ii), N.array(ik)))
-        self.e_indices = indices
+        self.median_similarity = median(self.similarities)
+
+    def _pairArrays(self, pairs):
+        pairs = list(pairs)
+        if len(pairs) == 0:
+            return np.zeros((0,), N.Int), np.zeros((0,), N.Int), \
+                   np.zeros((0,), N.Float)
+        i, k, s = zip(*pairs)
+        return np.array(i, N.Int), np.array(k, N.Int), np.array(s, N.Float)
+
+    def _storeSimilarities(self, i, k, s):
+        # Append the self terms, sort by row and column, and keep the
+        # last value given for each pair.
+        i = np.concatenate([i, np.arange(self.nitems)])
+        k = np.concatenate([k, np.arange(self.nitems)])
+        s = np.concatenate([s, np.zeros((self.nitems,), N.Float)])
+        key = i*self.nitems + k
+        order = np.argsort(key, kind='mergesort')
+        key = key[order]
+        last = np.concatenate([key[1:] != key[:-1], [True]])
+        order = order[last]
+        self.row_indices = i[order]
+        self.column_indices = k[order]
+        values = s[order]
+        self.nsimilarities = len(order)
+        self.row_pointers = \
+            np.concatenate([[0], np.add.accumulate(
+                np.bincount(self.row_indices, None, self.nitems))])
+        self.diagonal_indices = \
+            np.nonzero(self.row_indices == self.column_indices)[0]
+        self.off_diagonal_indices = \
+            np.nonzero(self.row_indices != self.column_indices)[0]
+        self.similarities = values[self.off_diagonal_indices]
 
     def findClusters(self, preferences, max_iterations=500,
                      convergence = 50, damping=0.5):
@@ -207,9 +192,11 @@ class DataSet(object):
             raise ValueError("Number of preferences != number of items")
 
         noise_scale = 1.e-12*(self.largest_similarity-self.smallest_similarity)
-        s = N.concatenate([self.similarities, preferences])
-        for i in range(len(s)):
-            s[i] += noise_scale*random.random()
+        s = N.zeros((self.nsimilarities,), N.Float)
+        s[self.off_diagonal_indices] = self.similarities
+        s[self.diagonal_indices] = preferences
+        s += noise_scale*N.array([random.random()
+                                  for i in range(len(s))])
         a = N.zeros(s.shape, N.Float)
         r = N.zeros(s.shape, N.Float)
         iterations_left = max_iterations
@@ -217,11 +204,7 @@ class DataSet(object):
         self.exemplar = N.zeros((self.nitems,), N.Int)
         while True:
             a, r = _affinityPropagation(self, s, a, r, damping)
-            e = a + r
-            exemplar = N.zeros((self.nitems,), N.Int)
-            for i in range(self.nitems):
-                ii, ik = self.e_indices[i]
-                exemplar[i] = ik[N.argmax(N.take(e, ii))]
+            exemplar = self.column_indices[_rowArgmax(self, a+r)[0]]
             if N.logical_and.reduce(exemplar == self.exemplar):
                 convergence_count += 1
                 if convergence_count == convergence:
@@ -243,31 +226,51 @@ class DataSet(object):
         return clusters
 
 
+def _rowArgmax(dataset, values):
+    # The index of the first maximal entry in each row, and the maximum.
+    # Every row contains at least the self term.
+    starts = dataset.row_pointers[:-1]
+    maximum = np.maximum.reduceat(values, starts)
+    candidates = np.nonzero(values == maximum[dataset.row_indices])[0]
+    rows = dataset.row_indices[candidates]
+    first = np.concatenate([[True], rows[1:] != rows[:-1]])
+    return candidates[first], maximum
+
+def _affinityPropagationArrays(dataset, s, a, r, damping):
+    # Responsibilities: s(i, k) minus the largest value of a+s over
+    # the other entries of row i, which is the row maximum except
+    # at the position of the maximum itself.
+    aps = a + s
+    largest, max1 = _rowArgmax(dataset, aps)
+    aps[largest] = -np.inf
+    max2 = np.maximum.reduceat(aps, dataset.row_pointers[:-1])
+    r_new = s - max1[dataset.row_indices]
+    r_new[largest] = s[largest] - max2
+    r = damping*r + (1-damping)*r_new
+
+    # Availabilities: the sum of the positive responsibilities
+    # r(i', k) over column k without the self term, minus the
+    # entry's own contribution, plus r(k, k) for i != k.
+    rpos = N.maximum(0., r)
+    rpos[dataset.diagonal_indices] = 0.
+    column_sum = np.bincount(dataset.column_indices, rpos, dataset.nitems)
+    column_sum = column_sum[dataset.column_indices]
+    a_new = r[dataset.diagonal_indices][dataset.column_indices] \
+            + column_sum - rpos
+    a_new = N.minimum(0., a_new)
+    a_new[dataset.diagonal_indices] = \
+        column_sum[dataset.diagonal_indices]
+    a = damping*a + (1-damping)*a_new
+
+    return a, r
+
 try:
 
     from Scientific._affinitypropagation import _affinityPropagation
 
 except ImportError:
 
-    def _affinityPropagation(dataset, s, a, r, damping):
-        aps = a + s
-        r_new = N.zeros(s.shape, N.Float)
-        for i in range(dataset.nsimilarities):
-            r_new[i] = s[i] \
-                       - N.maximum.reduce(N.take(aps,
-                                                 dataset.r_update_indices[i]))
-        r = damping*r + (1-damping)*r_new
-
-        rpos = N.maximum(0., r)
-        a_new = N.take(r, dataset.a_update_indices_1)
-        a_new[-dataset.nitems:] = 0.
-        for i in range(dataset.nsimilarities):
-            a_new[i] += N.add.reduce(N.take(rpos,
-                                            dataset.a_update_indices_2[i]))
-        a_new[:-dataset.nitems] = N.minimum(0., a_new[:-dataset.nitems])
-        a = damping*a + (1-damping)*a_new
-
-        return a, r
+    _affinityPropagation = _affinityPropagationArrays
 
 if __name__ == "__main__":
 
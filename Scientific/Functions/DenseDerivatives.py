@@ -0,0 +1,473 @@
+# Automatic nth-order derivatives stored in dense arrays
+#
+
+"""
+Automatic differentiation for functions of
+any number of variables up to any order, using array storage
+
+This module provides the same functionality as
+L{Scientific.Functions.Derivatives}, with the same interface for
+creating and combining variables. The difference is the internal
+representation: the derivatives of order n are stored in a single
+array of shape (nvars,)*n instead of nested lists of DerivVar objects.
+Arithmetic on these arrays is done by NumPy, which makes second
+derivatives of functions of many variables (e.g. the force constants
+of a potential energy function) much cheaper. Since the arrays are
+dense, the memory needed for order n grows as nvars**n, so orders
+above three are practical only for few variables.
+
+Example::
+
+    >>>x = DerivVar(3., 0, 2)
+    >>>y = DerivVar(5., 1, 2)
+    >>>f = sqrt(x*y)
+    >>>print f[0]
+    3.87298334621
+    >>>print f[1]
+    [ 0.64549722  0.38729833]
+    >>>print f[2]
+    [[-0.10758287  0.06454972]
+     [ 0.06454972 -0.03872983]]
+
+Indexing with the derivative order yields the value (order zero) or
+the array of all derivatives of the given order. The variable count
+of a result is the highest variable index used in its computation plus
+one. It can be fixed in advance by the optional argument nvars of
+DerivVar, which avoids enlarging the arrays during the calculation.
+
+When variables with different differentiation orders are mixed,
+the result has the lower one of the two orders. An exception are
+zeroth-order variables, which are treated as constants.
+"""
+
+from Scientific import N; Numeric = N
+import numpy as np
+import itertools
+
+
+# The following class represents variables with derivatives:
+
+class DerivVar:
+
+    """
+    Numerical variable with automatic derivatives of arbitrary order,
+    stored in arrays
+    """
+
+    def __init__(self, value, index=0, order=1, nvars=None):
+        """
+        @param value: the numerical value of the variable
+        @type value: number
+        @param index: the variable index, which serves to
+            distinguish between variables and as an index for
+            the derivative arrays. Each explicitly created
+            instance of DerivVar must have a unique index.
+        @type index: C{int}
+        @param order: the derivative order
+        @type order: C{int}
+        @param nvars: the total number of variables, which must be larger
+            than index. The default is index+1.
+        @type nvars: C{int}
+        @raise ValueError: if order < 0 or nvars <= index
+        """
+        if order < 0:
+            raise ValueError('Negative derivative order')
+        if type(index) == type([]):
+            # Internal use: index is the list of derivative arrays
+            self.value = value
+            self.deriv = index
+            self.order = order
+            return
+        if nvars is None:
+            nvars = index+1
+        if nvars <= index:
+            raise ValueError('Variable index out of range')
+        self.value = value
+        self.order = order
+        self.deriv = [np.zeros(m*(nvars,), np.float)
+                      for m in range(1, order+1)]
+        if order > 0:
+            self.deriv[0][index] = 1.
+
+    def nvars(self):
+        """
+        @return: the number of variables
+        @rtype: C{int}
+        """
+        if self.order == 0:
+            return 0
+        return self.deriv[0].shape[0]
+
+    def toOrder(self, order):
+        """
+        @param order: the highest derivative order to be kept
+        @type order: C{int}
+        @return: a DerivVar object with a lower derivative order
+        @rtype: L{DerivVar}
+        """
+        if self.order <= order:
+            return self
+        if order == 0:
+            return self.value
+        return DerivVar(self.value, self.deriv[:order], order)
+
+    def __getitem__(self, order):
+        """
+        @param order: derivative order
+        @type order: C{int}
+        @return: the value for order zero, or an array of shape
+                 (nvars,)*order containing all derivatives of the
+                 given order
+        @rtype: number or C{N.array}
+        @raise ValueError: if order < 0 or order > self.order
+        """
+        if order < 0 or order > self.order:
+            raise ValueError('Index out of range')
+        if order == 0:
+            return self.value
+        else:
+            return self.deriv[order-1]
+
+    def __repr__(self):
+        return repr(tuple([self[n] for n in range(self.order+1)]))
+
+    def __str__(self):
+        return str(tuple([self[n] for n in range(self.order+1)]))
+
+    def __coerce__(self, other):
+        if isDerivVar(other):
+            if self.order==other.order or self.order==0 or other.order==0:
+                return self, other
+            order = min(self.order, other.order)
+            return self.toOrder(order), other.toOrder(order)
+        else:
+            return self, DerivVar(other, [], 0)
+
+    def __cmp__(self, other):
+        return cmp(self.value, other.value)
+
+    def __neg__(self):
+        return DerivVar(-self.value, [-d for d in self.deriv], self.order)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        absvalue = abs(self.value)
+        s = self.value/absvalue
+        return DerivVar(absvalue, [s*d for d in self.deriv], self.order)
+
+    def __nonzero__(self):
+        return self.value != 0
+
+    def __add__(self, other):
+        return DerivVar(self.value + other.value,
+                        _mapderiv(np.add, self.deriv, other.deriv),
+                        max(self.order, other.order))
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return DerivVar(self.value - other.value,
+                        _mapderiv(np.subtract, self.deriv, other.deriv),
+                        max(self.order, other.order))
+
+    def __rsub__(self, other):
+        return DerivVar(other.value - self.value,
+                        _mapderiv(np.subtract, other.deriv, self.deriv),
+                        max(self.order, other.order))
+
+    def __mul__(self, other):
+        if self.order == 0:
+            return DerivVar(self.value*other.value,
+                            [self.value*d for d in other.deriv], other.order)
+        if other.order == 0:
+            return DerivVar(self.value*other.value,
+                            [other.value*d for d in self.deriv], self.order)
+        order = max(self.order, other.order)
+        a = _coefficients(self, order)
+        b = _coefficients(other, order)
+        _padList(a, b)
+        return DerivVar(self.value*other.value,
+                        [_leibniz(a, 0, b, 0, m) for m in range(1, order+1)],
+                        order)
+    __rmul__ = __mul__
+
+    def __div__(self, other):
+        if not other.value:
+            raise ZeroDivisionError('DerivVar division')
+        if other.order == 0:
+            factor = 1./other.value
+            return DerivVar(_toFloat(self.value)*factor,
+                            [factor*d for d in self.deriv], self.order)
+        return self*other._reciprocal()
+
+    def __rdiv__(self, other):
+        return other/self
+
+    __truediv__ = __div__
+
+    def _reciprocal(self):
+        return self._mathfunc(lambda x: 1./x, lambda x: -1./(x*x))
+
+    def __pow__(self, other, z=None):
+        if z is not None:
+            raise TypeError('DerivVar does not support ternary pow()')
+        if other.order > 0:
+            return Numeric.exp(Numeric.log(self)*other)
+        else:
+            p = other.value
+            return self._mathfunc(lambda x: pow(x, p),
+                                  lambda x: p*pow(x, p-1))
+
+    def __rpow__(self, other):
+        return pow(other, self)
+
+    def _mathfunc(self, f, d):
+        # The first derivatives of f(self) are d(self)*grad(self),
+        # where d(self) needs to be known only to order-1. The
+        # derivative arrays of this product are obtained by the
+        # Leibniz rule, treating grad(self) as a vector-valued
+        # variable of order-1.
+        if self.order == 0:
+            return DerivVar(f(self.value), [], 0)
+        fd = d(self.toOrder(self.order-1))
+        fd = _coefficients(fd, self.order-1, self.nvars())
+        grad = self.deriv
+        return DerivVar(f(self.value),
+                        [_leibniz(fd, 0, grad, 1, m)
+                         for m in range(self.order)],
+                        self.order)
+
+    def exp(self):
+        return self._mathfunc(Numeric.exp, Numeric.exp)
+
+    def log(self):
+        return self._mathfunc(Numeric.log, lambda x: 1./x)
+
+    def log10(self):
+        return self._mathfunc(Numeric.log10, lambda x: 1./(x*Numeric.log(10)))
+
+    def sqrt(self):
+        return self._mathfunc(Numeric.sqrt, lambda x: 0.5/Numeric.sqrt(x))
+
+    def sign(self):
+        if self.value == 0:
+            raise ValueError("can't differentiate sign() at zero")
+        return self._mathfunc(Numeric.sign, lambda x: 0)
+
+    def sin(self):
+        return self._mathfunc(Numeric.sin, Numeric.cos)
+
+    def cos(self):
+        return self._mathfunc(Numeric.cos, lambda x: -Numeric.sin(x))
+
+    def tan(self):
+        return self._mathfunc(Numeric.tan, lambda x: 1.+pow(Numeric.tan(x),2))
+
+    def sinh(self):
+        return self._mathfunc(Numeric.sinh, Numeric.cosh)
+
+    def cosh(self):
+        return self._mathfunc(Numeric.cosh, Numeric.sinh)
+
+    def tanh(self):
+        return self._mathfunc(Numeric.tanh, lambda x:
+                              1./pow(Numeric.cosh(x),2))
+
+    def arcsin(self):
+        return self._mathfunc(Numeric.arcsin, lambda x:
+                              1./Numeric.sqrt(1.-pow(x,2)))
+
+    def arccos(self):
+        return self._mathfunc(Numeric.arccos, lambda x:
+                              -1./Numeric.sqrt(1.-pow(x,2)))
+
+    def arctan(self):
+        return self._mathfunc(Numeric.arctan, lambda x:
+                              1./(1+pow(x,2)))
+
+    def arctan2(self, other):
+        if not isDerivVar(other):
+            other = DerivVar(other, [], 0)
+        order = max(self.order, other.order)
+        if self.order > 0 and other.order > 0:
+            order = min(self.order, other.order)
+        if order == 0:
+            return DerivVar(Numeric.arctan2(self.value, other.value), [], 0)
+        # d arctan2(y, x) = (x dy - y dx)/(x**2+y**2)
+        y1 = _lower(self, order)
+        x1 = _lower(other, order)
+        inverse_den = 1./(y1*y1+x1*x1)
+        nvars = max(_nvars(self), _nvars(other))
+        fx = _coefficients(x1*inverse_den, order-1, nvars)
+        fy = _coefficients(y1*inverse_den, order-1, nvars)
+        gy = _gradient(self, order, nvars)
+        gx = _gradient(other, order, nvars)
+        return DerivVar(Numeric.arctan2(self.value, other.value),
+                        [_leibniz(fx, 0, gy, 1, m)
+                         - _leibniz(fy, 0, gx, 1, m)
+                         for m in range(order)],
+                        order)
+
+# Type check
+
+def isDerivVar(x):
+    """
+    @param x: an arbitrary object
+    @return: True if x is a DerivVar object, False otherwise
+    @rtype: C{bool}
+    """
+    return hasattr(x,'value') and hasattr(x,'deriv') and hasattr(x,'order')
+
+
+# Helper functions for derivative arrays. A list of derivative arrays
+# of a vector-valued quantity has the vector index as its first axis.
+
+def _nvars(x):
+    if isDerivVar(x):
+        return x.nvars()
+    return 0
+
+def _lower(x, order):
+    # x truncated to order-1, as a DerivVar or a number
+    if isDerivVar(x) and x.order > 0:
+        return x.toOrder(order-1)
+    if isDerivVar(x):
+        return x.value
+    return x
+
+def _gradient(x, order, nvars):
+    # The first order derivatives of x as a vector-valued quantity,
+    # with its derivatives up to order-1.
+    if isDerivVar(x) and x.order > 0:
+        return [_pad(d, 0, nvars) for d in x.deriv[:order]]
+    return [np.zeros((m+1)*(nvars,), np.float) for m in range(order)]
+
+def _coefficients(x, order, nvars=None):
+    # [value, deriv_1, ..., deriv_order] for a DerivVar or a constant
+    if nvars is None:
+        nvars = _nvars(x)
+    if isDerivVar(x):
+        value = x.value
+        deriv = x.deriv[:order]
+    else:
+        value = x
+        deriv = []
+    deriv = [_pad(d, 0, nvars) for d in deriv]
+    for m in range(len(deriv)+1, order+1):
+        deriv.append(np.zeros(m*(nvars,), np.float))
+    return [value] + deriv
+
+def _pad(array, value_axes, nvars):
+    # Enlarges the derivative axes of array to length nvars
+    array = np.asarray(array)
+    shape = array.shape
+    if len(shape) == value_axes or shape[-1] == nvars:
+        return array
+    new = np.zeros(shape[:value_axes] + (len(shape)-value_axes)*(nvars,),
+                   array.dtype)
+    new[tuple([slice(0, n) for n in shape])] = array
+    return new
+
+def _padList(a, b):
+    # Pads the derivative arrays of two coefficient lists in place
+    # to a common number of variables
+    nvars = max([d.shape[-1] for d in a[1:] + b[1:]])
+    for l in [a, b]:
+        for m in range(1, len(l)):
+            l[m] = _pad(l[m], 0, nvars)
+
+def _leibniz(a, va, b, vb, m):
+    # Derivative array of order m of the product of two quantities
+    # given by their coefficient lists a and b, which have va and vb
+    # (0 or 1) leading vector axes.
+    result = 0
+    for j in range(m+1):
+        result = result + _symmetricProduct(a[j], j, va, b[m-j], m-j, vb)
+    return result
+
+def _symmetricProduct(a, na, va, b, nb, vb):
+    # The outer product of the derivative arrays a (na derivative axes)
+    # and b (nb derivative axes), summed over all distinct ways of
+    # distributing the na+nb derivative indices over the two factors.
+    a = np.asarray(a)
+    b = np.asarray(b)
+    v = max(va, vb)
+    if v > 0:
+        if va == 0:
+            a = a[np.newaxis]
+        if vb == 0:
+            b = b[np.newaxis]
+    a = np.reshape(a, a.shape + nb*(1,))
+    b = np.reshape(b, b.shape[:v] + na*(1,) + b.shape[v:])
+    product = a*b
+    if na == 0 or nb == 0:
+        return product
+    m = na+nb
+    result = 0
+    for positions in itertools.combinations(range(m), na):
+        others = [i for i in range(m) if i not in positions]
+        axes = m*[0]
+        for k, i in enumerate(positions):
+            axes[i] = k
+        for k, i in enumerate(others):
+            axes[i] = na+k
+        result = result + np.transpose(product,
+                                       range(v) + [v+i for i in axes])
+    return result
+
+# Map a binary function on two derivative lists
+
+def _mapderiv(func, a, b):
+    if len(a) < len(b):
+        a = a + [0]*(len(b)-len(a))
+    elif len(b) < len(a):
+        b = b + [0]*(len(a)-len(b))
+    result = []
+    for x, y in zip(a, b):
+        if isinstance(x, np.ndarray) and isinstance(y, np.ndarray) \
+           and x.shape != y.shape:
+            nvars = max(x.shape[0], y.shape[0])
+            x = _pad(x, 0, nvars)
+            y = _pad(y, 0, nvars)
+        result.append(func(x, y))
+    return result
+
+# Convert argument to float if it is integer
+
+def _toFloat(x):
+    if isinstance(x, int):
+        return float(x)
+    return x
+
+# Define vector of DerivVars
+
+def DerivVector(x, y, z, index=0, order=1, nvars=None):
+
+    """
+    @param x: x component of the vector
+    @type x: number
+    @param y: y component of the vector
+    @type y: number
+    @param z: z component of the vector
+    @type z: number
+    @param index: the DerivVar index for the x component. The y and z
+                  components receive consecutive indices.
+    @type index: C{int}
+    @param order: the derivative order
+    @type order: C{int}
+    @param nvars: the total number of variables. The default is index+3.
+    @type nvars: C{int}
+    @return: a vector whose components are DerivVar objects
+    @rtype: L{Scientific.Geometry.Vector}
+    """
+
+    from Scientific.Geometry.VectorModule import Vector
+    if isDerivVar(x) and isDerivVar(y) and isDerivVar(z):
+        return Vector(x, y, z)
+    else:
+        if nvars is None:
+            nvars = index+3
+        return Vector(DerivVar(x, index, order, nvars),
+                      DerivVar(y, index+1, order, nvars),
+                      DerivVar(z, index+2, order, nvars))
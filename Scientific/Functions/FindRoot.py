@@ -19,9 +19,14 @@ Example::
     >>>newtonRaphson(func, 0.0, 1.0, 1.0e-12)
 
     yields 0.952847864655.
+
+Many equations can be solved at once with L{batchedNewtonRaphson},
+which applies the same algorithm to arrays of search intervals using
+a vectorized function.
 """
 
-from FirstDerivatives import DerivVar
+from FirstDerivatives import DerivVar, isDerivVar
+import numpy as np
 
 def newtonRaphson(function, lox, hix, xacc):
     
@@ -90,6 +95,140 @@ def newtonRaphson(function, lox, hix, xacc):
             xh=rts
     raise ValueError("Maximum number of iterations exceeded")
 
+def _evaluate(function, derivative, x, parameters):
+    # Return the values and the derivatives of function at x
+    if parameters is None:
+        args = ()
+    else:
+        args = (parameters,)
+    if derivative is None:
+        result = function(DerivVar(x, 0, 1, 1), *args)
+        if isDerivVar(result):
+            f = result[0]
+            df = result[1][..., 0]
+        else:
+            f = result
+            df = 0.
+    else:
+        f = function(x, *args)
+        df = derivative(x, *args)
+    zero = np.zeros(x.shape, np.float)
+    return f+zero, df+zero
+
+def batchedNewtonRaphson(function, lox, hix, xacc, derivative=None,
+                         parameters=None, max_iterations=500):
+    """
+    X{Newton-Raphson} algorithm for finding the X{root}s of many
+    equations at once. The algorithm is the same safe version
+    of Newton-Raphson as in L{newtonRaphson}, applied to arrays of
+    search intervals. The function is evaluated in each iteration only
+    for the elements that have not yet converged.
+
+    @param function: a vectorized function of one numerical variable.
+        It is called with a one-dimensional array of abscissas and
+        must return an array of function values of the same shape.
+        If no derivative is given, it may only use those operations
+        that are defined for DerivVar objects in the module
+        L{Scientific.Functions.FirstDerivatives}, because its derivative
+        is then obtained in the array mode of DerivVar. If parameters
+        are given, the function is called with the parameters of the
+        elements as a second argument.
+    @type function: callable
+    @param lox: lower limits of the search intervals
+    @type lox: C{float} or C{N.array}
+    @param hix: upper limits of the search intervals
+    @type hix: C{float} or C{N.array}
+    @param xacc: requested absolute precision of the roots
+    @type xacc: C{float}
+    @param derivative: a function that is called with the same
+        arguments as function and returns its derivative
+    @type derivative: callable
+    @param parameters: an array whose leading axes have the shape of
+        the search interval arrays (or a single axis, if the limits
+        are numbers), specifying one equation per element
+    @type parameters: C{N.array}
+    @param max_iterations: the maximum number of iterations
+    @type max_iterations: C{int}
+    @returns: the roots, the number of iterations for each element,
+        and a boolean array that is C{False} for the elements for which
+        no root was found. This is the case if the root is not bracketed
+        by the search interval or if there is no convergence after
+        max_iterations iterations. The root is NaN for elements whose
+        root is not bracketed.
+    @rtype: C{tuple} of three arrays
+    """
+    lox = np.asarray(lox, np.float)
+    hix = np.asarray(hix, np.float)
+    shape = np.broadcast(lox, hix).shape
+    if parameters is not None:
+        parameters = np.asarray(parameters)
+        if len(shape) == 0:
+            shape = parameters.shape[:1]
+        parameters = np.reshape(parameters, (int(np.multiply.reduce(shape)),)
+                                + parameters.shape[len(shape):])
+    lox = np.ravel(lox + np.zeros(shape))
+    hix = np.ravel(hix + np.zeros(shape))
+    npoints = len(lox)
+    roots = np.zeros((npoints,), np.float)
+    iterations = np.zeros((npoints,), np.int)
+    converged = np.zeros((npoints,), np.bool_)
+    fl = _evaluate(function, derivative, lox, parameters)[0]
+    fh = _evaluate(function, derivative, hix, parameters)[0]
+    bracketed = ~(((fl > 0.) & (fh > 0.)) | ((fl < 0.) & (fh < 0.)))
+    roots[~bracketed] = np.nan
+    for limit, f_limit in [(hix, fh), (lox, fl)]:
+        root = bracketed & (f_limit == 0.)
+        roots[root] = limit[root]
+        converged[root] = True
+    active = np.nonzero(bracketed & ~converged)[0]
+    swap = fl[active] >= 0.
+    xl = np.where(swap, hix[active], lox[active])
+    xh = np.where(swap, lox[active], hix[active])
+    rts = 0.5*(lox[active]+hix[active])
+    dxold = np.abs(hix[active]-lox[active])
+    dx = dxold.copy()
+    if parameters is None:
+        p = None
+    else:
+        p = parameters[active]
+    f, df = _evaluate(function, derivative, rts, p)
+    niter = 0
+    while len(active) > 0 and niter < max_iterations:
+        niter = niter + 1
+        bisect = (((rts-xh)*df-f)*((rts-xl)*df-f) > 0.) \
+                 | (np.abs(2.*f) > np.abs(dxold*df))
+        dxold = dx
+        old_err = np.seterr(divide='ignore', invalid='ignore')
+        try:
+            dx = np.where(bisect, 0.5*(xh-xl), f/df)
+        finally:
+            np.seterr(**old_err)
+        new = np.where(bisect, xl+dx, rts-dx)
+        done = np.where(bisect, xl == new, rts == new) | (np.abs(dx) < xacc)
+        rts = new
+        iterations[active] = niter
+        finished = active[done]
+        roots[finished] = rts[done]
+        converged[finished] = True
+        left = ~done
+        active = active[left]
+        if len(active) == 0:
+            break
+        rts = rts[left]
+        xl = xl[left]
+        xh = xh[left]
+        dx = dx[left]
+        dxold = dxold[left]
+        if p is not None:
+            p = p[left]
+        f, df = _evaluate(function, derivative, rts, p)
+        negative = f < 0.
+        xl = np.where(negative, rts, xl)
+        xh = np.where(negative, xh, rts)
+    roots[active] = rts
+    return (np.reshape(roots, shape), np.reshape(iterations, shape),
+            np.reshape(converged, shape))
+
 # Test code
 
 if __name__ == '__main__':
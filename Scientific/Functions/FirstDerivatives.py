@@ -46,6 +46,27 @@ Example::
 The numbers in the list are the partial derivatives with respect
 to x, y, and z, respectively.
 
+In array mode, the derivatives are stored in an array instead of
+a list, and the value can be an array as well. The last axis of the
+derivative array runs over the variables, the leading axes match the
+shape of the value. Array mode is selected by specifying the total
+number of variables when creating a DerivVar. A function evaluated
+on an array of data points then yields all values and all partial
+derivatives (the Jacobian) in a single pass of array operations.
+
+Example::
+
+    >>>a = DerivVar(2., 0, nvars=2)
+    >>>b = DerivVar(0.5, 1, nvars=2)
+    >>>x = N.array([0., 1., 2.])
+    >>>f = a*exp(-b*x)
+    >>>print f[0]
+    >>>[ 2.          1.21306132  0.73575888]
+    >>>print f[1]
+    >>>[[ 1.          0.        ]
+    >>>  [ 0.60653066 -1.21306132]
+    >>>  [ 0.36787944 -1.47151776]]
+
 Note: It doesn't make sense to use DerivVar with different values
 for the same variable index in one calculation, but there is
 no check for this. I.e.::
@@ -71,10 +92,10 @@ class DerivVar:
     Numerical variable with automatic derivatives of first order
     """
 
-    def __init__(self, value, index=0, order=1):
+    def __init__(self, value, index=0, order=1, nvars=None):
         """
         @param value: the numerical value of the variable
-        @type value: number
+        @type value: number, or C{N.array} in array mode
         @param index: the variable index, which serves to
             distinguish between variables and as an index for
             the derivative lists. Each explicitly created
@@ -82,24 +103,39 @@ class DerivVar:
         @type index: C{int}
         @param order: the derivative order, must be zero or one
         @type order: C{int}
-        @raise ValueError: if order < 0 or order > 1
+        @param nvars: the total number of variables. If specified,
+            the variable is created in array mode.
+        @type nvars: C{int}
+        @raise ValueError: if order < 0 or order > 1, or if
+            nvars <= index
         """
         if order < 0 or order > 1:
             raise ValueError('Only first-order derivatives')
         self.value = value
         if order == 0:
             self.deriv = []
-        elif type(index) == type([]):
+        elif type(index) == type([]) or isinstance(index, N.ArrayType):
             self.deriv = index
+        elif nvars is not None:
+            if nvars <= index:
+                raise ValueError('Variable index out of range')
+            self.deriv = N.zeros(N.shape(value) + (nvars,), N.Float)
+            self.deriv[..., index] = 1.
         else:
             self.deriv = index*[0] + [1]
+        if isinstance(self.deriv, N.ArrayType):
+            # Make array operators return NotImplemented, such that
+            # expressions like array*DerivVar yield a single DerivVar
+            # rather than an array of DerivVars.
+            self.__array_priority__ = 10.
 
     def __getitem__(self, order):
         """
         @param order: derivative order
         @type order: C{int}
-        @return: a list of all derivatives of the given order
-        @rtype: C{list}
+        @return: a list of all derivatives of the given order,
+            or an array in array mode
+        @rtype: C{list} or C{N.array}
         @raise ValueError: if order < 0 or order > 1
         """
         if order < 0 or order > 1:
@@ -122,19 +158,24 @@ class DerivVar:
             return self, DerivVar(other, [])
 
     def __cmp__(self, other):
+        if _isArrayValue(self.value) or _isArrayValue(other.value):
+            raise ValueError("DerivVars with array values "
+                             "cannot be compared")
         return cmp(self.value, other.value)
 
     def __neg__(self):
-        return DerivVar(-self.value, map(lambda a: -a, self.deriv))
+        return DerivVar(-self.value, _scale(-1, self.deriv))
 
     def __pos__(self):
         return self
 
     def __abs__(self): # cf maple signum # derivate of abs
         absvalue = abs(self.value)
-        return DerivVar(absvalue, map(lambda a, d=self.value/absvalue:
-                                      d*a, self.deriv))
+        return DerivVar(absvalue, _scale(self.value/absvalue, self.deriv))
     def __nonzero__(self):
+        if _isArrayValue(self.value):
+            raise ValueError("the truth value of a DerivVar with an "
+                             "array value is ambiguous")
         return self.value != 0
 
     def __add__(self, other):
@@ -153,19 +194,21 @@ class DerivVar:
     def __mul__(self, other):
         return DerivVar(self.value*other.value,
                         _mapderiv(lambda a,b: a+b,
-                                  map(lambda x,f=other.value:f*x, self.deriv),
-                                  map(lambda x,f=self.value:f*x, other.deriv)))
+                                  _scale(other.value, self.deriv),
+                                  _scale(self.value, other.deriv)))
     __rmul__ = __mul__
 
     def __div__(self, other):
-        if not other.value:
+        if isinstance(other.value, N.ArrayType):
+            if N.sometrue(N.ravel(other.value == 0)):
+                raise ZeroDivisionError('DerivVar division')
+        elif not other.value:
             raise ZeroDivisionError('DerivVar division')
         inv = 1./other.value
         return DerivVar(self.value*inv,
                         _mapderiv(lambda a,b: a-b,
-                                  map(lambda x,f=inv: f*x, self.deriv),
-                                  map(lambda x,f=self.value*inv*inv: f*x,
-                                      other.deriv)))
+                                  _scale(inv, self.deriv),
+                                  _scale(self.value*inv*inv, other.deriv)))
     def __rdiv__(self, other):
         return other/self
 
@@ -176,10 +219,9 @@ class DerivVar:
             raise TypeError('DerivVar does not support ternary pow()')
         val1 = pow(self.value, other.value-1)
         val = val1*self.value
-        deriv1 = map(lambda x, f=val1*other.value: f*x, self.deriv)
-        if isDerivVar(other) and len(other.deriv) > 0:
-            deriv2 = map(lambda x, f=val*Numeric.log(self.value): f*x,
-                         other.deriv)
+        deriv1 = _scale(val1*other.value, self.deriv)
+        if isDerivVar(other) and _nvars(other.deriv) > 0:
+            deriv2 = _scale(val*Numeric.log(self.value), other.deriv)
             return DerivVar(val, _mapderiv(lambda a,b: a+b, deriv1, deriv2))
         else:
             return DerivVar(val, deriv1)
@@ -189,72 +231,72 @@ class DerivVar:
 
     def exp(self):
         v = Numeric.exp(self.value)
-        return DerivVar(v, map(lambda x, f=v: f*x, self.deriv))
+        return DerivVar(v, _scale(v, self.deriv))
 
     def log(self):
         v = Numeric.log(self.value)
         d = 1./self.value
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def log10(self):
         v = Numeric.log10(self.value)
         d = 1./(self.value * Numeric.log(10))
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def sqrt(self):
         v = Numeric.sqrt(self.value)
         d = 0.5/v
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def sign(self):
-        if self.value == 0:
+        if N.sometrue(N.ravel(N.equal(self.value, 0))):
             raise ValueError("can't differentiate sign() at zero")
-        return DerivVar(Numeric.sign(self.value), 0)
+        return DerivVar(Numeric.sign(self.value), _scale(0, self.deriv))
 
     def sin(self):
         v = Numeric.sin(self.value)
         d = Numeric.cos(self.value)
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def cos(self):
         v = Numeric.cos(self.value)
         d = -Numeric.sin(self.value)
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def tan(self):
         v = Numeric.tan(self.value)
         d = 1.+pow(v,2)
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def sinh(self):
         v = Numeric.sinh(self.value)
         d = Numeric.cosh(self.value)
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def cosh(self):
         v = Numeric.cosh(self.value)
         d = Numeric.sinh(self.value)
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def tanh(self):
         v = Numeric.tanh(self.value)
         d = 1./pow(Numeric.cosh(self.value),2)
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def arcsin(self):
         v = Numeric.arcsin(self.value)
         d = 1./Numeric.sqrt(1.-pow(self.value,2))
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def arccos(self):
         v = Numeric.arccos(self.value)
         d = -1./Numeric.sqrt(1.-pow(self.value,2))
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def arctan(self):
         v = Numeric.arctan(self.value)
         d = 1./(1.+pow(self.value,2))
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
     def arctan2(self, other):
         den = self.value*self.value+other.value*other.value
@@ -262,14 +304,14 @@ class DerivVar:
         o = other.value/den
         return DerivVar(Numeric.arctan2(self.value, other.value),
                         _mapderiv(lambda a, b: a-b,
-                                  map(lambda x, f=o: f*x, self.deriv),
-                                  map(lambda x, f=s: f*x, other.deriv)))
+                                  _scale(o, self.deriv),
+                                  _scale(s, other.deriv)))
 
     def gamma(self):
         from transcendental import gamma, psi
         v = gamma(self.value)
         d = v*psi(self.value)
-        return DerivVar(v, map(lambda x, f=d: f*x, self.deriv))
+        return DerivVar(v, _scale(d, self.deriv))
 
 # Type check
 
@@ -281,18 +323,60 @@ def isDerivVar(x):
     """
     return hasattr(x,'value') and hasattr(x,'deriv')
 
-# Map a binary function on two first derivative lists
+# Map a binary function on two first derivative lists or arrays
 
 def _mapderiv(func, a, b):
+    if isinstance(a, N.ArrayType) or isinstance(b, N.ArrayType):
+        a = _derivArray(a)
+        b = _derivArray(b)
+        nvars = max(a.shape[-1], b.shape[-1])
+        return func(_pad(a, nvars), _pad(b, nvars))
     nvars = max(len(a), len(b))
     a = a + (nvars-len(a))*[0]
     b = b + (nvars-len(b))*[0]
     return map(func, a, b)
 
+# Multiply a first derivative list or array by a factor
+
+def _scale(factor, deriv):
+    if isinstance(deriv, N.ArrayType):
+        return N.asarray(factor)[..., N.NewAxis]*deriv
+    return map(lambda x, f=factor: f*x, deriv)
+
+# Test for values of array mode that are not scalars
+
+def _isArrayValue(value):
+    return isinstance(value, N.ArrayType) and len(value.shape) > 0
+
+# Number of variables in a first derivative list or array
+
+def _nvars(deriv):
+    if isinstance(deriv, N.ArrayType):
+        return deriv.shape[-1]
+    return len(deriv)
+
+# Helper functions for array mode. The variable index is the last
+# axis of a derivative array, the leading axes match the value shape.
+
+def _derivArray(deriv):
+    if isinstance(deriv, N.ArrayType):
+        return deriv
+    if len(deriv) == 0:
+        return N.zeros((0,), N.Float)
+    deriv = N.array(deriv)
+    return N.transpose(deriv, range(1, len(deriv.shape)) + [0])
+
+def _pad(deriv, nvars):
+    if deriv.shape[-1] == nvars:
+        return deriv
+    padding = N.zeros(deriv.shape[:-1] + (nvars-deriv.shape[-1],),
+                      deriv.dtype.char)
+    return N.concatenate([deriv, padding], -1)
+
 
 # Define vector of DerivVars
 
-def DerivVector(x, y, z, index=0):
+def DerivVector(x, y, z, index=0, nvars=None):
 
     """
     @param x: x component of the vector
@@ -304,6 +388,9 @@ def DerivVector(x, y, z, index=0):
     @param index: the DerivVar index for the x component. The y and z
                   components receive consecutive indices.
     @type index: C{int}
+    @param nvars: the total number of variables. If specified, the
+                  components are created in array mode.
+    @type nvars: C{int}
     @return: a vector whose components are DerivVar objects
     @rtype: L{Scientific.Geometry.Vector}
     """
@@ -312,9 +399,9 @@ def DerivVector(x, y, z, index=0):
     if isDerivVar(x) and isDerivVar(y) and isDerivVar(z):
         return Vector(x, y, z)
     else:
-        return Vector(DerivVar(x, index),
-                      DerivVar(y, index+1),
-                      DerivVar(z, index+2))
+        return Vector(DerivVar(x, index, 1, nvars),
+                      DerivVar(y, index+1, 1, nvars),
+                      DerivVar(z, index+2, 1, nvars))
 
 # Functions with derivatives
 
@@ -341,27 +428,27 @@ class DerivFn(object):
         Apply the function to the supplied arguments. The number of arguments
         must be equal to the number of derivative functions given in the
         constructor. The arguments can be plain numbers or DerivVar objects.
-        The return value is a DerivVar object.
+        The return value is a DerivVar object. For DerivVar arguments in
+        array mode, the function and its derivative functions are called
+        with array arguments and must therefore accept arrays.
         """
         assert len(args) == len(self.deriv_fns)
         values = []
         derivs = []
-        nderivs = 0
         for x in args:
             if isinstance(x, DerivVar):
                 values.append(x.value)
                 derivs.append(x.deriv)
-                nderivs = max(nderivs, len(x.deriv))
             else:
                 values.append(x)
                 derivs.append([])
-        derivs = [d+(nderivs-len(d))*[0] for d in derivs]
         v = self.fn(*values)
-        d = [f(*values) for f in self.deriv_fns]
-        rderivs = nderivs*[0]
-        for i in range(len(d)):
-            rderivs = [r+d[i]*x for (r, x) in zip(rderivs, derivs[i])]
-        if rderivs:
+        rderivs = []
+        for f, deriv in zip(self.deriv_fns, derivs):
+            if _nvars(deriv) > 0:
+                rderivs = _mapderiv(lambda a, b: a+b, rderivs,
+                                    _scale(f(*values), deriv))
+        if _nvars(rderivs) > 0:
             return DerivVar(v, rderivs)
         else:
             return v
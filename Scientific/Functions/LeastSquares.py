@@ -26,11 +26,19 @@ Usage example::
         return 1e13*exp(-param[0]/t)
 
     print leastSquaresFit(f2, (3000.,), data_quantum)
+
+For large data sets, the data can be given as arrays and the model
+evaluated for all points in a single call::
+
+    t = N.array([100., 200., 300., 400.])
+    y = N.array([4.999e-8, 5.307e+2, 1.289e+6, 6.559e+7])
+    print leastSquaresFit(f, (1e13,4700), (t, y), vectorized=True)
 """
 
 from Scientific import N, LA
-from FirstDerivatives import DerivVar
+from FirstDerivatives import DerivVar, isDerivVar
 from Scientific import IterationCountExceededError
+import numpy as np
 
 def _chiSquare(model, parameters, data):
     n_param = len(parameters)
@@ -46,9 +54,33 @@ def _chiSquare(model, parameters, data):
         alpha = alpha + d[:,N.NewAxis]*d
     return chi_sq, alpha
 
+def _chiSquareArray(model, parameters, x, y, sigma, jacobian=None):
+    if jacobian is None:
+        f = model(parameters, x)
+        if not isDerivVar(f):
+            raise ValueError('model does not depend on parameters')
+        values = f[0]
+        d = f[1]
+    else:
+        p = tuple([param[0] for param in parameters])
+        values = model(p, x)
+        d = N.asarray(jacobian(p, x))
+    shape = (len(y), len(parameters))
+    if d.shape != shape:
+        # Derivatives that are the same for all data points
+        if d.shape != shape[1:]:
+            raise ValueError('derivatives have shape %s instead of %s'
+                             % (str(d.shape), str(shape)))
+        d = d + N.zeros(shape)
+    d = d/sigma[:, N.NewAxis]
+    r = (values-y)/sigma
+    alpha = N.dot(N.transpose(d), d)
+    chi_sq = DerivVar(N.add.reduce(r*r), list(2.*N.dot(r, d)))
+    return chi_sq, alpha
+
 def leastSquaresFit(model, parameters, data, max_iterations=None,
                     stopping_limit = 0.005,
-                    validator = None):
+                    validator = None, vectorized = False, jacobian = None):
     """General non-linear least-squares fit using the
     X{Levenberg-Marquardt} algorithm and X{automatic differentiation}.
 
@@ -77,19 +109,62 @@ def leastSquaresFit(model, parameters, data, max_iterations=None,
         weight in the fitting procedure.
     @type data: C{list}
 
+    @param max_iterations: the maximum number of iterations. If
+        C{None} (the default), there is no limit.
+    @type max_iterations: C{int}
+
+    @param stopping_limit: the fit stops when the decrease of
+        chi-squared in one iteration is smaller than this value
+    @type stopping_limit: C{float}
+
+    @param validator: a function that is called with the parameter
+        values and returns C{False} if they are not acceptable. The
+        parameter step is then shortened until they are.
+    @type validator: callable
+
+    @param vectorized: if C{True}, the data is given as a tuple of
+        arrays C{(x, y)} or C{(x, y, sigma)} whose first dimension runs
+        over the data points, and the model is called once with the
+        array C{x} and must return an array of the same length as C{y}.
+        The values and the derivatives for all data points are then
+        obtained in one evaluation, using the array mode of
+        L{FirstDerivatives.DerivVar} unless a jacobian is given.
+    @type vectorized: C{bool}
+
+    @param jacobian: a function that is called with the same arguments
+        as the model, with plain numbers as fit parameters, and returns
+        the derivatives of the model with respect to the fit parameters
+        as an array of shape (number of data points, number of fit
+        parameters). The model is then also called with plain numbers.
+        Only used if C{vectorized} is C{True}.
+    @type jacobian: callable
+
     @returns: a list containing the optimal parameter values
         and the chi-squared value describing the quality of the fit
     @rtype: C{(list, float)}
     """
     n_param = len(parameters)
+    if vectorized:
+        x = data[0]
+        y = N.asarray(data[1])
+        if len(data) == 3:
+            sigma = N.asarray(data[2], N.Float)*N.ones(y.shape)
+        else:
+            sigma = N.ones(y.shape, N.Float)
+        chi_square = lambda p: _chiSquareArray(model, p, x, y,
+                                               sigma, jacobian)
+        nvars = n_param
+    else:
+        chi_square = lambda p: _chiSquare(model, p, data)
+        nvars = None
     p = ()
     i = 0
     for param in parameters:
-        p = p + (DerivVar(param, i),)
+        p = p + (DerivVar(param, i, 1, nvars),)
         i = i + 1
     id = N.identity(n_param)
     l = 0.001
-    chi_sq, alpha = _chiSquare(model, p, data)
+    chi_sq, alpha = chi_square(p)
     niter = 0
     while 1:
         delta = LA.solve_linear_equations(alpha+l*N.diagonal(alpha)*id,
@@ -99,7 +174,7 @@ def leastSquaresFit(model, parameters, data, max_iterations=None,
             while not validator(*next_p):
                 delta *= 0.8
                 next_p = map(lambda a,b: a+b, p, delta)
-        next_chi_sq, next_alpha = _chiSquare(model, next_p, data)
+        next_chi_sq, next_alpha = chi_square(next_p)
         if next_chi_sq > chi_sq:
             l = 10.*l
         else:
@@ -142,6 +217,236 @@ def polynomialLeastSquaresFit(parameters, data):
     return leastSquaresFit(_polynomialModel, parameters, data)
 
 
+#
+# Batched fits of one model to many independent data sets
+#
+def _chiSquareBatch(model, parameters, x, y, sigma, jacobian):
+    n_param = parameters.shape[1]
+    p = tuple([parameters[:, i:i+1] for i in range(n_param)])
+    if jacobian is None:
+        f = model(tuple([DerivVar(p[i], i, 1, n_param)
+                         for i in range(n_param)]), x)
+        if not isDerivVar(f):
+            raise ValueError('model does not depend on parameters')
+        values = f[0]
+        d = f[1]
+    else:
+        values = model(p, x)
+        d = np.asarray(jacobian(p, x))
+    shape = y.shape + (n_param,)
+    if d.shape != shape:
+        d = d + np.zeros(shape)
+    d = d/sigma[:, :, np.newaxis]
+    r = (values-y)/sigma
+    chi_sq = np.add.reduce(r*r, -1)
+    gradient = 2.*np.einsum('kn,kni->ki', r, d)
+    alpha = np.einsum('kni,knj->kij', d, d)
+    return chi_sq, gradient, alpha
+
+def _solveBatch(alpha, l, gradient):
+    n_param = alpha.shape[1]
+    diagonal = np.arange(n_param)
+    matrix = alpha.copy()
+    matrix[:, diagonal, diagonal] *= (1.+l)[:, np.newaxis]
+    rhs = -0.5*gradient[:, :, np.newaxis]
+    ok = np.ones((len(alpha),), np.bool_)
+    try:
+        delta = np.linalg.solve(matrix, rhs)[:, :, 0]
+    except np.linalg.LinAlgError:
+        # At least one system is singular, solve them one by one
+        delta = np.zeros(gradient.shape)
+        for k in range(len(matrix)):
+            try:
+                delta[k] = np.linalg.solve(matrix[k], rhs[k])[:, 0]
+            except np.linalg.LinAlgError:
+                ok[k] = False
+    return delta, ok
+
+def _batchFit(model, parameters, x, y, sigma, jacobian, x_per_problem,
+              max_iterations, stopping_limit):
+    nproblems = len(parameters)
+    p = parameters.copy()
+    chi_sq, gradient, alpha = _chiSquareBatch(model, p, x, y, sigma,
+                                              jacobian)
+    l = 0.001*np.ones((nproblems,), np.float)
+    converged = np.zeros((nproblems,), np.bool_)
+    active = np.arange(nproblems)
+    niter = 0
+    while len(active) > 0:
+        delta, ok = _solveBatch(alpha[active], l[active], gradient[active])
+        active = active[ok]
+        delta = delta[ok]
+        if len(active) == 0:
+            break
+        next_p = p[active] + delta
+        if x_per_problem:
+            xa = x[active]
+        else:
+            xa = x
+        next_chi_sq, next_gradient, next_alpha = \
+            _chiSquareBatch(model, next_p, xa, y[active], sigma[active],
+                            jacobian)
+        worse = next_chi_sq > chi_sq[active]
+        l[active[worse]] *= 10.
+        better = ~worse
+        l[active[better]] *= 0.1
+        done = better & (chi_sq[active] - next_chi_sq < stopping_limit)
+        update = active[better]
+        p[update] = next_p[better]
+        chi_sq[update] = next_chi_sq[better]
+        gradient[update] = next_gradient[better]
+        alpha[update] = next_alpha[better]
+        converged[active[done]] = True
+        active = active[~done]
+        niter = niter + 1
+        if max_iterations is not None and niter == max_iterations:
+            break
+    return p, chi_sq, converged
+
+def _batchFitTask(args):
+    return _batchFit(*args)
+
+def batchedLeastSquaresFit(model, parameters, data, max_iterations=None,
+                           stopping_limit = 0.005, jacobian = None,
+                           nthreads = None, pool = None, chunk_size = None):
+    """Non-linear least-squares fits of one model to many independent
+    data sets, using the X{Levenberg-Marquardt} algorithm and
+    X{automatic differentiation}.
+
+    The K fit problems are handled together: each iteration evaluates
+    the model once for all problems that have not yet converged and
+    solves all their normal equations in one stacked call. Damping
+    and convergence are tracked separately for each problem.
+
+    @param model: the function to be fitted. It is called with two
+        parameters: a tuple containing all fit parameters, each of them
+        an array of shape (K', 1), and the array of independent variables
+        of the corresponding K' problems (or the shared array, see below).
+        It must return an array of shape (K', N). The automatic
+        derivatives are obtained in the array mode of
+        L{FirstDerivatives.DerivVar}, so the function may only use the
+        mathematical functions known to the module FirstDerivatives.
+    @type model: callable
+
+    @param parameters: the initial values for the fit parameters, either
+        a sequence of numbers used for all problems or an array of shape
+        (K, number of fit parameters)
+    @type parameters: sequence or C{N.array}
+
+    @param data: a tuple of arrays C{(x, y)} or C{(x, y, sigma)}. C{y}
+        has shape (K, N) and contains the N data values of each problem.
+        C{sigma} must have a shape compatible with (K, N). If C{x} is an
+        array whose shape starts with (K, N), each problem has its own
+        independent variables, otherwise C{x} is shared by all problems.
+    @type data: C{tuple}
+
+    @param max_iterations: the maximum number of iterations. Problems
+        that have not converged after this number of iterations are
+        reported in the returned convergence mask. If C{None} (the
+        default), there is no limit.
+    @type max_iterations: C{int}
+
+    @param stopping_limit: the fit of a problem stops when the decrease
+        of its chi-squared in one iteration is smaller than this value
+    @type stopping_limit: C{float}
+
+    @param jacobian: a function that is called with the same arguments
+        as the model, with arrays instead of DerivVar objects as fit
+        parameters, and returns the derivatives of the model with
+        respect to the fit parameters as an array of shape
+        (K', N, number of fit parameters)
+    @type jacobian: callable
+
+    @param nthreads: if not C{None}, the problems are divided into
+        chunks that are fitted in parallel by a
+        L{Scientific.Threading.TaskManager.TaskManager} with this number
+        of threads
+    @type nthreads: C{int}
+
+    @param pool: a process pool, e.g. a C{multiprocessing.Pool}, whose
+        C{map} method is used to fit chunks of problems in parallel. The
+        model and the jacobian must then be picklable, i.e. functions
+        defined at the top level of a module.
+
+    @param chunk_size: the number of problems per chunk for parallel
+        execution. The default divides the problems evenly over the
+        threads or the processors.
+    @type chunk_size: C{int}
+
+    @returns: the optimal parameter values (array of shape (K, number of
+        fit parameters)), the chi-squared values (array of shape (K,)),
+        and a boolean array of shape (K,) that is C{False} for problems
+        that did not converge
+    @rtype: C{tuple}
+    """
+    y = np.asarray(data[1], np.float)
+    if len(y.shape) != 2:
+        raise ValueError('y must be an array of shape (K, N)')
+    nproblems = y.shape[0]
+    x = data[0]
+    x_per_problem = np.shape(x)[:2] == y.shape
+    if x_per_problem:
+        x = np.asarray(x)
+    if len(data) == 3:
+        sigma = np.asarray(data[2], np.float) + np.zeros(y.shape)
+    else:
+        sigma = np.ones(y.shape, np.float)
+    parameters = np.asarray(parameters, np.float)
+    if len(parameters.shape) == 1:
+        parameters = parameters + np.zeros((nproblems, len(parameters)))
+    if nthreads is None and pool is None:
+        return _batchFit(model, parameters, x, y, sigma, jacobian,
+                         x_per_problem, max_iterations, stopping_limit)
+    if chunk_size is None:
+        if nthreads is None:
+            import multiprocessing
+            nchunks = multiprocessing.cpu_count()
+        else:
+            nchunks = nthreads
+        chunk_size = max(1, (nproblems+nchunks-1)/nchunks)
+    tasks = []
+    for first in range(0, nproblems, chunk_size):
+        chunk = slice(first, first+chunk_size)
+        if x_per_problem:
+            xc = x[chunk]
+        else:
+            xc = x
+        tasks.append((model, parameters[chunk], xc, y[chunk], sigma[chunk],
+                      jacobian, x_per_problem, max_iterations,
+                      stopping_limit))
+    if pool is not None:
+        results = pool.map(_batchFitTask, tasks)
+    else:
+        from Scientific.Threading.TaskManager import TaskManager
+        results = len(tasks)*[None]
+        def run(i, lock):
+            results[i] = _batchFitTask(tasks[i])
+        manager = TaskManager(nthreads)
+        for i in range(len(tasks)):
+            manager.runTask(run, (i,))
+        manager.terminate()
+        if None in results:
+            raise ValueError('fit failed in a parallel task')
+    return tuple([np.concatenate([r[i] for r in results])
+                  for i in range(3)])
+
+def batchedPolynomialLeastSquaresFit(parameters, data, **options):
+    """
+    Least-squares fits of polynomials to many independent data sets.
+    The order of the polynomials is defined by the number of parameter
+    values.
+
+    @param parameters: the initial values of the polynomial
+        coefficients, as for L{batchedLeastSquaresFit}
+    @param data: the data arrays, as for L{batchedLeastSquaresFit}
+    @param options: keyword arguments passed on to
+        L{batchedLeastSquaresFit}
+    @returns: see L{batchedLeastSquaresFit}
+    """
+    return batchedLeastSquaresFit(_polynomialModel, parameters, data,
+                                  **options)
+
+
 # Test code
 
 if __name__ == '__main__':
@@ -10,6 +10,7 @@ Polynomials in any number of variables
 
 from Scientific import N, LA; Numeric = N; LinearAlgebra = LA
 from Scientific.indexing import index_expression
+import numpy as np
 
 # Class definition
 
@@ -37,17 +38,23 @@ class Polynomial:
     def __call__(self, *args):
         """
         @param args: tuple of values, one for each variable of the
-            polynomial
-        @type args: C{tuple} of numbers
-        @returns: the value of the polynomial at the given point
-        @rtype: number
+            polynomial. The values can be arrays of compatible shapes,
+            the polynomial is then evaluated for all elements using
+            X{Horner}'s scheme.
+        @type args: C{tuple} of numbers or arrays
+        @returns: the value of the polynomial at the given point(s)
+        @rtype: number or array
         @raise TypeError: if the number of arguments is not equal
             to the number of variable of the polynomial
         """
         if len(args) != self.dim:
             raise TypeError('Wrong number of arguments')
-        p = _powers(args, self.coeff.shape)
-        return Numeric.add.reduce(Numeric.ravel(p*self.coeff))
+        arrays = [np.asarray(x) for x in args]
+        if [x for x in arrays if x.dtype.char == 'O']:
+            # Arbitrary number types such as DerivVar
+            p = _powers(args, self.coeff.shape)
+            return Numeric.add.reduce(Numeric.ravel(p*self.coeff))
+        return _horner(self.coeff, arrays)
 
     def __repr__(self):
         if self.dim == 1:
@@ -152,43 +159,138 @@ class Polynomial:
         """
         if self.dim != 1:
             raise ValueError("not implemented")
-        n = len(self.coeff)-1
-        if n == 0:
-            return Numeric.array([])
-        a = Numeric.zeros_st((n, n), self.coeff)
-        if n > 1:
-            a[1:, :-1] = Numeric.identity(n-1)
-        a[:, -1] = -self.coeff[:-1]/self.coeff[-1]
-        from Scientific.LA import eigenvalues
-        return eigenvalues(a)
+        return polynomialZeros(self.coeff[Numeric.NewAxis])[0]
+
+# Zeros of many polynomials of the same order
+
+def polynomialZeros(coefficients):
+    """
+    Find the X{zeros} (X{roots}) of many polynomials of the same order
+    in one variable by diagonalization of the associated Frobenius
+    matrices. All matrices are diagonalized in a single call.
+
+    @param coefficients: a two-dimensional array. C{coefficients[k, i]}
+        is the coefficient of M{x^i} in polynomial number k. The
+        highest-order coefficients must not be zero.
+    @type coefficients: C{Numeric.array}
+    @returns: an array of shape (number of polynomials, order)
+        containing the zeros
+    @rtype: C{Numeric.array}
+    """
+    coefficients = np.asarray(coefficients)
+    npoly = coefficients.shape[0]
+    n = coefficients.shape[1]-1
+    if n == 0:
+        return np.zeros((npoly, 0))
+    a = np.zeros((npoly, n, n), coefficients.dtype)
+    if n > 1:
+        a[:, 1:, :-1] = np.identity(n-1)
+    a[:, :, -1] = -coefficients[:, :-1]/coefficients[:, -1:]
+    return np.linalg.eigvals(a)
+
+# Least-squares polynomial fits
+
+class PolynomialFit:
+
+    """X{Least-squares} X{polynomial} fits on a fixed set of points
+
+    The QR factorization of the design matrix is computed only once,
+    such that fits of many sets of values on the same points are cheap.
+    The factorization is kept only as long as the PolynomialFit object.
+    """
+
+    def __init__(self, order, points):
+        """
+        @param order: the order of the polynomial, or a tuple of
+            orders for a polynomial in several variables
+        @type order: C{int} or C{tuple} of C{int}
+        @param points: the points at which values will be given. For a
+            polynomial in several variables, each point is a sequence
+            of coordinates.
+        @type points: sequence
+        @raise ValueError: if order and points are inconsistent or if
+            there are not enough points for a fit
+        """
+        if type(order) != type(()):
+            order = (order,)
+        self.order = tuple(map(lambda n: n+1, order))
+        if not _isSequence(points[0]):
+            points = map(lambda p: (p,), points)
+        if len(self.order) != len(points[0]):
+            raise ValueError('Inconsistent arguments')
+        if Numeric.multiply.reduce(self.order) > len(points):
+            raise ValueError('Not enough points')
+        self.npoints = len(points)
+        matrix = _vandermonde(np.array(points, np.float), self.order)
+        q, r = np.linalg.qr(matrix)
+        diagonal = np.fabs(np.diagonal(r))
+        if np.minimum.reduce(diagonal) > \
+               1.e-10*np.maximum.reduce(diagonal):
+            self.q = np.transpose(q).copy()
+            self.r = r
+            self.inverse = None
+        else:
+            # Rank-deficient matrix: use the pseudo-inverse
+            self.inverse = LinearAlgebra.generalized_inverse(matrix)
+
+    def __call__(self, values):
+        """
+        @param values: the values at the points given at construction
+        @type values: sequence of numbers
+        @returns: the polynomial that fits the values best in the
+            least-squares sense
+        @rtype: L{Polynomial}
+        @raise ValueError: if the number of values differs from the
+            number of points
+        """
+        if len(values) != self.npoints:
+            raise ValueError('Inconsistent arguments')
+        values = Numeric.array(values)
+        if self.inverse is None:
+            coeff = np.linalg.solve(self.r, np.dot(self.q, values))
+        else:
+            coeff = np.dot(self.inverse, values)
+        return Polynomial(Numeric.reshape(coeff, self.order))
 
 # Polynomial fit constructor for use in module Interpolation
 
 def _fitPolynomial(order, points, values):
     if len(points) != len(values):
         raise ValueError('Inconsistent arguments')
-    if type(order) != type(()):
-        order = (order,)
-    order = tuple(map(lambda n: n+1, order))
-    if not _isSequence(points[0]):
-        points = map(lambda p: (p,), points)
-    if len(order) != len(points[0]):
-        raise ValueError('Inconsistent arguments')
-    if Numeric.multiply.reduce(order) > len(points):
-        raise ValueError('Not enough points')
-    matrix = []
-    for p in points:
-        matrix.append(Numeric.ravel(_powers(p, order)))
-    matrix = Numeric.array(matrix)
-    values = Numeric.array(values)
-    inv = LinearAlgebra.generalized_inverse(matrix)
-    coeff = Numeric.dot(inv, values)
-    #coeff = LinearAlgebra.linear_least_squares(matrix, values)[0]
-    coeff = Numeric.reshape(coeff, order)
-    return Polynomial(coeff)
+    return PolynomialFit(order, points)(values)
 
 # Helper functions
 
+def _vandermonde(points, order):
+    # The rows of the result are ravel(_powers(p, order)) for the
+    # points p (the rows of the array points).
+    matrix = np.ones((len(points), 1), np.float)
+    for i in range(len(order)):
+        powers = points[:, i:i+1]**np.arange(order[i])
+        matrix = np.reshape(matrix[:, :, np.newaxis] *
+                            powers[:, np.newaxis, :], (len(points), -1))
+    return matrix
+
+def _horner(coeff, args):
+    # Evaluate the polynomial with coefficient array coeff for the
+    # (broadcasted) array arguments args. The innermost loop runs over
+    # the last variable. The point axes are kept behind the remaining
+    # coefficient axes.
+    x = np.broadcast_arrays(*args)
+    shape = x[0].shape
+    npoints = int(np.multiply.reduce(shape))
+    x = [np.ravel(a) for a in x]
+    c = coeff[..., np.newaxis]
+    for i in range(len(x)-1, -1, -1):
+        r = c[..., -1, :]
+        for k in range(c.shape[-2]-2, -1, -1):
+            r = r*x[i] + c[..., k, :]
+        c = r
+    r = c + np.zeros((npoints,), c.dtype)
+    if len(shape) == 0:
+        return r[0]
+    return np.reshape(r, shape)
+
 def _powers(x, n):
     p = 1.
     index = index_expression[::] + \
@@ -8,8 +8,9 @@
 Rational functions in one variable
 """
 
-from Polynomial import Polynomial
+from Polynomial import Polynomial, polynomialZeros, _horner
 from Scientific import N; Numeric = N
+import numpy as np
 
 class RationalFunction:
 
@@ -42,11 +43,27 @@ class RationalFunction:
         else:
             self.denominator = Polynomial(denominator)
         self._normalize()
+        self._zeros = None
+        self._poles = None
 
     is_rational_function = 1
 
     def __call__(self, value):
-        return self.numerator(value)/self.denominator(value)
+        """
+        @param value: the value of the independent variable. Arrays
+            of real or complex numbers are evaluated element by element.
+            For elements with an absolute value larger than one, the
+            numerator and denominator are evaluated as polynomials in
+            the inverse value, avoiding overflow in high-order terms.
+        @type value: number or array
+        @returns: the value(s) of the rational function
+        @rtype: number or array
+        """
+        z = np.asarray(value)
+        if z.dtype.char == 'O':
+            # Arbitrary number types such as DerivVar
+            return self.numerator(value)/self.denominator(value)
+        return _evaluate(self.numerator.coeff, self.denominator.coeff, z)
 
     def __repr__(self):
         return "RationalFunction(%s,%s)" % (repr(list(self.numerator.coeff)),
@@ -157,7 +174,10 @@ class RationalFunction:
         @returns: an array containing the zeros
         @rtype: C{Numeric.array}
         """
-        return self.numerator.zeros()
+        # Instances pickled by earlier versions have no _zeros attribute
+        if getattr(self, '_zeros', None) is None:
+            self._zeros = self.numerator.zeros()
+        return self._zeros
 
     def poles(self):
         """
@@ -167,7 +187,96 @@ class RationalFunction:
         @returns: an array containing the poles
         @rtype: C{Numeric.array}
         """
-        return self.denominator.zeros()
+        if getattr(self, '_poles', None) is None:
+            self._poles = self.denominator.zeros()
+        return self._poles
+
+    def partialFractions(self):
+        """
+        Decompose the rational function into a polynomial and a sum
+        of X{partial fractions} M{r_i/(x-p_i)}, assuming that all
+        poles M{p_i} are simple.
+
+        @returns: the polynomial, the poles, and the residues M{r_i}
+        @rtype: (L{Scientific.Functions.Polynomial.Polynomial},
+            C{Numeric.array}, C{Numeric.array})
+        """
+        poly, poles, residues = \
+              partialFractions(self.numerator.coeff[Numeric.NewAxis],
+                               self.denominator.coeff[Numeric.NewAxis],
+                               self.poles()[Numeric.NewAxis])
+        return Polynomial(poly[0]), poles[0], residues[0]
+
+# Vectorized evaluation of a rational function
+
+def _evaluate(numerator, denominator, z):
+    if len(z.shape) == 0:
+        return _evaluate(numerator, denominator, z[np.newaxis])[0]
+    result = np.zeros(z.shape, np.result_type(z, numerator,
+                                              denominator, 1.))
+    small = np.abs(z) <= 1.
+    zs = z[small]
+    result[small] = _horner(numerator, [zs])/_horner(denominator, [zs])
+    large = ~small
+    if np.sometrue(large):
+        w = 1./z[large]
+        result[large] = _horner(numerator[::-1], [w]) \
+                        / _horner(denominator[::-1], [w]) \
+                        * w**(len(denominator)-len(numerator))
+    return result
+
+# Partial fraction expansion of many rational functions
+
+def partialFractions(numerators, denominators, poles=None):
+    """
+    Decompose many rational functions into polynomials and sums
+    of X{partial fractions} M{r_i/(x-p_i)}, assuming that all poles
+    M{p_i} are simple. All rational functions must have numerators
+    of the same order and denominators of the same order. The
+    operations are performed for all functions together.
+
+    @param numerators: a two-dimensional array. C{numerators[k, i]}
+        is the coefficient of M{x^i} in the numerator of the rational
+        function number k.
+    @type numerators: C{Numeric.array}
+    @param denominators: a two-dimensional array of the denominator
+        coefficients, whose highest-order coefficients must not be zero
+    @type denominators: C{Numeric.array}
+    @param poles: the poles of the rational functions (the zeros of the
+        denominators), if they are already known
+    @type poles: C{Numeric.array}
+    @returns: the coefficients of the polynomials, the poles, and
+        the residues M{r_i}, all as two-dimensional arrays whose
+        first index is the number of the rational function
+    @rtype: C{tuple} of C{Numeric.array}
+    """
+    numerators = np.asarray(numerators)
+    denominators = np.asarray(denominators)
+    if poles is None:
+        poles = polynomialZeros(denominators)
+    poles = np.asarray(poles)
+    order = denominators.shape[1]-1
+    remainder = np.array(numerators, np.result_type(numerators,
+                                                    denominators, 1.))
+    npoly = remainder.shape[1]-order
+    poly = np.zeros((remainder.shape[0], max(npoly, 1)), remainder.dtype)
+    for i in range(npoly-1, -1, -1):
+        q = remainder[:, -1]/denominators[:, -1]
+        poly[:, i] = q
+        remainder[:, -order-1:] -= q[:, np.newaxis]*denominators
+        remainder = remainder[:, :-1]
+    derivatives = denominators[:, 1:]*np.arange(1, order+1)
+    residues = _hornerStack(remainder, poles) \
+               / _hornerStack(derivatives, poles)
+    return poly, poles, residues
+
+def _hornerStack(coeff, x):
+    # Evaluate polynomial k with coefficients coeff[k] at the
+    # points x[k, :].
+    result = np.zeros(x.shape, np.result_type(coeff, x))
+    for i in range(coeff.shape[1]-1, -1, -1):
+        result = result*x + coeff[:, i:i+1]
+    return result
 
 
 # Test code
@@ -8,10 +8,36 @@
 #
 
 """
-Numerical integration using the Romberg algorithm
+Numerical integration using the Romberg algorithm and adaptive
+Gauss-Kronrod quadrature
+
+All integration routines accept an optional argument vectorized.
+If it is true, the function is called with an array of abscissas
+and must return an array of the corresponding function values.
+The abscissas are always along the last axis of this array. For
+L{trapezoid} and L{romberg}, the interval limits can then also be
+arrays, and the integrand can return values for many parameter
+values at once by broadcasting, yielding an array of integrals in
+a single call::
+
+  >>>from Scientific.Functions.Romberg import romberg
+  >>>from Scientific import N
+  >>>k = N.array([1., 2., 3.])[:, N.NewAxis]
+  >>>romberg(lambda x: N.sin(k*x), (0., N.pi), vectorized=True)
+
+  yields array([ 2.,  0.,  0.66666667])
 """
 
-def trapezoid(function, interval, numtraps):
+import numpy as np
+
+def _abscissas(lox, h, first, number):
+    # Return the abscissas lox + (first+i)*h for i in range(number)
+    # along a new last axis.
+    lox = np.asarray(lox, np.float)[..., np.newaxis]
+    h = np.asarray(h, np.float)[..., np.newaxis]
+    return lox + (first+np.arange(number))*h
+
+def trapezoid(function, interval, numtraps, vectorized=False):
     """
     Numerical X{integration} using the X{trapezoidal} rule
     
@@ -29,17 +55,25 @@ def trapezoid(function, interval, numtraps):
     @type interval: sequence of two C{float}s
     @param numtraps: the number of trapezoids
     @type numtraps: C{int}
+    @param vectorized: if C{True}, the function is evaluated once on
+        an array of all abscissas (see the module documentation)
+    @type vectorized: C{bool}
     @returns: the numerical integral of the function over the interval
     @rtype: number
     """
     lox, hix = interval
+    if vectorized:
+        h = (np.asarray(hix, np.float)-lox)/numtraps
+        values = function(_abscissas(lox, h, 0, numtraps+1))
+        sum = np.add.reduce(values, -1) - 0.5*(values[..., 0]+values[..., -1])
+        return h*sum
     h = float(hix-lox)/numtraps
     sum = 0.5*(function(lox)+function(hix))
     for i in range(1, numtraps):
         sum = sum + function(lox + i*h)
     return h*sum
 
-def _difftrap(function, interval, numtraps):
+def _difftrap(function, interval, numtraps, vectorized=False):
     # Perform part of the trapezoidal rule to integrate a function.
     # Assume that we had called _difftrap with all lower powers-of-2
     # starting with 1.  Calling _difftrap only returns the summation
@@ -50,9 +84,20 @@ def _difftrap(function, interval, numtraps):
     #                of integration.
     #     'numtraps' is the number of trapezoids to use (must be a
     #                power-of-2).
+    #     'vectorized' says if the function accepts an array of
+    #                abscissas.
     if numtraps<=0:
         print "numtraps must be > 0 in _difftrap()."
         return
+    elif vectorized:
+        if numtraps==1:
+            h = np.asarray(interval[1], np.float)-interval[0]
+            values = function(_abscissas(interval[0], h, 0, 2))
+            return 0.5*np.add.reduce(values, -1)
+        numtosum = numtraps/2
+        h = (np.asarray(interval[1], np.float)-interval[0])/numtosum
+        values = function(_abscissas(interval[0], h, 0.5, numtosum))
+        return np.add.reduce(values, -1)
     elif numtraps==1:
         return 0.5*(function(interval[0])+function(interval[1]))
     else:
@@ -70,7 +115,7 @@ def _romberg_diff(b, c, k):
     tmp = 4.0**k
     return (tmp * c - b)/(tmp - 1.0)
 
-def romberg(function, interval, accuracy=1.0E-7):
+def romberg(function, interval, accuracy=1.0E-7, vectorized=False):
     """
     Numerical X{integration} using the X{Romberg} method
     
@@ -88,9 +133,18 @@ def romberg(function, interval, accuracy=1.0E-7):
     @type interval: sequence of two C{float}s
     @param accuracy: convergence criterion (absolute error)
     @type accuracy: C{float}
+    @param vectorized: if C{True}, the function is evaluated once on
+        an array of all new abscissas in each refinement step (see the
+        module documentation). For arrays of integrals, the iteration
+        continues until all of them have converged.
+    @type vectorized: C{bool}
     @returns: the numerical integral of the function over the interval
     @rtype: number
+    @raise ValueError: if the vectorized iteration does not converge
+        within 20 refinement steps
     """
+    if vectorized:
+        return _rombergArray(function, interval, accuracy)
     i = n = 1
     intrange = interval[1] - interval[0]
     ordsum = _difftrap(function, interval, n)
@@ -110,6 +164,212 @@ def romberg(function, interval, accuracy=1.0E-7):
         i = i + 1
     return result
 
+# Maximal number of interval halvings in _rombergArray
+_max_refinements = 20
+
+def _rombergArray(function, interval, accuracy):
+    # Romberg integration with vectorized function evaluation. Only the
+    # last row of the tableau is kept; its elements can be arrays.
+    n = 1
+    intrange = np.asarray(interval[1], np.float) - interval[0]
+    ordsum = _difftrap(function, interval, n, True)
+    row = [intrange * ordsum]
+    for i in range(_max_refinements):
+        n = n * 2
+        ordsum = ordsum + _difftrap(function, interval, n, True)
+        new_row = [intrange * ordsum / n]
+        for k in range(len(row)):
+            new_row.append(_romberg_diff(row[k], new_row[k], k+1))
+        # Non-finite estimates cannot be improved by refinement; as in
+        # the scalar version, they are returned as they are.
+        finite = np.isfinite(row[-1])
+        new_row[-1] = np.where(finite, new_row[-1], row[-1])[()]
+        old_err = np.seterr(invalid='ignore')
+        try:
+            done = (np.abs(new_row[-1]-row[-1]) <= accuracy) | ~finite \
+                   | ~np.isfinite(new_row[-1])
+        finally:
+            np.seterr(**old_err)
+        if np.alltrue(np.ravel(done)):
+            return new_row[-1]
+        row = new_row
+    raise ValueError("Maximum number of refinements exceeded")
+
+#
+# Adaptive Gauss-Kronrod quadrature
+#
+# Nodes and weights of the 15-point Kronrod rule and the embedded
+# 7-point Gauss rule, from QUADPACK (routine qk15).
+#
+_kronrod_x = np.array([0.991455371120812639206854697526329,
+                       0.949107912342758524526189684047851,
+                       0.864864423359769072789712788640926,
+                       0.741531185599394439863864773280788,
+                       0.586087235467691130294144845693013,
+                       0.405845151377397166906606412076961,
+                       0.207784955007898467600689403773245,
+                       0.000000000000000000000000000000000])
+_kronrod_w = np.array([0.022935322010529224963732008058970,
+                       0.063092092629978553290700663189204,
+                       0.104790010322250183839876322541518,
+                       0.140653259715525918745189590510238,
+                       0.169004726639267902826583426598550,
+                       0.190350578064785409913256402421014,
+                       0.204432940075298892414161999234649,
+                       0.209482141084727828012999174891714])
+_gauss_w = np.array([0., 0.129484966168869693270611432679082,
+                     0., 0.279705391489276667901467771423780,
+                     0., 0.381830050505118944950369775488975,
+                     0., 0.417959183673469387755102040816327])
+_gk_nodes = np.concatenate([-_kronrod_x, _kronrod_x[-2::-1]])
+_gk_weights = np.concatenate([_kronrod_w, _kronrod_w[-2::-1]])
+_gk_gauss_weights = np.concatenate([_gauss_w, _gauss_w[-2::-1]])
+
+def _gaussKronrod15(function, lox, hix, parameters, vectorized):
+    # Apply the 15-point Kronrod rule to each of the intervals
+    # (lox[i], hix[i]) and return the integrals and error estimates.
+    center = 0.5*(lox+hix)
+    half_width = 0.5*(hix-lox)
+    x = center[:, np.newaxis] + half_width[:, np.newaxis]*_gk_nodes
+    if vectorized:
+        if parameters is None:
+            values = function(x)
+        else:
+            values = function(x, np.expand_dims(parameters, 1))
+    else:
+        if parameters is None:
+            values = [[function(xi) for xi in row] for row in x]
+        else:
+            values = [[function(xi, p) for xi in row]
+                      for row, p in zip(x, parameters)]
+        values = np.array(values, np.float)
+    kronrod = half_width*np.dot(values, _gk_weights)
+    gauss = half_width*np.dot(values, _gk_gauss_weights)
+    return kronrod, np.abs(kronrod-gauss)
+
+def gaussKronrod(function, interval, accuracy=1.0E-10, max_intervals=1000,
+                 vectorized=False, parameters=None):
+    """
+    Numerical X{integration} using adaptive X{Gauss-Kronrod} quadrature
+
+    The integration interval is subdivided until the sum of the error
+    estimates of the 15-point Kronrod rule on all subintervals is below
+    the requested accuracy. In each step, all subintervals whose error
+    estimate exceeds the average are bisected.
+
+    Many integrals can be computed in a single call, either by giving
+    arrays of interval limits or by giving an array of parameters for
+    the integrand, or both. Each integral is subdivided independently,
+    but the function is evaluated for all of them together if it is
+    vectorized.
+
+    Example::
+
+      >>>from Scientific.Functions.Romberg import gaussKronrod
+      >>>from Scientific.N import pi, tan
+      >>>gaussKronrod(tan, (0.0, pi/3.0))
+
+      yields (0.69314718055994506, 1.99e-11)
+
+    @param function: a function of one variable, or of two variables
+        if parameters are given
+    @type function: callable
+    @param interval: the lower and upper limit of the integration
+        interval. The limits can be one-dimensional arrays, yielding
+        one integral for each pair of limits.
+    @type interval: sequence of two C{float}s or arrays
+    @param accuracy: convergence criterion (absolute error)
+    @type accuracy: C{float}
+    @param max_intervals: the maximum number of subintervals for one
+        integral. If the accuracy is not reached with this number of
+        subintervals, the current estimate is returned together with
+        its error estimate.
+    @type max_intervals: C{int}
+    @param vectorized: if C{True}, the function is called with a
+        two-dimensional array of abscissas, whose first axis runs over
+        the subintervals and whose last axis runs over the abscissas
+        within a subinterval. It must return an array of the same shape.
+    @type vectorized: C{bool}
+    @param parameters: an array whose first axis runs over the
+        integrals to be computed. If given, the function is called with
+        a second argument containing the parameters for each subinterval.
+        In vectorized mode, this argument is the array of parameters for
+        all subintervals, with an additional axis of length one inserted
+        after the first one, such that it can be combined directly with
+        the array of abscissas.
+    @type parameters: C{N.array}
+    @returns: the numerical integral of the function over the interval
+        and an estimate of its absolute error. For arrays of interval
+        limits or for parameters, both are arrays.
+    @rtype: C{tuple}
+    """
+    lox = np.asarray(interval[0], np.float)
+    hix = np.asarray(interval[1], np.float)
+    batch = len(lox.shape) > 0 or len(hix.shape) > 0 \
+            or parameters is not None
+    shape = np.broadcast(lox, hix).shape
+    if parameters is not None:
+        parameters = np.asarray(parameters)
+        shape = np.broadcast(np.zeros(shape),
+                             np.zeros(parameters.shape[:1])).shape
+    if len(shape) == 0:
+        shape = (1,)
+    nintegrals = shape[0]
+    lox = lox + np.zeros(shape)
+    hix = hix + np.zeros(shape)
+    if parameters is not None and len(parameters) != nintegrals:
+        parameters = np.repeat(parameters, nintegrals, 0)
+    owner = np.arange(nintegrals)
+    result = np.zeros(shape, np.float)
+    error = np.zeros(shape, np.float)
+    value, err = _gaussKronrod15(function, lox, hix, parameters, vectorized)
+    while len(owner) > 0:
+        total = np.bincount(owner, value, nintegrals)
+        total_error = np.bincount(owner, err, nintegrals)
+        count = np.bincount(owner, None, nintegrals)
+        # Integrals with non-finite values cannot be improved
+        # by subdivision and are returned as they are.
+        done = ((total_error <= accuracy) | (count >= max_intervals)
+                | ~np.isfinite(total) | ~np.isfinite(total_error)) \
+               & (count > 0)
+        result[done] = total[done]
+        error[done] = total_error[done]
+        keep = ~done[owner]
+        owner = owner[keep]
+        if len(owner) == 0:
+            break
+        lox = lox[keep]
+        hix = hix[keep]
+        value = value[keep]
+        err = err[keep]
+        average = total_error/np.maximum(count, 1)
+        split = err >= average[owner]
+        # Always bisect the worst subinterval of each integral, such
+        # that the number of subintervals grows in every step.
+        order = np.lexsort((err, owner))
+        last = np.concatenate([owner[order][1:] != owner[order][:-1],
+                               [True]])
+        split[order[last]] = True
+        middle = 0.5*(lox[split]+hix[split])
+        new_lox = np.concatenate([lox[split], middle])
+        new_hix = np.concatenate([middle, hix[split]])
+        new_owner = np.concatenate([owner[split], owner[split]])
+        if parameters is None:
+            new_parameters = None
+        else:
+            new_parameters = parameters[new_owner]
+        new_value, new_err = _gaussKronrod15(function, new_lox, new_hix,
+                                             new_parameters, vectorized)
+        keep = ~split
+        lox = np.concatenate([lox[keep], new_lox])
+        hix = np.concatenate([hix[keep], new_hix])
+        owner = np.concatenate([owner[keep], new_owner])
+        value = np.concatenate([value[keep], new_value])
+        err = np.concatenate([err[keep], new_err])
+    if batch:
+        return result, error
+    return result[0], error[0]
+
 # Test code
 
 if __name__ == '__main__':
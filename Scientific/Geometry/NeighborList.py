@@ -0,0 +1,425 @@
+# Neighbor search by cell lists
+#
+
+"""
+Neighbor search for points in 3D space
+
+A L{NeighborList} sorts a set of points into cubic (or, for periodic
+systems, parallelepiped) cells whose size is at least the cutoff
+distance. Neighbors of a point are then found by looking only at
+the adjacent cells, which makes the cost of a pair search proportional
+to the number of points rather than to its square.
+
+Periodic boundary conditions are supported for arbitrary (triclinic)
+unit cells. The unit cell can be given as three edge vectors, as a
+L{Scientific.Geometry.Objects3D.BravaisLattice}, or obtained from the
+parameters of a PDB CRYST1 record using L{unitCellVectors}.
+
+Example::
+
+  >>> from Scientific.Geometry.NeighborList import NeighborList
+  >>> import numpy as np
+  >>> points = 10.*np.random.random((1000, 3))
+  >>> nlist = NeighborList(points, 1.5, skin=0.3, cell=3*[10.])
+  >>> pairs, distances = nlist.pairDistances()
+  >>> close_to_first = nlist.neighbors(points[0], 1.)
+"""
+
+from Scientific.Geometry import Vector
+import numpy as np
+
+def unitCellVectors(a, b, c, alpha=90., beta=90., gamma=90.):
+    """
+    @param a: the length of the first edge of the unit cell
+    @type a: C{float}
+    @param b: the length of the second edge of the unit cell
+    @type b: C{float}
+    @param c: the length of the third edge of the unit cell
+    @type c: C{float}
+    @param alpha: the angle between b and c, in degrees
+    @type alpha: C{float}
+    @param beta: the angle between a and c, in degrees
+    @type beta: C{float}
+    @param gamma: the angle between a and b, in degrees
+    @type gamma: C{float}
+    @returns: the three edge vectors of the unit cell, using the PDB
+              convention of a along x and b in the xy plane. The
+              parameters are those of a CRYST1 record, i.e. the
+              attributes a, b, c, alpha, beta, gamma of
+              L{Scientific.IO.PDB.Structure}.
+    @rtype: C{tuple} of three L{Scientific.Geometry.Vector}
+    """
+    alpha, beta, gamma = np.array([alpha, beta, gamma])*np.pi/180.
+    cos_alpha, cos_beta, cos_gamma = np.cos([alpha, beta, gamma])
+    sin_gamma = np.sin(gamma)
+    cx = c*cos_beta
+    cy = c*(cos_alpha-cos_beta*cos_gamma)/sin_gamma
+    cz = np.sqrt(c*c-cx*cx-cy*cy)
+    return (Vector(a, 0., 0.),
+            Vector(b*cos_gamma, b*sin_gamma, 0.),
+            Vector(cx, cy, cz))
+
+
+class NeighborList:
+
+    """
+    Cell list for neighbor search among a set of points
+
+    The list is built for a search range equal to the cutoff plus a
+    skin distance. As long as no point has moved by more than half
+    the skin since the last build, the list remains valid for all
+    distances up to the cutoff and L{update} only stores the new
+    positions. Larger displacements trigger a rebuild.
+    """
+
+    def __init__(self, points, cutoff, skin=0., cell=None):
+        """
+        @param points: the point coordinates
+        @type points: C{N.array} of shape (N, 3), or a sequence of
+                      L{Scientific.Geometry.Vector}
+        @param cutoff: the default distance cutoff for pair searches
+        @type cutoff: C{float}
+        @param skin: an additional distance included in the cell list
+                     that permits points to move by up to half its value
+                     without a rebuild
+        @type skin: C{float}
+        @param cell: the periodic unit cell, or C{None} for a
+                     non-periodic system. The unit cell can be
+                     specified by its three edge vectors, by three
+                     numbers (edge lengths of an orthorhombic cell),
+                     or by a L{Scientific.Geometry.Objects3D.BravaisLattice},
+                     whose total extent then defines the periodic box.
+        @raise ValueError: if the cutoff plus skin exceeds half the width
+                           of the periodic unit cell
+        """
+        self.cutoff = cutoff
+        self.skin = skin
+        self.range = cutoff + skin
+        self.box = _boxVectors(cell)
+        if self.box is not None:
+            self.inverse_box = np.linalg.inv(self.box)
+            volume = abs(np.linalg.det(self.box))
+            self.widths = volume / \
+                          np.sqrt(np.add.reduce(np.cross(self.box[[1, 2, 0]],
+                                                         self.box[[2, 0, 1]])**2,
+                                                axis=1))
+            if 2.*self.range > np.minimum.reduce(self.widths):
+                raise ValueError("cutoff plus skin exceeds half the "
+                                 "unit cell width")
+        self.build(points)
+
+    def build(self, points):
+        """
+        Rebuild the cell list for new point positions
+
+        @param points: the point coordinates
+        @type points: C{N.array} of shape (N, 3), or a sequence of
+                      L{Scientific.Geometry.Vector}
+        """
+        self.points = _pointArray(points)
+        self.reference_points = self.points.copy()
+        self.max_displacement = 0.
+        npoints = len(self.points)
+        if self.box is None:
+            if npoints > 0:
+                self.origin = np.minimum.reduce(self.points)
+                extent = np.maximum.reduce(self.points) - self.origin
+            else:
+                self.origin = np.zeros((3,), np.float)
+                extent = np.zeros((3,), np.float)
+            self.ncells = np.floor(extent/self.range).astype(np.int) + 1
+            self.cell_size = self.range + np.zeros((3,), np.float)
+            cells = np.floor((self.points-self.origin) /
+                             self.range).astype(np.int)
+        else:
+            self.ncells = np.maximum(1, np.floor(self.widths/self.range)
+                                     .astype(np.int))
+            self.cell_size = self.widths/self.ncells
+            fractional = np.dot(self.points, self.inverse_box)
+            fractional -= np.floor(fractional)
+            cells = np.floor(fractional*self.ncells).astype(np.int)
+        cells = np.minimum(cells, self.ncells-1)
+        cell_index = self._cellIndex(cells)
+        self.order = np.argsort(cell_index, kind='mergesort')
+        self.cell_of_point = cells
+        # Only occupied cells are stored, such that memory use depends
+        # on the number of points and not on the volume they occupy.
+        # cell_start[k] is the position in order of the first point in
+        # the occupied cell with index occupied[k].
+        sorted_cells = cell_index[self.order]
+        first = np.concatenate([[True], sorted_cells[1:] != sorted_cells[:-1]])
+        self.occupied = sorted_cells[first[:npoints]]
+        self.cell_start = np.concatenate([np.nonzero(first[:npoints])[0],
+                                          [npoints]])
+        self._candidates = None
+
+    def update(self, points):
+        """
+        Store new point positions, rebuilding the cell list only if
+        some point has moved by more than half the skin distance since
+        the last build.
+
+        @param points: the new point coordinates, in the same order as
+                       before
+        @type points: C{N.array} of shape (N, 3), or a sequence of
+                      L{Scientific.Geometry.Vector}
+        @returns: C{True} if the cell list was rebuilt
+        @rtype: C{bool}
+        """
+        points = _pointArray(points)
+        if points.shape != self.reference_points.shape:
+            self.build(points)
+            return True
+        # Points that were moved to a different periodic image count
+        # as large displacements, because the image translations
+        # stored with the pairs are no longer valid for them.
+        displacement = 0.
+        if len(points) > 0:
+            d = points-self.reference_points
+            displacement = np.sqrt(np.maximum.reduce(np.add.reduce(d**2,
+                                                                   axis=1)))
+        if 2.*displacement > self.skin:
+            self.build(points)
+            return True
+        self.points = points
+        self.max_displacement = displacement
+        return False
+
+    def pairs(self, cutoff=None):
+        """
+        @param cutoff: the distance cutoff, which may not exceed the
+                       cutoff given at construction. The default is
+                       the cutoff given at construction.
+        @type cutoff: C{float}
+        @returns: all pairs of point indices (i, j) with i < j
+                  whose distance is smaller than the cutoff
+        @rtype: C{N.array} of shape (M, 2)
+        """
+        return self.pairDistances(cutoff)[0]
+
+    def pairDistances(self, cutoff=None):
+        """
+        @param cutoff: the distance cutoff, which may not exceed the
+                       cutoff given at construction. The default is
+                       the cutoff given at construction.
+        @type cutoff: C{float}
+        @returns: all pairs of point indices (i, j) with i < j
+                  whose distance is smaller than the cutoff, and
+                  the corresponding distances
+        @rtype: C{tuple} of an integer C{N.array} of shape (M, 2)
+                and a float C{N.array} of shape (M,)
+        @raise ValueError: if cutoff is larger than the cutoff
+                           used for building the list
+        """
+        if cutoff is None:
+            cutoff = self.cutoff
+        if cutoff > self.cutoff:
+            raise ValueError("cutoff larger than neighbor list cutoff")
+        if self._candidates is None:
+            self._candidates = self._candidatePairs()
+        i, j, shifts = self._candidates
+        d = np.take(self.points, j, axis=0) - np.take(self.points, i, axis=0)
+        if shifts is not None:
+            d += shifts
+        d = np.sqrt(_lengthSq(d))
+        mask = d < cutoff
+        return np.transpose([i[mask], j[mask]]), d[mask]
+
+    def displacements(self, i, j):
+        """
+        @param i: point indices
+        @type i: C{N.array} of C{int}
+        @param j: point indices
+        @type j: C{N.array} of C{int}
+        @returns: the displacement vectors from points i to points j,
+                  using the minimum image convention in periodic systems
+        @rtype: C{N.array} of shape (len(i), 3)
+        """
+        return self._minimumImage(self.points[j]-self.points[i])
+
+    def neighbors(self, point, radius=None):
+        """
+        @param point: the center of the search sphere
+        @type point: L{Scientific.Geometry.Vector} or C{N.array}
+        @param radius: the search radius. The default is the cutoff
+                       given at construction.
+        @type radius: C{float}
+        @returns: the indices of all points whose distance from point
+                  is smaller than radius, in ascending order
+        @rtype: C{N.array} of C{int}
+        @raise ValueError: if the search radius exceeds half the width
+                           of the periodic unit cell
+        """
+        if radius is None:
+            radius = self.cutoff
+        point = np.array(getattr(point, 'array', point), np.float)
+        search = radius + self.max_displacement
+        if self.box is None:
+            center = np.floor((point-self.origin)/self.range).astype(np.int)
+        else:
+            if 2.*search > np.minimum.reduce(self.widths):
+                raise ValueError("search radius exceeds half the "
+                                 "unit cell width")
+            fractional = np.dot(point, self.inverse_box)
+            fractional -= np.floor(fractional)
+            center = np.minimum(np.floor(fractional*self.ncells)
+                                .astype(np.int), self.ncells-1)
+        extent = np.ceil(search/self.cell_size).astype(np.int)
+        cells = self._cellIndex(self._neighborCells(center[np.newaxis, :],
+                                                    extent)[1])
+        start, count = self._cellRanges(cells)
+        candidates = self.order[_ranges(start, count)]
+        d = self._minimumImage(self.points[candidates]-point)
+        d = np.add.reduce(d**2, axis=1)
+        return np.sort(candidates[d < radius*radius])
+
+    def _candidatePairs(self):
+        # All pairs (i, j) with i < j whose distance at the last build
+        # was smaller than the list range, plus the lattice translation
+        # that must be added to points[j]-points[i] to obtain the
+        # displacement of the nearest image (None for non-periodic
+        # systems). Only half of the adjacent cells are examined for
+        # each cell, such that every cell pair is treated once.
+        x = self.reference_points[self.order]
+        if self.box is None:
+            xw = x
+        else:
+            xw = x - np.dot(np.floor(np.dot(x, self.inverse_box)), self.box)
+            wrapping = xw - x
+        cells = self.cell_of_point[self.order]
+        index = np.arange(len(x))
+        range_sq = self.range*self.range
+        pi = []
+        pj = []
+        shifts = []
+        for offset in _half_shell:
+            neighbor = cells + offset
+            shift = None
+            if self.box is None:
+                valid = np.logical_and.reduce((neighbor >= 0)
+                                              & (neighbor < self.ncells),
+                                              axis=1)
+                neighbor[~valid] = 0
+            else:
+                wrap = np.floor_divide(neighbor, self.ncells)
+                neighbor -= wrap*self.ncells
+                if np.sometrue(wrap):
+                    shift = np.dot(wrap, self.box)
+            start, count = self._cellRanges(self._cellIndex(neighbor))
+            if not np.sometrue(offset):
+                count = start + count - (index + 1)
+                start = index + 1
+            if self.box is None:
+                count = np.where(valid, count, 0)
+            i = np.repeat(index, count)
+            j = _ranges(start, count)
+            d = np.take(xw, j, axis=0) - np.take(xw, i, axis=0)
+            if shift is not None:
+                shift = np.repeat(shift, count, axis=0)
+                d += shift
+            mask = _lengthSq(d) < range_sq
+            i = i[mask]
+            j = j[mask]
+            pi.append(i)
+            pj.append(j)
+            if self.box is not None:
+                image = np.take(wrapping, j, axis=0) \
+                        - np.take(wrapping, i, axis=0)
+                if shift is not None:
+                    image += shift[mask]
+                shifts.append(image)
+        i = self.order[np.concatenate(pi)]
+        j = self.order[np.concatenate(pj)]
+        swap = i > j
+        i, j = np.where(swap, j, i), np.where(swap, i, j)
+        if self.box is None:
+            return i, j, None
+        shifts = np.concatenate(shifts)
+        shifts[swap] = -shifts[swap]
+        return i, j, shifts
+
+    def _neighborCells(self, centers, extent):
+        # Returns the cells within extent of each center, as a pair
+        # (index of center, cell coordinates). In periodic systems,
+        # offsets that map to the same cell are included only once.
+        offsets = []
+        for axis in range(3):
+            o = np.arange(-extent[axis], extent[axis]+1)
+            if self.box is not None:
+                n = self.ncells[axis]
+                if len(o) >= n:
+                    o = np.arange(n)
+            offsets.append(o)
+        offsets = np.array(np.meshgrid(*offsets, indexing='ij'))
+        offsets = np.transpose(np.reshape(offsets, (3, -1)))
+        owner = np.repeat(np.arange(len(centers)), len(offsets))
+        cells = (centers[:, np.newaxis, :] + offsets).reshape((-1, 3))
+        if self.box is None:
+            mask = np.logical_and.reduce((cells >= 0) & (cells < self.ncells),
+                                         axis=1)
+            owner = owner[mask]
+            cells = cells[mask]
+        else:
+            cells = cells % self.ncells
+        return owner, cells
+
+    def _cellIndex(self, cells):
+        return (cells[..., 0]*self.ncells[1] + cells[..., 1])*self.ncells[2] \
+               + cells[..., 2]
+
+    def _cellRanges(self, cell_index):
+        # Returns the position in order of the first point in each
+        # cell and the number of points in it (zero for empty cells).
+        noccupied = len(self.occupied)
+        k = np.searchsorted(self.occupied, cell_index)
+        found = np.zeros(k.shape, np.bool)
+        inside = k < noccupied
+        found[inside] = self.occupied[k[inside]] == cell_index[inside]
+        start = self.cell_start[k]
+        end = self.cell_start[np.minimum(k+1, noccupied)]
+        return start, np.where(found, end-start, 0)
+
+    def _minimumImage(self, d):
+        if self.box is None:
+            return d
+        fractional = np.dot(d, self.inverse_box)
+        fractional -= np.around(fractional)
+        return np.dot(fractional, self.box)
+
+
+def _ranges(start, count):
+    # Concatenation of arange(s, s+c) for all (s, c) in zip(start, count)
+    total = np.add.reduce(count)
+    if total == 0:
+        return np.zeros((0,), np.int)
+    ends = np.cumsum(count)
+    shift = np.repeat(start - (ends-count), count)
+    return np.arange(total) + shift
+
+# Cell offsets (0, 0, 0) and the 13 offsets whose first non-zero
+# element is positive
+_half_shell = [np.array(offset)
+               for offset in [(i, j, k) for i in [-1, 0, 1]
+                                        for j in [-1, 0, 1]
+                                        for k in [-1, 0, 1]]
+               if offset >= (0, 0, 0)]
+
+def _lengthSq(d):
+    return d[:, 0]*d[:, 0] + d[:, 1]*d[:, 1] + d[:, 2]*d[:, 2]
+
+def _pointArray(points):
+    if len(points) > 0 and hasattr(points[0], 'array'):
+        points = [p.array for p in points]
+    points = np.array(points, np.float)
+    points.shape = (-1, 3)
+    return points
+
+def _boxVectors(cell):
+    if cell is None:
+        return None
+    if hasattr(cell, 'lattice_vectors'):
+        return np.array([(n*v).array for v, n in zip(cell.lattice_vectors,
+                                                      cell.cells)])
+    if len(cell) == 3 and np.isscalar(cell[0]):
+        return np.diag(np.array(cell, np.float))
+    return np.array([getattr(v, 'array', v) for v in cell], np.float)
@@ -355,18 +355,51 @@ def rotatePoint(point, axis, angle):
 #
 class Lattice:
 
-    def __init__(self, function):
-        if function is not None:
-            self.elements = map(function, self.elements)
+    """
+    Lattice base class
+
+    The lattice points are stored in the array attribute C{points}
+    of shape (N, 3). If a function was applied to the lattice, its
+    values are stored in C{values}, either as an array (if the function
+    was applied to the array of all points) or as a list. Individual
+    elements are created only when they are accessed.
+    """
+
+    def __init__(self, function, vectorized=False):
+        self.values = None
+        if function is None:
+            return
+        if vectorized:
+            values = N.asarray(function(self.points))
+            if values.shape[:1] != self.points.shape[:1]:
+                raise ValueError("vectorized function must return "
+                                 "one value per lattice point")
+            self.values = values
+        else:
+            self.values = [function(Vector(p)) for p in self.points]
+
+    def __getattr__(self, attr):
+        # The list of elements is created only on demand, e.g. when an
+        # element is replaced. Element access works without it.
+        if attr == 'elements':
+            self.elements = [self[i] for i in range(len(self))]
+            return self.elements
+        raise AttributeError(attr)
 
     def __getitem__(self, item):
-        return self.elements[item]
+        if 'elements' in self.__dict__:
+            return self.elements[item]
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        if self.values is None:
+            return Vector(self.points[item])
+        return self.values[item]
 
     def __setitem__(self, item, value):
         self.elements[item] = value
 
     def __len__(self):
-        return len(self.elements)
+        return len(self.points)
 
 #
 # General rhombic lattice
@@ -383,7 +416,7 @@ class RhombicLattice(Lattice):
     """
 
     def __init__(self, elementary_cell, lattice_vectors, cells,
-                 function=None, base=None):
+                 function=None, base=None, vectorized=False):
         """
         @param elementary_cell: a list of the points in the elementary cell
         @type elementary_cell: C{list} of L{Scientific.Geometry.Vector}
@@ -404,24 +437,39 @@ class RhombicLattice(Lattice):
         
         @param base: an offset added to all lattice points
         @type base: L{Scientific.Geometry.Vector}
+
+        @param vectorized: if C{True}, function is called only once with
+                           the array of all lattice points (shape (N, 3))
+                           and must return an array whose first dimension
+                           is N, element i being the value for point i.
+                           By default, function is called once for each
+                           point with a L{Scientific.Geometry.Vector}
+                           argument.
+        @type vectorized: C{bool}
         """
         if len(lattice_vectors) != len(cells):
             raise TypeError('Inconsistent dimension specification')
         if base is None:
             base = Vector(0, 0, 0)
         self.dimension = len(lattice_vectors)
-        self.elements = []
-        self.makeLattice(elementary_cell, lattice_vectors, cells, base)
-        Lattice.__init__(self, function)
+        self.lattice_vectors = lattice_vectors
+        self.cells = cells
+        self.points = self.makeLattice(elementary_cell, lattice_vectors,
+                                       cells, base)
+        Lattice.__init__(self, function, vectorized)
 
     def makeLattice(self, elementary_cell, lattice_vectors, cells, base):
+        # The points are ordered as in a nested loop over the cells,
+        # with the elementary cell points varying fastest.
+        cell = N.array([p.array for p in elementary_cell])
+        cell.shape = (len(elementary_cell), 3)
         if len(cells) == 0:
-            for p in elementary_cell:
-                self.elements.append(p+base)
-        else:
-            for i in range(cells[0]):
-                self.makeLattice(elementary_cell, lattice_vectors[1:],
-                                 cells[1:], base+i*lattice_vectors[0])
+            return cell + base.array
+        vectors = N.array([v.array for v in lattice_vectors])
+        indices = N.reshape(N.indices(tuple(cells)), (len(cells), -1))
+        translations = N.dot(N.transpose(indices), vectors) + base.array
+        points = translations[:, N.NewAxis, :] + cell[N.NewAxis, :, :]
+        return N.reshape(points, (-1, 3))
             
 #
 # Bravais lattice
@@ -435,7 +483,8 @@ class BravaisLattice(RhombicLattice):
     of an elementary cell containing one point.
     """
 
-    def __init__(self, lattice_vectors, cells, function=None, base=None):
+    def __init__(self, lattice_vectors, cells, function=None, base=None,
+                 vectorized=False):
         """
         @param lattice_vectors: the edges of the elementary cell
         @type lattice_vectors: C{tuple} of three L{Scientific.Geometry.Vector}
@@ -453,10 +502,19 @@ class BravaisLattice(RhombicLattice):
         
         @param base: an offset added to all lattice points
         @type base: L{Scientific.Geometry.Vector}
+
+        @param vectorized: if C{True}, function is called only once with
+                           the array of all lattice points (shape (N, 3))
+                           and must return an array whose first dimension
+                           is N, element i being the value for point i.
+                           By default, function is called once for each
+                           point with a L{Scientific.Geometry.Vector}
+                           argument.
+        @type vectorized: C{bool}
         """
         cell = [Vector(0,0,0)]
         RhombicLattice.__init__(self, cell, lattice_vectors, cells,
-                                function, base)
+                                function, base, vectorized)
 
 #
 # Simple cubic lattice
@@ -469,7 +527,8 @@ class SCLattice(BravaisLattice):
     of a cubic elementary cell.
     """
 
-    def __init__(self, cellsize, cells, function=None, base=None):
+    def __init__(self, cellsize, cells, function=None, base=None,
+                 vectorized=False):
         """
         @param cellsize: the edge length of the cubic elementary cell
         @type cellsize: C{float}
@@ -487,10 +546,20 @@ class SCLattice(BravaisLattice):
         
         @param base: an offset added to all lattice points
         @type base: L{Scientific.Geometry.Vector}
+
+        @param vectorized: if C{True}, function is called only once with
+                           the array of all lattice points (shape (N, 3))
+                           and must return an array whose first dimension
+                           is N, element i being the value for point i.
+                           By default, function is called once for each
+                           point with a L{Scientific.Geometry.Vector}
+                           argument.
+        @type vectorized: C{bool}
         """
         lattice_vectors = (cellsize*Vector(1., 0., 0.),
                            cellsize*Vector(0., 1., 0.),
                            cellsize*Vector(0., 0., 1.))
         if type(cells) != type(()):
             cells = 3*(cells,)
-        BravaisLattice.__init__(self, lattice_vectors, cells, function, base)
+        BravaisLattice.__init__(self, lattice_vectors, cells,
+                                function, base, vectorized)
@@ -96,6 +96,115 @@ class TensorField(Interpolation.InterpolatingFunction):
         else:
             return Tensor(value)
 
+    def valuesAt(self, points):
+        """
+        Evaluate the field at many points in a single operation
+
+        @param points: the coordinates of the points
+        @type points: C{Numeric.array} of shape (N, 3)
+        @returns: the field values at the points
+        @rtype: C{Numeric.array} of shape (N,)+rank*(3,)
+        @raise ValueError: if a point is outside the grid and
+                           no default value is defined
+        """
+        points = Numeric.asarray(points)
+        return self._evaluate(self._interpolationWeights(points),
+                              self._valueBuffer(len(points)))
+
+    def streamValues(self, frames, copy=False):
+        """
+        Evaluate the field at the points of a sequence of frames,
+        e.g. the particle positions along a trajectory
+
+        The result array is allocated once and overwritten for each
+        frame, unless copy is C{True}. For fields of rank 1 or higher,
+        the grid cell lookup for each point is shared by all components.
+
+        @param frames: an iterable yielding the point coordinates for
+                       each frame
+        @type frames: iterable of C{Numeric.array} of shape (N, 3)
+        @param copy: if C{True}, a new array is returned for each frame
+        @type copy: C{bool}
+        @returns: a generator yielding the field values for each frame
+        @rtype: generator of C{Numeric.array} of shape (N,)+rank*(3,)
+        @raise ValueError: if a point is outside the grid and
+                           no default value is defined
+        """
+        for values in streamFieldValues([self], frames, copy):
+            yield values[0]
+
+    def _valueBuffer(self, npoints):
+        return Numeric.zeros((npoints,)+self.values.shape[3:],
+                             self.values.dtype.char)
+
+    def _evaluate(self, interpolation, result, scratch=None):
+        # Trilinear interpolation into the preallocated array result,
+        # using the grid lookup from _interpolationWeights.
+        indices, weights, outside = interpolation
+        if outside is not None and self.default is None:
+            raise ValueError('Point outside grid of values')
+        values = Numeric.reshape(self.values, (-1,)+self.values.shape[3:])
+        if scratch is None:
+            scratch = Numeric.zeros(result.shape, result.dtype.char)
+        weight_index = (slice(None),) + self.rank*(Numeric.NewAxis,)
+        result[...] = 0.
+        for index, weight in zip(indices, weights):
+            values.take(index, axis=0, out=scratch)
+            Numeric.multiply(scratch, weight[weight_index], scratch)
+            Numeric.add(result, scratch, result)
+        if outside is not None:
+            result[outside] = getattr(self.default, 'array', self.default)
+        return result
+
+    def _interpolationWeights(self, points):
+        # Returns the flat grid indices of the eight corners of the grid
+        # cell containing each point, the trilinear interpolation weights
+        # for each corner, and a mask for the points outside the grid
+        # (or None if there are no such points).
+        outside = Numeric.zeros((len(points),), Numeric.Int)
+        lower = []
+        upper = []
+        weights = []
+        for i in range(3):
+            axis = self.axes[i]
+            period = self.period[i]
+            x = points[:, i]
+            n = len(axis)
+            if period is None:
+                outside = Numeric.logical_or(outside,
+                              Numeric.logical_or(x < axis[0]-1.e-9,
+                                                 x > axis[-1]+1.e-9))
+                j = Numeric.searchsorted(axis, x, 'right')
+                j = Numeric.clip(j, 1, n-1)
+                l = j - 1
+                w = (x-Numeric.take(axis, l)) / \
+                    (Numeric.take(axis, j)-Numeric.take(axis, l))
+            else:
+                x = axis[0] + (x-axis[0]) % period
+                l = Numeric.searchsorted(axis, x, 'right') - 1
+                wrap = l == n-1
+                j = Numeric.where(wrap, 0, l+1)
+                upper_x = Numeric.where(wrap, axis[0]+period,
+                                        Numeric.take(axis, j))
+                lower_x = Numeric.take(axis, l)
+                w = (x-lower_x)/(upper_x-lower_x)
+            lower.append(l)
+            upper.append(j)
+            weights.append(w)
+        if not Numeric.sometrue(outside):
+            outside = None
+        ny = len(self.axes[1])
+        nz = len(self.axes[2])
+        indices = []
+        corner_weights = []
+        for ix, wx in [(lower[0], 1.-weights[0]), (upper[0], weights[0])]:
+            for iy, wy in [(lower[1], 1.-weights[1]), (upper[1], weights[1])]:
+                for iz, wz in [(lower[2], 1.-weights[2]),
+                               (upper[2], weights[2])]:
+                    indices.append((ix*ny+iy)*nz+iz)
+                    corner_weights.append(wx*wy*wz)
+        return indices, corner_weights, outside
+
     def __getitem__(self, index):
         if isinstance(index, int):
             index = (index,)
@@ -105,15 +214,8 @@ class TensorField(Interpolation.InterpolatingFunction):
         index = index_expression[...] + index + rank*index_expression[::]
         try: default = self.default[index]
         except TypeError: default = None
-        if rank == 0:
-            return ScalarField(self.axes, self.values[index], default,
-                               self.period, False)
-        elif rank == 1:
-            return VectorField(self.axes, self.values[index], default,
-                               self.period, False)
-        else:
-            return TensorField(self.axes, rank, self.values[index], default,
-                               self.period, False)
+        return _tensorField(rank, self.axes, self.values[index], default,
+                            self.period)
 
     def zero(self):
         """
@@ -144,10 +246,10 @@ class TensorField(Interpolation.InterpolatingFunction):
             diffaxis = self.axes[variable][1:-1]
             d_axes = self.axes[:variable]+[diffaxis]+self.axes[variable+1:]
         else:
-            u = N.take(self.values, range(2, len(self.axes[variable]))+[0, 1],
-                       axis=variable)
-            l = self.values
-            d_values = (u-l)/self.spacing[variable]
+            n = len(self.axes[variable])
+            u = N.take(self.values, range(1, n)+[0], axis=variable)
+            l = N.take(self.values, [n-1]+range(n-1), axis=variable)
+            d_values = 0.5*(u-l)/self.spacing[variable]
             d_axes = self.axes
         d_default = None
         if self.default is not None:
@@ -157,28 +259,67 @@ class TensorField(Interpolation.InterpolatingFunction):
 
     def allDerivatives(self):
         """
-        @returns: all three derivatives (x, y, z) on equal-sized grids
+        @returns: all three derivatives (x, y, z) on equal-sized grids.
+                  The derivatives are calculated in a single pass;
+                  the value arrays of the three fields are views into
+                  the array returned by L{gradientValues}.
         @rtype: (L{TensorField}, L{TensorField}, L{TensorField})
         """
-        x = self.derivative(0)
-        y = self.derivative(1)
-        z = self.derivative(2)
-        if self.period[0] is None:
-            y._reduceAxis(0)
-            z._reduceAxis(0)
-        if self.period[1] is None:
-            x._reduceAxis(1)
-            z._reduceAxis(1)
-        if self.period[2] is None:
-            x._reduceAxis(2)
-            y._reduceAxis(2)
-        return x, y, z
-
-    def _reduceAxis(self, variable):
-        self.axes[variable] = self.axes[variable][1:-1]
-        i = variable*index_expression[::] + \
-            index_expression[1:-1:] + index_expression[...]
-        self.values = self.values[i]
+        axes, gradient = self.gradientValues()
+        if self.default is None:
+            default = None
+        else:
+            default = Numeric.zeros(self.rank*(3,), Numeric.Float)
+        return tuple([_tensorField(self.rank, axes,
+                                   gradient[index_expression[:, :, :, i]],
+                                   default, self.period)
+                      for i in range(3)])
+
+    def gradientValues(self):
+        """
+        @returns: the axes of the grid on which all derivatives are
+                  defined, and an array containing the derivatives
+                  with respect to x, y, and z along its fourth
+                  dimension. The derivatives are calculated by central
+                  differences in a single pass.
+        @rtype: (C{list} of C{Numeric.array},
+                 C{Numeric.array} of rank+4 dimensions)
+        """
+        inner = []
+        axes = []
+        for axis, period in zip(self.axes, self.period):
+            if period is None:
+                inner.append(index_expression[1:-1:])
+                axes.append(axis[1:-1])
+            else:
+                inner.append(index_expression[::])
+                axes.append(axis)
+        shape = tuple([len(axis) for axis in axes]) + (3,) + \
+                self.values.shape[3:]
+        gradient = Numeric.zeros(shape, Numeric.Float)
+        for i in range(3):
+            d = gradient[index_expression[:, :, :, i]]
+            if self.period[i] is None:
+                upper = inner[:i] + [index_expression[2::]] + inner[i+1:]
+                lower = inner[:i] + [index_expression[:-2:]] + inner[i+1:]
+                Numeric.subtract(self.values[sum(upper, ())],
+                                 self.values[sum(lower, ())], d)
+            else:
+                n = len(self.axes[i])
+                for d_index, u_index, l_index in \
+                        [(index_expression[1:-1:], index_expression[2::],
+                          index_expression[:-2:]),
+                         (index_expression[:1:], index_expression[1:2:],
+                          index_expression[n-1::]),
+                         (index_expression[n-1::], index_expression[:1:],
+                          index_expression[n-2:n-1:])]:
+                    target = d[sum(i*[index_expression[::]] + [d_index], ())]
+                    upper = inner[:i] + [u_index] + inner[i+1:]
+                    lower = inner[:i] + [l_index] + inner[i+1:]
+                    Numeric.subtract(self.values[sum(upper, ())],
+                                     self.values[sum(lower, ())], target)
+            Numeric.multiply(d, 0.5/self.spacing[i], d)
+        return axes, gradient
 
     def _checkCompatibility(self, other):
         if self.period != other.period:
@@ -245,14 +386,12 @@ class ScalarField(TensorField):
         @returns: the gradient
         @rtype: L{VectorField}
         """
-        x, y, z = self.allDerivatives()
-        grad = Numeric.transpose(Numeric.array([x.values, y.values, z.values]),
-                                 [1,2,3,0])
+        axes, grad = self.gradientValues()
         if self.default is None:
             default = None
         else:
             default = Numeric.zeros((3,), Numeric.Float)
-        return VectorField(x.axes, grad, default, self.period, False)
+        return VectorField(axes, grad, default, self.period, False)
 
     def laplacian(self):
         """
@@ -304,75 +443,81 @@ class VectorField(TensorField):
     def zero(self):
         return Vector(0., 0., 0.)
 
-    def _divergence(self, x, y, z):
-        return x[0] + y[1] + z[2]
+    # The following methods work on the array returned by
+    # gradientValues, whose element [..., i, j] is the derivative
+    # of component j with respect to coordinate i.
 
-    def _curl(self, x, y, z):
-        curl_x = y.values[..., 2] - z.values[..., 1]
-        curl_y = z.values[..., 0] - x.values[..., 2]
-        curl_z = x.values[..., 1] - y.values[..., 0]
-        curl = Numeric.transpose(Numeric.array([curl_x, curl_y, curl_z]),
-                                 [1,2,3,0])
+    def _divergence(self, axes, grad):
+        div = grad[..., 0, 0] + grad[..., 1, 1]
+        div += grad[..., 2, 2]
+        if self.default is None:
+            default = None
+        else:
+            default = 0.
+        return ScalarField(axes, div, default, self.period, False)
+
+    def _curl(self, axes, grad):
+        curl = Numeric.zeros(grad.shape[:4], Numeric.Float)
+        Numeric.subtract(grad[..., 1, 2], grad[..., 2, 1], curl[..., 0])
+        Numeric.subtract(grad[..., 2, 0], grad[..., 0, 2], curl[..., 1])
+        Numeric.subtract(grad[..., 0, 1], grad[..., 1, 0], curl[..., 2])
         if self.default is None:
             default = None
         else:
             default = Numeric.zeros((3,), Numeric.Float)
-        return VectorField(x.axes, curl, default, self.period, False)
-
-    def _strain(self, x, y, z):
-        strain = Numeric.transpose(Numeric.array([x.values, y.values,
-                                                  z.values]), [1,2,3,0,4])
-        strain = 0.5*(strain+Numeric.transpose(strain, [0,1,2,4,3]))
-        trace = (strain[..., 0,0] + strain[..., 1,1] + strain[..., 2,2])/3.
-        strain = strain - trace[..., Numeric.NewAxis, Numeric.NewAxis] * \
-                 Numeric.identity(3)[Numeric.NewAxis, Numeric.NewAxis,
-                                     Numeric.NewAxis, :, :]
+        return VectorField(axes, curl, default, self.period, False)
+
+    def _strain(self, axes, grad):
+        strain = grad + Numeric.swapaxes(grad, 3, 4)
+        Numeric.multiply(strain, 0.5, strain)
+        trace = (strain[..., 0, 0] + strain[..., 1, 1]
+                 + strain[..., 2, 2])/3.
+        for i in range(3):
+            strain[..., i, i] -= trace
         if self.default is None:
             default = None
         else:
             default = Numeric.zeros((3, 3), Numeric.Float)
-        return TensorField(2, x.axes, strain, default, self.period, False)
-        
+        return TensorField(2, axes, strain, default, self.period, False)
+
     def divergence(self):
         """
         @returns: the divergence
         @rtype L{ScalarField}
         """
-        x, y, z = self.allDerivatives()
-        return self._divergence(x, y, z)
+        return self._divergence(*self.gradientValues())
 
     def curl(self):
         """
         @returns: the curl
         @rtype L{VectorField}
         """
-        x, y, z = self.allDerivatives()
-        return self._curl(x, y, z)
+        return self._curl(*self.gradientValues())
 
     def strain(self): 
         """
         @returns: the strain
         @rtype L{TensorField} of rank 2
         """
-        x, y, z = self.allDerivatives()
-        return self._strain(x, y, z)
+        return self._strain(*self.gradientValues())
 
     def divergenceCurlAndStrain(self):
         """
         @returns: all derivative fields: divergence, curl, and strain
         @rtype (L{ScalarField}, L{VectorField}, L{TensorField})
         """
-        x, y, z = self.allDerivatives()
-        return self._divergence(x, y, z), self._curl(x, y, z), \
-               self._strain(x, y, z)
+        axes, grad = self.gradientValues()
+        return self._divergence(axes, grad), self._curl(axes, grad), \
+               self._strain(axes, grad)
 
     def laplacian(self):
         """
         @returns: the laplacian
         @rtype L{VectorField}
         """
-        x, y, z = self.allDerivatives()
-        return self._divergence(x, y, z).gradient()-self._curl(x, y, z).curl()
+        axes, grad = self.gradientValues()
+        return self._divergence(axes, grad).gradient() \
+               - self._curl(axes, grad).curl()
 
     def length(self):
         """
@@ -392,6 +537,60 @@ class VectorField(TensorField):
 
 VectorField._constructor = VectorField
 
+def streamFieldValues(fields, frames, copy=False):
+    """
+    Evaluate several fields defined on the same grid at the points of
+    a sequence of frames, e.g. the particle positions along a trajectory
+
+    The grid cell lookup for each point is done once per frame and
+    shared by all fields and all their components. The result arrays
+    are allocated once and overwritten for each frame, unless copy
+    is C{True}.
+
+    @param fields: the fields to be evaluated
+    @type fields: sequence of L{TensorField}
+    @param frames: an iterable yielding the point coordinates for
+                   each frame
+    @type frames: iterable of C{Numeric.array} of shape (N, 3)
+    @param copy: if C{True}, new arrays are returned for each frame
+    @type copy: C{bool}
+    @returns: a generator yielding for each frame a list of value arrays,
+              one per field
+    @rtype: generator of C{list} of C{Numeric.array}
+    @raise ValueError: if the fields are not defined on the same grid,
+                       or if a point is outside the grid and
+                       no default value is defined
+    """
+    first = fields[0]
+    for field in fields[1:]:
+        if list(field.period) != list(first.period) \
+           or len(field.axes) != len(first.axes) \
+           or not Numeric.logical_and.reduce(
+                      [len(a1) == len(a2) and Numeric.alltrue(a1 == a2)
+                       for a1, a2 in zip(field.axes, first.axes)]):
+            raise ValueError("fields are not defined on the same grid")
+    results = None
+    for points in frames:
+        points = Numeric.asarray(points)
+        if results is None or len(results[0][0]) != len(points):
+            results = [(field._valueBuffer(len(points)),
+                        field._valueBuffer(len(points)))
+                       for field in fields]
+        interpolation = first._interpolationWeights(points)
+        values = [field._evaluate(interpolation, result, scratch)
+                  for field, (result, scratch) in zip(fields, results)]
+        if copy:
+            values = [v.copy() for v in values]
+        yield values
+
+def _tensorField(rank, axes, values, default, period):
+    if rank == 0:
+        return ScalarField(axes, values, default, period, False)
+    elif rank == 1:
+        return VectorField(axes, values, default, period, False)
+    else:
+        return TensorField(rank, axes, values, default, period, False)
+
 #
 # Test code
 #
@@ -27,7 +27,9 @@ table, so use this at your own risk.
 
 from Scientific.NumberDict import NumberDict
 from Scientific import N
-import re, string
+import re, string, operator
+from collections import OrderedDict
+import numpy as np
 
 # Class definitions
 
@@ -131,7 +133,7 @@ class PhysicalQuantity:
             raise TypeError('Incompatible types')
         new_value = sign1*self.value + \
                     sign2*other.value*other.unit.conversionFactorTo(self.unit)
-        return self.__class__(new_value, self.unit)
+        return _resultClass(self, other)(new_value, self.unit)
 
     def __add__(self, other):
         return self._sum(other, 1, 1)
@@ -156,7 +158,7 @@ class PhysicalQuantity:
         if unit.isDimensionless():
             return value*unit.factor
         else:
-            return self.__class__(value, unit)
+            return _resultClass(self, other)(value, unit)
 
     __rmul__ = __mul__
 
@@ -168,7 +170,7 @@ class PhysicalQuantity:
         if unit.isDimensionless():
             return value*unit.factor
         else:
-            return self.__class__(value, unit)
+            return _resultClass(self, other)(value, unit)
 
     __truediv__ = __div__
 
@@ -180,7 +182,7 @@ class PhysicalQuantity:
         if unit.isDimensionless():
             return value*unit.factor
         else:
-            return self.__class__(value, unit)
+            return _resultClass(self, other)(value, unit)
 
     def __pow__(self, other):
         if isPhysicalQuantity(other):
@@ -328,6 +330,146 @@ class PhysicalQuantity:
             raise TypeError('Argument of tan must be an angle')
 
 
+class PhysicalQuantityArray(PhysicalQuantity):
+
+    """
+    Array of physical quantities with a common unit
+
+    PhysicalQuantityArray instances store their values in a single
+    NumPy array. They support the same operations as L{PhysicalQuantity},
+    with the arithmetic, unit conversions, and mathematical functions
+    applied to the whole array at once. In addition, they can be
+    indexed and sliced, and the sum, mean, minimum, and maximum can
+    be computed along any axis. Comparisons return boolean arrays.
+
+    Indexing with an integer returns a L{PhysicalQuantity},
+    slicing returns a PhysicalQuantityArray that shares its
+    values with the original array.
+
+    >>> from PhysicalQuantities import PhysicalQuantityArray as pa
+    >>> import numpy as np
+    >>> t = pa(np.array([0., 25., 100.]), 'degC')
+    >>> t.inUnitsOf('degF')
+    PhysicalQuantityArray(array([  32.,   77.,  212.]),'degF')
+    >>> d = pa([1., 2., 3.], 'km')
+    >>> (d/pa([0.5, 1., 1.5], 'h')).inUnitsOf('m/s').value
+    array([ 0.55555556,  0.55555556,  0.55555556])
+    >>> str(d.sum())
+    '6.0 km'
+    """
+
+    __array_priority__ = 10.
+
+    def __init__(self, value, unit=None):
+        """
+        @param value: the values, or a physical quantity with an array
+                      value if no unit is given
+        @type value: C{numpy.ndarray} or sequence or L{PhysicalQuantity}
+        @param unit: the unit of the values
+        @type unit: C{str} or L{PhysicalUnit}
+        """
+        if isPhysicalQuantity(value):
+            if unit is None:
+                unit = value.unit
+                value = value.value
+            else:
+                unit = _findUnit(unit)
+                value = _convertValue(value.value, value.unit, unit)
+        elif unit is None:
+            raise TypeError('No unit given')
+        self.value = np.asarray(value)
+        self.unit = _findUnit(unit)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __getitem__(self, index):
+        value = self.value[index]
+        if np.ndim(value) == 0:
+            return PhysicalQuantity(value, self.unit)
+        return self.__class__(value, self.unit)
+
+    def __setitem__(self, index, quantity):
+        if not isPhysicalQuantity(quantity):
+            raise TypeError('Incompatible types')
+        self.value[index] = _convertValue(quantity.value, quantity.unit,
+                                          self.unit)
+
+    def __iter__(self):
+        for i in xrange(len(self.value)):
+            yield self[i]
+
+    def _compare(self, other, comparison):
+        if not isPhysicalQuantity(other):
+            raise TypeError('Incompatible types')
+        return comparison(self.value,
+                          other.value*other.unit.conversionFactorTo(self.unit))
+
+    def __eq__(self, other):
+        return self._compare(other, np.equal)
+
+    def __ne__(self, other):
+        return self._compare(other, np.not_equal)
+
+    def __lt__(self, other):
+        return self._compare(other, np.less)
+
+    def __le__(self, other):
+        return self._compare(other, np.less_equal)
+
+    def __gt__(self, other):
+        return self._compare(other, np.greater)
+
+    def __ge__(self, other):
+        return self._compare(other, np.greater_equal)
+
+    def _reduce(self, reduction, axis):
+        value = reduction(self.value, axis)
+        if np.ndim(value) == 0:
+            return PhysicalQuantity(value, self.unit)
+        return self.__class__(value, self.unit)
+
+    def sum(self, axis=None):
+        """
+        @param axis: the axis along which the sum is taken, or C{None}
+                     for the sum of all elements
+        @type axis: C{int}
+        @returns: the sum of the elements
+        @rtype: L{PhysicalQuantity} or L{PhysicalQuantityArray}
+        """
+        return self._reduce(np.sum, axis)
+
+    def mean(self, axis=None):
+        """
+        @param axis: the axis along which the mean is taken, or C{None}
+                     for the mean of all elements
+        @type axis: C{int}
+        @returns: the mean of the elements
+        @rtype: L{PhysicalQuantity} or L{PhysicalQuantityArray}
+        """
+        return self._reduce(np.mean, axis)
+
+    def min(self, axis=None):
+        """
+        @param axis: the axis along which the minimum is taken, or C{None}
+                     for the minimum of all elements
+        @type axis: C{int}
+        @returns: the smallest element
+        @rtype: L{PhysicalQuantity} or L{PhysicalQuantityArray}
+        """
+        return self._reduce(np.amin, axis)
+
+    def max(self, axis=None):
+        """
+        @param axis: the axis along which the maximum is taken, or C{None}
+                     for the maximum of all elements
+        @type axis: C{int}
+        @returns: the largest element
+        @rtype: L{PhysicalQuantity} or L{PhysicalQuantityArray}
+        """
+        return self._reduce(np.amax, axis)
+
+
 class PhysicalUnit:
 
     """
@@ -336,6 +478,13 @@ class PhysicalUnit:
     A physical unit is defined by a name (possibly composite), a scaling
     factor, and the exponentials of each of the SI base units that enter into
     it. Units can be multiplied, divided, and raised to integer powers.
+
+    Units are hashable. Two units are equal if they have the same
+    scaling factor, offset, and powers of the base units, independently
+    of their names. Units with different offsets, such as K and degC,
+    are therefore not equal. Units obtained from equivalent unit strings
+    are represented by the same object as long as they remain in the
+    cache of recently used units.
     """
     
     def __init__(self, names, factor, powers, offset=0):
@@ -367,6 +516,18 @@ class PhysicalUnit:
 
     __str__ = __repr__
 
+    def _key(self):
+        return (self.factor, tuple(self.powers), self.offset)
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __eq__(self, other):
+        return isPhysicalUnit(other) and self._key() == other._key()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
     def __cmp__(self, other):
         if self.powers != other.powers:
             raise TypeError('Incompatible units')
@@ -452,13 +613,19 @@ class PhysicalUnit:
         @rtype: C{float}
         @raises TypeError: if the units are not compatible
         """
+        try:
+            return _factor_cache[(self, other)]
+        except KeyError:
+            pass
         if self.powers != other.powers:
             raise TypeError('Incompatible units')
         if self.offset != other.offset and self.factor != other.factor:
             raise TypeError(('Unit conversion (%s to %s) cannot be expressed ' +
                              'as a simple multiplicative factor') % \
                              (self.name(), other.name()))
-        return self.factor/other.factor
+        factor = self.factor/other.factor
+        _cacheConversion(_factor_cache, (self, other), factor)
+        return factor
 
     def conversionTupleTo(self, other): # added 1998/09/29 GPW
         """
@@ -469,6 +636,10 @@ class PhysicalUnit:
         @rtype: (C{float}, C{float})
         @raises TypeError: if the units are not compatible
         """
+        try:
+            return _tuple_cache[(self, other)]
+        except KeyError:
+            pass
         if self.powers != other.powers:
             raise TypeError('Incompatible units')
 
@@ -489,6 +660,7 @@ class PhysicalUnit:
         # thus, D = d1 - d2*s2/s1 and S = s1/s2
         factor = self.factor / other.factor
         offset = self.offset - (other.offset * other.factor / self.factor)
+        _cacheConversion(_tuple_cache, (self, other), (factor, offset))
         return (factor, offset)
 
     def isCompatible (self, other):     # added 1998/10/01 GPW
@@ -552,30 +724,150 @@ def isPhysicalQuantity(x):
     """
     return hasattr(x, 'value') and hasattr(x, 'unit')
 
+def _resultClass(q1, q2):
+    # Operations involving an array of quantities return an array
+    if isinstance(q2, PhysicalQuantityArray):
+        return q2.__class__
+    return q1.__class__
+
 
 # Helper functions
 
 def _findUnit(unit):
     if type(unit) == type(''):
-        name = string.strip(unit)
-        unit = eval(name, _unit_table)
-        for cruft in ['__builtins__', '__args__']:
-            try: del _unit_table[cruft]
-            except: pass
-
+        name = unit
+        try:
+            unit = _unit_cache.pop(name)
+        except KeyError:
+            unit = _evalUnit(string.strip(name))
+            if isPhysicalUnit(unit):
+                # Equivalent unit strings (e.g. 'm/s' and 'm / s') yield
+                # the same object. The interned units are stored in the
+                # same cache under the key (name, factor/powers/offset).
+                key = (unit.name(), unit._key())
+                unit = _unit_cache.pop(key, unit)
+                _cacheUnit(key, unit)
+        _cacheUnit(name, unit)
     if not isPhysicalUnit(unit):
         raise TypeError(str(unit) + ' is not a unit')
     return unit
 
+# Unit strings are parsed by a small expression grammar that accepts
+# numbers, unit names, the operators *, /, and ** (with the precedence
+# and associativity of Python), signs, and parentheses:
+#
+#   expression := factor (('*' | '/') factor)*
+#   factor     := ('+' | '-') factor | power
+#   power      := atom ('**' factor)?
+#   atom       := number | name | '(' expression ')'
+
+_unit_token = re.compile(r'\s*(?:([0-9]+\.?[0-9]*(?:[eE][+-]?[0-9]+)?'
+                         r'|\.[0-9]+(?:[eE][+-]?[0-9]+)?)'
+                         r'|([A-Za-z_][A-Za-z_0-9]*)'
+                         r'|(\*\*|[-+*/()]))')
+
+def _tokenizeUnit(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _unit_token.match(text, position)
+        if match is None:
+            raise SyntaxError('invalid unit expression: ' + text)
+        number, name, op = match.groups()
+        if number is not None:
+            if '.' in number or 'e' in number or 'E' in number:
+                tokens.append(('number', float(number)))
+            else:
+                tokens.append(('number', int(number)))
+        elif name is not None:
+            tokens.append(('name', name))
+        else:
+            tokens.append(('op', op))
+        position = match.end()
+    tokens.append(('end', None))
+    return tokens
+
+def _evalUnit(text):
+    # Evaluate a unit expression in the namespace of the unit table
+    tokens = _tokenizeUnit(text)
+    position = [0]
+    def peek():
+        return tokens[position[0]]
+    def next():
+        token = tokens[position[0]]
+        position[0] += 1
+        return token
+    def expression():
+        value = factor()
+        while peek() in [('op', '*'), ('op', '/')]:
+            if next()[1] == '*':
+                value = operator.mul(value, factor())
+            else:
+                value = operator.div(value, factor())
+        return value
+    def factor():
+        if peek() == ('op', '-'):
+            next()
+            return operator.neg(factor())
+        if peek() == ('op', '+'):
+            next()
+            return factor()
+        return power()
+    def power():
+        value = atom()
+        if peek() == ('op', '**'):
+            next()
+            value = operator.pow(value, factor())
+        return value
+    def atom():
+        kind, value = next()
+        if kind == 'number':
+            return value
+        if kind == 'name':
+            try:
+                return _unit_table[value]
+            except KeyError:
+                raise NameError("name '%s' is not defined" % value)
+        if (kind, value) == ('op', '('):
+            value = expression()
+            if next() != ('op', ')'):
+                raise SyntaxError('unbalanced parentheses: ' + text)
+            return value
+        raise SyntaxError('invalid unit expression: ' + text)
+    value = expression()
+    if peek()[0] != 'end':
+        raise SyntaxError('invalid unit expression: ' + text)
+    return value
+
+# Caches for parsed unit strings (the least recently used entries are
+# removed first) and for conversion factors between pairs of units.
+
+_unit_cache = OrderedDict()
+_unit_cache_size = 1000
+_factor_cache = {}
+_tuple_cache = {}
+_conversion_cache_size = 10000
+
+def _cacheUnit(key, unit):
+    if len(_unit_cache) >= _unit_cache_size:
+        _unit_cache.popitem(last=False)
+    _unit_cache[key] = unit
+
+def _cacheConversion(cache, key, value):
+    if len(cache) >= _conversion_cache_size:
+        cache.clear()
+    cache[key] = value
+
 def _round(x):
-    if N.greater(x, 0.):
-        return N.floor(x)
-    else:
-        return N.ceil(x)
+    # Round towards zero, elementwise for arrays
+    return np.trunc(x)
 
 
 def _convertValue (value, src_unit, target_unit):
     (factor, offset) = src_unit.conversionTupleTo(target_unit)
+    if offset == 0:
+        return value * factor
     return (value + offset) * factor
 
 
@@ -629,10 +921,7 @@ def _addUnit(name, unit, comment=''):
     if comment:
         _help.append((name, comment, unit))
     if type(unit) == type(''):
-        unit = eval(unit, _unit_table)
-        for cruft in ['__builtins__', '__args__']:
-            try: del _unit_table[cruft]
-            except: pass
+        unit = _evalUnit(unit)
     unit.setName(name)
     _unit_table[name] = unit
 
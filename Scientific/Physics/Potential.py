@@ -58,14 +58,33 @@ modified as follows::
   >>>print gradients
   >>>print force_constants
 
-The force constants are returned as a nested list representing a
-matrix. This can easily be converted to an array for further
-processing if the numerical extensions to Python are available.
+The force constants are returned as an array of shape (3n, 3n) for
+n vector arguments. They are calculated using the array-based
+derivatives of L{Scientific.Functions.DenseDerivatives}.
+
+For large systems, the class ArrayPotential evaluates a potential
+that is a sum of terms, each of which depends on a small number of
+positions (e.g. pair interactions), for all terms at once. The
+energy function is written in the same way as for
+PotentialWithGradients, but it receives vectors whose components
+are arrays (one element per term) of DerivVar objects in the array
+mode of L{Scientific.Functions.FirstDerivatives}. The positions are
+given as an array of shape (N, 3), and the gradients are returned
+as an array of the same shape::
+
+  >>>def _lennardJones(r1, r2, epsilon, sigma):
+  >>>    s6 = (sigma*sigma/((r2-r1)*(r2-r1)))**3
+  >>>    return 4.*epsilon*(s6*s6-s6)
+  >>>lj = ArrayPotential(_lennardJones)
+  >>>pairs = N.array([[0, 1], [0, 2], [1, 2]])
+  >>>x = N.array([[0., 0., 0.], [1.1, 0., 0.], [0., 1.2, 0.]])
+  >>>energy, gradients = lj(x, pairs, 1., 1.)
 """
 
 from Scientific import N; Numeric = N
 from Scientific.Geometry import Vector, isVector
-from Scientific.Functions import FirstDerivatives, Derivatives
+from Scientific.Functions import FirstDerivatives, DenseDerivatives
+import numpy as np
 
 
 def DerivVectors(*args):
@@ -89,14 +108,17 @@ def EnergyGradients(e, n):
 
 def EnergyGradientsForceConstants(e, n):
     energy = e[0]
-    deriv = e[1]
-    deriv = deriv + (3*n-len(deriv))*[0]
+    deriv = Numeric.zeros((3*n,), Numeric.Float)
+    deriv[:len(e[1])] = e[1]
     gradients = []
     i = 0
     for j in range(n):
         gradients.append(Vector(deriv[i],deriv[i+1],deriv[i+2]))
         i = i+3
-    return (energy, gradients, Numeric.array(e[2]))
+    force_constants = Numeric.zeros((3*n, 3*n), Numeric.Float)
+    fc = Numeric.array(e[2])
+    force_constants[:fc.shape[0], :fc.shape[1]] = fc
+    return (energy, gradients, force_constants)
 
 
 # Potential function class with gradients
@@ -131,15 +153,142 @@ class PotentialWithGradientsAndForceConstants:
 
     def __call__(self, *args):
         arglist = []
-        nvector = 0
+        nvector = len([a for a in args if isVector(a)])
         index = 0
         for a in args:
             if isVector(a):
-                arglist.append(Derivatives.DerivVector(a.x(),a.y(),a.z(),
-                                                       index, 2))
-                nvector = nvector + 1
+                arglist.append(DenseDerivatives.DerivVector(a.x(),a.y(),a.z(),
+                                                            index, 2,
+                                                            3*nvector))
                 index = index + 3
             else:
                 arglist.append(a)
         e = apply(self.func, tuple(arglist))
         return EnergyGradientsForceConstants(e, nvector)
+
+
+# Potential function class for arrays of positions
+
+class ArrayPotential:
+
+    """
+    Potential energy function defined as a sum of terms, evaluated
+    for all terms in a single call
+
+    Each term of the potential depends on k positions, whose indices
+    are given in an integer array of shape (M, k) for M terms. The
+    energy function is called once with k vectors whose components
+    are array-mode DerivVar objects (see
+    L{Scientific.Functions.FirstDerivatives}) containing the values
+    for all M terms, followed by any additional arguments, which are
+    passed on unchanged. Parameter arrays of length M thus define
+    parameters for each term. The function must return a DerivVar
+    object whose value is an array of the M term energies.
+
+    Second derivatives (force constants) are obtained by fourth-order
+    central differences of the automatic first derivatives of each
+    term.
+    """
+
+    def __init__(self, func, force_constants=None, step=1.e-4):
+        """
+        @param func: the energy function of a single term
+        @type func: callable
+        @param force_constants: C{None} for energy and gradients only,
+            C{'dense'} for an additional force constant matrix of shape
+            (3N, 3N), C{'sparse'} for the non-zero 3x3 blocks of the
+            force constant matrix.
+        @type force_constants: C{str}
+        @param step: the displacement used for the numerical
+            differentiation of the gradients
+        @type step: C{float}
+        @raise ValueError: if force_constants has an illegal value
+        """
+        if force_constants not in [None, 'dense', 'sparse']:
+            raise ValueError("force_constants must be None, " +
+                             "'dense', or 'sparse'")
+        self.func = func
+        self.force_constants = force_constants
+        self.step = step
+
+    def __call__(self, positions, terms, *args):
+        """
+        @param positions: the positions of N particles
+        @type positions: C{N.array} of shape (N, 3)
+        @param terms: the particle indices of the M terms
+        @type terms: C{N.array} of shape (M, k)
+        @param args: additional arguments to the energy function
+        @returns: the energy and the gradients as an array of shape
+            (N, 3). If force constants are requested, they follow as
+            a third element, either as an array of shape (3N, 3N),
+            or for the sparse case as a tuple of an index array of
+            shape (B, 2) and an array of shape (B, 3, 3). C{[i, j]} in
+            the index array identifies the block of second derivatives
+            with respect to the positions of particles i and j.
+        @rtype: C{tuple}
+        """
+        positions = np.asarray(positions, np.float)
+        terms = np.asarray(terms, np.int)
+        npoints = len(positions)
+        local = np.take(positions, terms, 0)
+        energies, deriv = self._termGradients(local, args)
+        k = terms.shape[1]
+        gradients = np.zeros((npoints, 3), np.float)
+        for slot in range(k):
+            for xyz in range(3):
+                gradients[:, xyz] += np.bincount(terms[:, slot],
+                                                 deriv[:, 3*slot+xyz],
+                                                 npoints)
+        energy = np.add.reduce(energies)
+        if self.force_constants is None:
+            return energy, gradients
+        fc = self._termForceConstants(local, args)
+        fc = np.reshape(fc, (len(terms), k, 3, k, 3))
+        index = terms[:, :, np.newaxis]*npoints + terms[:, np.newaxis, :]
+        fc = np.reshape(np.transpose(fc, (0, 1, 3, 2, 4)), (-1, 3, 3))
+        index = np.ravel(index)
+        if self.force_constants == 'dense':
+            row = index / npoints
+            column = index % npoints
+            index = (3*row[:, np.newaxis, np.newaxis]
+                     + np.arange(3)[:, np.newaxis])*3*npoints \
+                    + 3*column[:, np.newaxis, np.newaxis] + np.arange(3)
+            fc = np.bincount(np.ravel(index), np.ravel(fc), (3*npoints)**2)
+            return energy, gradients, np.reshape(fc, 2*(3*npoints,))
+        blocks, inverse = np.unique(index, return_inverse=True)
+        fc_blocks = np.zeros((len(blocks), 3, 3), np.float)
+        for i in range(3):
+            for j in range(3):
+                fc_blocks[:, i, j] = np.bincount(inverse, fc[:, i, j],
+                                                 len(blocks))
+        indices = np.transpose(np.array([blocks / npoints,
+                                         blocks % npoints]))
+        return energy, gradients, (indices, fc_blocks)
+
+    def _termGradients(self, local, args):
+        # Energies of all terms and their derivatives with respect
+        # to the 3k coordinates of each term
+        nterms, k = local.shape[:2]
+        vectors = [FirstDerivatives.DerivVector(local[:, i, 0],
+                                                local[:, i, 1],
+                                                local[:, i, 2],
+                                                3*i, 3*k)
+                   for i in range(k)]
+        e = apply(self.func, tuple(vectors) + args)
+        energies = np.asarray(e[0]) + np.zeros((nterms,))
+        deriv = np.asarray(e[1]) + np.zeros((nterms, 3*k))
+        return energies, deriv
+
+    def _termForceConstants(self, local, args):
+        # Second derivatives of all terms with respect to their
+        # 3k coordinates, by fourth-order central differences of
+        # the gradients
+        nterms, k = local.shape[:2]
+        fc = np.zeros((nterms, 3*k, 3*k), np.float)
+        for i in range(3*k):
+            for n, weight in [(-2, 1.), (-1, -8.), (1, 8.), (2, -1.)]:
+                displaced = local.copy()
+                displaced[:, i/3, i%3] += n*self.step
+                fc[:, :, i] += weight*self._termGradients(displaced, args)[1]
+        fc /= 12.*self.step
+        return 0.5*(fc + np.transpose(fc, (0, 2, 1)))
@@ -0,0 +1,212 @@
+# Time correlation functions
+#
+
+"""
+Time correlation functions computed by FFT
+
+The correlation function of two series x and y is defined as::
+
+  C(t) = < x(s+t) y*(s) >
+
+where the average runs over all time steps s for which both x(s+t)
+and y(s) are defined and y* is the complex conjugate of y. The
+correlation functions are computed via zero-padded fast Fourier
+transforms, which takes a time proportional to N log N for series
+of length N.
+
+All functions accept a single series (an array of shape (N,)) or
+several series of the same length (an array of shape (k, N)), for
+which k correlation functions are computed at once. Real and complex
+series are supported. Series too long to be kept in memory can be
+processed in consecutive pieces by a L{CorrelationAccumulator}.
+"""
+
+from Scientific import N
+import numpy as np
+
+
+def crossCorrelation(series1, series2, nsteps=None, normalization='unbiased'):
+    """
+    @param series1: the series x (see the module documentation)
+    @type series1: C{Numeric.array} of shape (N,) or (k, N)
+    @param series2: the series y, of the same shape as series1
+    @type series2: C{Numeric.array} of shape (N,) or (k, N)
+    @param nsteps: the number of time steps for which the correlation
+                   function is evaluated. The default is N.
+    @type nsteps: C{int}
+    @param normalization: 'unbiased' for division of the sum over s by
+                          the number of terms (N-t), 'biased' for
+                          division by N, or C{None} for no normalization
+    @type normalization: C{str}
+    @returns: the cross-correlation function for t = 0 ... nsteps-1
+    @rtype: C{Numeric.array} of shape (nsteps,) or (k, nsteps)
+    @raises ValueError: if the series have different shapes
+    """
+    series1 = np.asarray(series1)
+    series2 = np.asarray(series2)
+    if series1.shape != series2.shape:
+        raise ValueError("series must have the same shape")
+    length = series1.shape[-1]
+    nsteps = _checkSteps(nsteps, length)
+    sums = _correlationSums(series1, series2, nsteps)
+    return _normalize(sums, length, normalization)
+
+def autoCorrelation(series, nsteps=None, normalization='unbiased'):
+    """
+    @param series: one or several series
+    @type series: C{Numeric.array} of shape (N,) or (k, N)
+    @param nsteps: the number of time steps for which the correlation
+                   function is evaluated. The default is N.
+    @type nsteps: C{int}
+    @param normalization: 'unbiased' for division of the sum over s by
+                          the number of terms (N-t), 'biased' for
+                          division by N, or C{None} for no normalization
+    @type normalization: C{str}
+    @returns: the autocorrelation function for t = 0 ... nsteps-1
+    @rtype: C{Numeric.array} of shape (nsteps,) or (k, nsteps)
+    """
+    series = np.asarray(series)
+    length = series.shape[-1]
+    nsteps = _checkSteps(nsteps, length)
+    sums = _correlationSums(series, None, nsteps)
+    return _normalize(sums, length, normalization)
+
+
+class CorrelationAccumulator:
+
+    """
+    Correlation function of a series supplied in consecutive pieces
+
+    The pieces are passed to L{addData} in their order in the series.
+    The last nsteps-1 points of the series are kept between calls,
+    such that the result is identical to a correlation function
+    computed from the complete series, but only one piece has to
+    be kept in memory at a time.
+
+    >>> acc = CorrelationAccumulator(100)
+    >>> for piece in pieces:
+    ...     acc.addData(piece)
+    >>> c = acc.correlation()
+    """
+
+    def __init__(self, nsteps):
+        """
+        @param nsteps: the number of time steps for which the correlation
+                       function is evaluated
+        @type nsteps: C{int}
+        """
+        self.nsteps = nsteps
+        self.length = 0
+        self.sums = None
+        self._tail1 = None
+        self._tail2 = None
+
+    def addData(self, series1, series2=None):
+        """
+        Add the next piece of the series
+
+        @param series1: the next piece of the series x
+        @type series1: C{Numeric.array} of shape (n,) or (k, n)
+        @param series2: the next piece of the series y, of the same
+                        shape as series1. If C{None}, the
+                        autocorrelation function of x is computed.
+                        Either all or none of the calls to addData
+                        must provide series2.
+        @type series2: C{Numeric.array} of shape (n,) or (k, n)
+        @raises ValueError: if the shapes of the pieces are incompatible
+        """
+        series1 = np.asarray(series1)
+        if series2 is not None:
+            series2 = np.asarray(series2)
+            if series2.shape != series1.shape:
+                raise ValueError("series must have the same shape")
+        if series1.shape[-1] == 0:
+            return
+        if self._tail1 is None:
+            self._tail1 = series1[..., :0]
+            if series2 is not None:
+                self._tail2 = series2[..., :0]
+        elif (series2 is None) != (self._tail2 is None) \
+                 or series1.shape[:-1] != self._tail1.shape[:-1]:
+            raise ValueError("piece incompatible with previous pieces")
+        # The pairs (s, s+t) with s+t in the new piece are those in the
+        # tail followed by the new piece minus those in the tail alone.
+        x = np.concatenate([self._tail1, series1], -1)
+        if series2 is None:
+            y = None
+            sums = _correlationSums(x, None, self.nsteps) \
+                   - _correlationSums(self._tail1, None, self.nsteps)
+        else:
+            y = np.concatenate([self._tail2, series2], -1)
+            sums = _correlationSums(x, y, self.nsteps) \
+                   - _correlationSums(self._tail1, self._tail2, self.nsteps)
+        if self.sums is None:
+            self.sums = sums
+        else:
+            self.sums = self.sums + sums
+        self.length += series1.shape[-1]
+        start = max(x.shape[-1]-self.nsteps+1, 0)
+        self._tail1 = x[..., start:].copy()
+        if y is not None:
+            self._tail2 = y[..., start:].copy()
+
+    def correlation(self, normalization='unbiased'):
+        """
+        @param normalization: 'unbiased' for division of the sum over s
+                              by the number of terms (N-t), 'biased' for
+                              division by N, or C{None} for no
+                              normalization
+        @type normalization: C{str}
+        @returns: the correlation function of the data added so far,
+                  for t = 0 ... nsteps-1
+        @rtype: C{Numeric.array} of shape (nsteps,) or (k, nsteps)
+        @raises ValueError: if the series is shorter than nsteps
+        """
+        if self.length < self.nsteps:
+            raise ValueError("series shorter than %d steps" % self.nsteps)
+        return _normalize(self.sums, self.length, normalization)
+
+
+def _checkSteps(nsteps, length):
+    if nsteps is None:
+        return length
+    if nsteps < 1 or nsteps > length:
+        raise ValueError("nsteps must be between 1 and %d" % length)
+    return nsteps
+
+def _fftLength(n):
+    # The smallest power of two that is not smaller than n
+    length = 1
+    while length < n:
+        length = 2*length
+    return length
+
+def _correlationSums(x, y, nsteps):
+    # sum_s x(s+t) y*(s) for t = 0 ... nsteps-1 along the last axis.
+    # Zero padding to at least length+nsteps-1 points prevents any
+    # wrap-around for these time steps.
+    length = x.shape[-1]
+    if length == 0:
+        return np.zeros(x.shape[:-1] + (nsteps,),
+                        np.result_type(x, x if y is None else y, N.Float))
+    n = _fftLength(length+nsteps-1)
+    real = not (np.iscomplexobj(x) or (y is not None and np.iscomplexobj(y)))
+    if real:
+        fx = np.fft.rfft(x, n)
+        fy = fx if y is None else np.fft.rfft(y, n)
+        sums = np.fft.irfft(fx*np.conjugate(fy), n)
+    else:
+        fx = np.fft.fft(x, n)
+        fy = fx if y is None else np.fft.fft(y, n)
+        sums = np.fft.ifft(fx*np.conjugate(fy), n)
+    return sums[..., :nsteps]
+
+def _normalize(sums, length, normalization):
+    if normalization is None:
+        return sums
+    elif normalization == 'unbiased':
+        return sums/(length-np.arange(sums.shape[-1]))
+    elif normalization == 'biased':
+        return sums/float(length)
+    else:
+        raise ValueError("unknown normalization " + repr(normalization))
@@ -12,6 +12,7 @@ from Scientific.Functions.Interpolation import InterpolatingFunction
 from Scientific.Functions.Polynomial import Polynomial
 from Scientific.Functions.Rational import RationalFunction
 from Scientific import N
+import numpy as np
 import copy
 
 class AutoRegressiveModel:
@@ -20,6 +21,11 @@ class AutoRegressiveModel:
 
     This implementation uses the Burg algorithm to obtain the
     coefficients of the AR model.
+
+    The poles of the model and the quantities derived from them are
+    calculated only once. The results of L{spectrum}, L{correlation},
+    and L{memoryFunction} are cached for the most recently used
+    arguments.
     """
 
     def __init__(self, order, data, delta_t=1):
@@ -33,34 +39,36 @@ class AutoRegressiveModel:
         """
         self.order = order
         self.delta_t = delta_t
-        self._poles = None
+        self._clearCache()
         self._findCoefficients(data)
         self._setTrajectory(data)
 
+    def _clearCache(self):
+        self._poles = None
+        self._pole_factors = None
+        self._beta = None
+        self._cache = {}
+
+    def _cached(self, key, function, *args):
+        # Cache the results of the most recent calls of a method.
+        # Models pickled by earlier versions have no cache attributes.
+        cache = getattr(self, '_cache', None)
+        if cache is None:
+            cache = self._cache = {}
+        if key not in cache:
+            if len(cache) >= 8:
+                cache.clear()
+            cache[key] = function(*args)
+        return cache[key]
+
     def _findCoefficients(self, data):
-        e = data
-        b = data
-        a = N.array([1.])
-        parcor = []
-        sigsq = N.add.reduce(abs(data)**2)/len(data)
-        self.variance = sigsq
-
-        for r in range(self.order):
-            er = e[1:]
-            br = b[:-1]
-            g = 2.*N.add.reduce(er*N.conjugate(br)) / \
-                N.add.reduce(er*N.conjugate(er)+br*N.conjugate(br))
-            parcor.append(g)
-            e = er-g*br
-            b = br-N.conjugate(g)*er
-            a = N.concatenate((a, [0.]))
-            a = a - g*N.conjugate(a[::-1])
-            sigsq = sigsq*(1-abs(g)**2)
-
-        self.coeff = -a[self.order:0:-1]
-        self.parcor = N.array(parcor)
-        self.sigsq = sigsq
-        self.sigma = N.sqrt(sigsq)
+        coeff, parcor, sigsq, variance = _burg(N.array(data)[N.NewAxis],
+                                               self.order)
+        self.variance = variance[0]
+        self.coeff = coeff[0]
+        self.parcor = parcor[0]
+        self.sigsq = sigsq[0]
+        self.sigma = N.sqrt(self.sigsq)
 
     def _setTrajectory(self, data):
         self.trajectory = copy.copy(data[-self.order:])
@@ -88,11 +96,20 @@ class AutoRegressiveModel:
         @returns: the frequency spectrum of the process
         @rtype: C{Numeric.array} of C{float}
         """
-        sum = 1.
-        for i in range(1, len(self.coeff)+1):
-            sum = sum - self.coeff[-i]*N.exp(-1j*i*self.delta_t*omega)
-        s = 0.5*self.delta_t*self.sigsq/(sum*N.conjugate(sum)).real
-        return InterpolatingFunction((omega,), s)
+        omega = N.asarray(omega)
+        s = self._cached(('spectrum', omega.shape, omega.tostring()),
+                         self._spectrum, omega)
+        return InterpolatingFunction((omega,), s.copy())
+
+    def _spectrum(self, omega):
+        # 1 - sum_i coeff[-i] z**i with z = exp(-i delta_t omega),
+        # evaluated by Horner's scheme
+        z = N.exp(-1j*self.delta_t*omega)
+        sum = 0.
+        for c in self.coeff:
+            sum = (sum - c)*z
+        sum = sum + 1.
+        return 0.5*self.delta_t*self.sigsq/(sum*N.conjugate(sum)).real
 
     def poles(self):
         """
@@ -111,6 +128,30 @@ class AutoRegressiveModel:
                 self._poles = eigenvalues(a)
         return self._poles
 
+    def _poleFactors(self):
+        # For each pole p_i, the product of (p_i-p_j) over all other
+        # poles p_j times the product of (p_i-1/p_j*) over all poles.
+        if getattr(self, '_pole_factors', None) is None:
+            poles = self.poles()
+            diff = poles[:, N.NewAxis] - poles
+            diff.flat[::len(poles)+1] = 1.
+            self._pole_factors = \
+                        N.multiply.reduce(diff, 1) * \
+                        N.multiply.reduce(poles[:, N.NewAxis]
+                                          - 1./N.conjugate(poles), 1)
+        return self._pole_factors
+
+    def _poleWeights(self):
+        # The normalized weights beta_i of the poles in the expansion
+        # of the autocorrelation function
+        if getattr(self, '_beta', None) is None:
+            poles = self.poles()
+            coeff0 = N.conjugate(self.coeff[0])
+            beta = -(self.sigsq*poles**(self.order-1)/coeff0) / \
+                   (self._poleFactors()*self.variance)
+            self._beta = beta/N.sum(beta)
+        return self._beta
+
     def correlation(self, nsteps):
         """
         @param nsteps: the number of time steps for which the autocorrelation
@@ -120,30 +161,19 @@ class AutoRegressiveModel:
         from the AR model
         @rtype: L{Scientific.Functions.Interpolation.InterpolatingFunction}
         """
+        cf = self._cached(('correlation', nsteps), self._correlation, nsteps)
+        return InterpolatingFunction((self.delta_t*N.arange(nsteps),),
+                                     cf.copy())
+
+    def _correlation(self, nsteps):
         poles = self.poles()
-        cpoles = N.conjugate(poles)
-        x = 0.
         exponents = N.arange(self.order-1, nsteps+self.order-1)
-        for i in range(len(poles)):
-            pole = poles[i]
-            factor = N.multiply.reduce((pole-poles)[:i]) * \
-                     N.multiply.reduce((pole-poles)[i+1:]) * \
-                     N.multiply.reduce((pole-1./cpoles))
-            try:
-                x = x + pole**exponents / factor
-            except OverflowError:
-                # happens with some Python versions on some systems
-                power = N.zeros(exponents.shape, N.Complex)
-                for i in range(len(exponents)):
-                    try:
-                        power[i] = pole**exponents[i]
-                    except ValueError:
-                        pass
-                x = x + power/factor
+        x = N.dot(1./self._poleFactors(),
+                  poles[:, N.NewAxis]**exponents[N.NewAxis, :])
         cf = -self.sigsq*x/N.conjugate(self.coeff[0])
         if not _isComplex(self.coeff):
             cf = _realPart(cf)
-        return InterpolatingFunction((self.delta_t*N.arange(nsteps),), cf)
+        return cf
 
     def memoryFunctionZ(self):
         """
@@ -151,17 +181,7 @@ class AutoRegressiveModel:
         @rtype: L{Scientific.Function.Rational.RationalFunction}
         """
         poles = self.poles()
-        cpoles = N.conjugate(poles)
-        coeff0 = N.conjugate(self.coeff[0])
-        beta = N.zeros((self.order,), N.Complex)
-        for i in range(self.order):
-            pole = poles[i]
-            beta[i] = -(self.sigsq*pole**(self.order-1)/coeff0) / \
-                      (N.multiply.reduce((pole-poles)[:i]) *
-                       N.multiply.reduce((pole-poles)[i+1:]) *
-                       N.multiply.reduce(pole-1./cpoles) *
-                       self.variance)
-        beta = beta/N.sum(beta)
+        beta = self._poleWeights()
         sum = 0.
         for i in range(self.order):
             sum = sum + RationalFunction([beta[i]], [-poles[i], 1.])
@@ -181,24 +201,11 @@ class AutoRegressiveModel:
         @rtype: L{Scientific.Function.Rational.RationalFunction}
         """
         poles = self.poles()
-        cpoles = N.conjugate(poles)
-        coeff0 = N.conjugate(self.coeff[0])
-        beta = N.zeros((self.order,), N.Complex)
-        for i in range(self.order):
-            pole = poles[i]
-            beta[i] = -(self.sigsq*pole**(self.order-1)/coeff0) / \
-                      (N.multiply.reduce((pole-poles)[:i]) *
-                       N.multiply.reduce((pole-poles)[i+1:]) *
-                       N.multiply.reduce(pole-1./cpoles) *
-                       self.variance)
-        beta = beta/N.sum(beta)
-        den_coeff = []
-        for i in range(den_order):
-            sum = 0.
-            for j in range(self.order):
-                sum += beta[j]*poles[j]**i
-            den_coeff.append(sum)
-        den_coeff.reverse()
+        beta = self._poleWeights()
+        # den_coeff[i] = sum_j beta_j poles_j**(den_order-1-i)
+        den_coeff = N.dot(poles[N.NewAxis, :]
+                          ** N.arange(den_order-1, -1, -1)[:, N.NewAxis],
+                          beta)
         mz = (RationalFunction(den_order*[0.] + [1.], den_coeff)
               + Polynomial([1., -1.]))/self.delta_t**2
         if not _isComplex(self.coeff):
@@ -215,34 +222,24 @@ class AutoRegressiveModel:
         from the AR model
         @rtype: L{Scientific.Functions.Interpolation.InterpolatingFunction}
         """
+        mem = self._cached(('memory', nsteps), self._memoryFunction, nsteps)
+        time = self.delta_t*N.arange(nsteps)
+        return InterpolatingFunction((time,), mem.copy())
+
+    def _memoryFunction(self, nsteps):
         mz = self.memoryFunctionZapprox(nsteps+self.order)
         mem = mz.divide(nsteps-1)[0].coeff[::-1]
         if len(mem) == nsteps+1:
             mem = mem[1:]
         mem[0] = 2.*_realPart(mem[0])
-        time = self.delta_t*N.arange(nsteps)
-        return InterpolatingFunction((time,), mem)
+        return mem
 
     def frictionConstant(self):
         """
         @returns: the friction constant of the process, i.e. the
         integral over the memory function
         """
-        poles = self.poles()
-        cpoles = N.conjugate(poles)
-        coeff0 = N.conjugate(self.coeff[0])
-        beta = N.zeros((self.order,), N.Complex)
-        for i in range(self.order):
-            pole = poles[i]
-            beta[i] = -(self.sigsq*pole**(self.order-1)/coeff0) / \
-                      (N.multiply.reduce((pole-poles)[:i]) *
-                       N.multiply.reduce((pole-poles)[i+1:]) *
-                       N.multiply.reduce(pole-1./cpoles) *
-                       self.variance)
-        beta = beta/N.sum(beta)
-        sum = 0.
-        for i in range(self.order):
-            sum = sum + beta[i]/(1.-poles[i])
+        sum = N.sum(self._poleWeights()/(1.-self.poles()))
         if not _isComplex(self.coeff):
             sum = _realPart(sum)
         return 1./(sum*self.delta_t)
@@ -272,7 +269,7 @@ class AveragedAutoRegressiveModel(AutoRegressiveModel):
         self.sigsq = 0.
         self.variance = 0.
         self.sigma = 0.
-        self._poles = None
+        self._clearCache()
 
     def add(self, model, weight=1):
         """
@@ -293,7 +290,122 @@ class AveragedAutoRegressiveModel(AutoRegressiveModel):
         self.sigma = N.sqrt(self.sigsq)
         self.variance = (self.weight*self.variance + weight*model.variance)/nw
         self.weight = nw
-        self._poles = None
+        self._clearCache()
+
+    def addSeries(self, data, weight=1, **options):
+        """
+        Adds autoregressive models for several time series to the
+        average. The result is the same as adding one
+        L{AutoRegressiveModel} per time series with the given weight,
+        but the coefficients of all models are obtained in a single
+        call to L{burgCoefficients}.
+
+        @param data: the time series
+        @type data: C{Numeric.array} of shape (k, N)
+        @param weight: the weight of each model in the average
+        @type weight: C{float}
+        @param options: keyword arguments passed on to L{burgCoefficients}
+        """
+        coeff, parcor, sigsq, variance = burgCoefficients(data, self.order,
+                                                          **options)
+        k = len(coeff)
+        nw = self.weight + k*weight
+        self.coeff = (self.weight*self.coeff + weight*N.sum(coeff, 0))/nw
+        self.sigsq = (self.weight*self.sigsq + weight*N.sum(sigsq))/nw
+        self.sigma = N.sqrt(self.sigsq)
+        self.variance = (self.weight*self.variance
+                         + weight*N.sum(variance))/nw
+        self.weight = nw
+        self._clearCache()
+
+
+def burgCoefficients(data, order, nthreads=None, pool=None, chunk_size=None):
+    """
+    Calculates the coefficients of autoregressive models for many time
+    series of equal length using the Burg algorithm. The recursion
+    runs for all series at once.
+
+    @param data: the time series
+    @type data: C{Numeric.array} of shape (k, N) of C{float} or C{complex}
+    @param order: the order of the models
+    @type order: C{int}
+    @param nthreads: if not C{None}, the series are divided into chunks
+        that are treated in parallel by a
+        L{Scientific.Threading.TaskManager.TaskManager} with this number
+        of threads
+    @type nthreads: C{int}
+    @param pool: a process pool, e.g. a C{multiprocessing.Pool}, whose
+        C{map} method is used to treat chunks of series in parallel
+    @param chunk_size: the number of series per chunk for parallel
+        execution. The default divides the series evenly over the
+        threads or the processors.
+    @type chunk_size: C{int}
+    @returns: the model coefficients (array of shape (k, order), in the
+        order of L{AutoRegressiveModel}.coeff), the reflection
+        (partial correlation) coefficients (array of shape (k, order)),
+        the variances of the driving noise (array of shape (k,)), and
+        the variances of the series (array of shape (k,))
+    @rtype: C{tuple}
+    """
+    data = np.asarray(data)
+    if len(data.shape) != 2:
+        raise ValueError('data must be an array of shape (k, N)')
+    if nthreads is None and pool is None:
+        return _burg(data, order)
+    nseries = data.shape[0]
+    if chunk_size is None:
+        if nthreads is None:
+            import multiprocessing
+            nchunks = multiprocessing.cpu_count()
+        else:
+            nchunks = nthreads
+        chunk_size = max(1, (nseries+nchunks-1)/nchunks)
+    tasks = [(data[first:first+chunk_size], order)
+             for first in range(0, nseries, chunk_size)]
+    if pool is not None:
+        results = pool.map(_burgTask, tasks)
+    else:
+        from Scientific.Threading.TaskManager import TaskManager
+        results = len(tasks)*[None]
+        def run(i, lock):
+            results[i] = _burgTask(tasks[i])
+        manager = TaskManager(nthreads)
+        for i in range(len(tasks)):
+            manager.runTask(run, (i,))
+        manager.terminate()
+        if None in results:
+            raise ValueError('Burg recursion failed in a parallel task')
+    return tuple([np.concatenate([r[i] for r in results])
+                  for i in range(4)])
+
+def _burgTask(args):
+    return _burg(*args)
+
+def _burg(data, order):
+    # Burg recursion for the rows of data
+    e = data
+    b = data
+    a = np.ones((data.shape[0], 1), data.dtype)
+    parcor = []
+    sigsq = np.add.reduce(abs(data)**2, 1)/data.shape[1]
+    variance = sigsq
+    for r in range(order):
+        er = e[:, 1:]
+        br = b[:, :-1]
+        g = 2.*np.add.reduce(er*np.conjugate(br), 1) / \
+            np.add.reduce(abs(er)**2+abs(br)**2, 1)
+        parcor.append(g)
+        e = er-g[:, np.newaxis]*br
+        b = br-np.conjugate(g)[:, np.newaxis]*er
+        a = np.concatenate((a, np.zeros((len(a), 1), a.dtype)), 1)
+        a = a - g[:, np.newaxis]*np.conjugate(a[:, ::-1])
+        sigsq = sigsq*(1-abs(g)**2)
+    coeff = -a[:, order:0:-1]
+    if order == 0:
+        parcor = np.zeros((data.shape[0], 0), data.dtype)
+    else:
+        parcor = np.transpose(np.array(parcor))
+    return coeff, parcor, sigsq, variance
 
 
 # Check if data is complex
@@ -313,14 +425,7 @@ def _realPart(x):
 
 if __name__ == '__main__':
 
-    import FFT
-    def AutoCorrelationFunction(series):
-        n = 2*len(series)
-        FFTSeries = FFT.fft(series,n,0)
-        FFTSeries = FFTSeries*N.conjugate(FFTSeries)
-        FFTSeries = FFT.inverse_fft(FFTSeries,len(FFTSeries),0)
-        return FFTSeries[:len(series)]/(len(series)-N.arange(len(series)))
-
+    from Scientific.Signals.Correlation import autoCorrelation
     from MMTK.Random import gaussian
     from Scientific.Statistics import mean
     from Scientific.IO.ArrayIO import readArray
@@ -346,7 +451,7 @@ if __name__ == '__main__':
     print model.coeff
     print model.poles()
     c = model.correlation(200)
-    cref = InterpolatingFunction((t,), AutoCorrelationFunction(data))[:200]
+    cref = InterpolatingFunction((t[:200],), autoCorrelation(data, 200))
     m = model.memoryFunction(200)
     s = model.spectrum(N.arange(0., 5., 0.01))
     #plot(c.real, cref.real); plot(c.imag, cref.imag)
@@ -10,6 +10,8 @@ Standard and weighted histograms
 """
 
 from Scientific import N
+import numpy as np
+import copy
 
 class Histogram:
 
@@ -64,8 +66,29 @@ class Histogram:
     >>> d2 = Gnuplot.Data(x2, y2, with='lines',
     ...                   title='%d samples' % nsamples2)
     >>> g.plot(d1,d2)
+
+    Data is binned in chunks of L{chunk_size} points (100000 by
+    default), which limits the size of temporary arrays. The cost of
+    binning is proportional to the number of data points and
+    independent of the number of bins.
+
+    Histograms with the same bins can be combined with L{merge} or
+    with the + operator. This permits accumulating a histogram from
+    many data sets in parallel, either with L{fromChunks}, which uses
+    a process pool, or across the processors of a BSP program by
+    a L{Scientific.BSP.ParAccumulator}:
+
+    >>> from Scientific.BSP import ParAccumulator, ParFunction
+    >>> import operator
+    >>> empty = Histogram(N.zeros((0,)), 100, (0., 1.))
+    >>> total = ParAccumulator(operator.add, empty)
+    >>> total.addValue(ParFunction(lambda data: Histogram(data, 100,
+    ...                                                   (0., 1.)))(data))
+    >>> total = total.calculateTotal()
     """
 
+    chunk_size = 100000
+
     def __init__(self, data, nbins, range=None):
         """
         @param data: a sequence of data points
@@ -121,7 +144,7 @@ class Histogram:
         """Return an array of all the bin counts."""
         return self.array[:,1].copy()
         
-    def addData(self, data):
+    def addData(self, data, chunk_size=None):
         """
         Add values to the originally supplied data sequence. Use this
         method to feed long data sequences in multiple parts to avoid
@@ -129,22 +152,33 @@ class Histogram:
 
         @param data: a sequence of data points
         @type data: C{Numeric.array}
+        @param chunk_size: the number of data points binned at a time.
+                           The default is the class attribute
+                           L{chunk_size}.
+        @type chunk_size: C{int}
         @Note: this does not affect the default range of the histogram,
                which is fixed when the histogram is created.
         """
-        n = (len(data)+999)/1000
-        for i in range(n):
-            self._addData(data[1000*i:1000*(i+1)])
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        for i in range(0, len(data), chunk_size):
+            self._addData(data[i:i+chunk_size])
+
+    def _binIndices(self, data):
+        # Return the bin index of each data point inside the range
+        # and the mask selecting those points. Points on the upper
+        # boundary go into the last bin.
+        mask = N.logical_and(N.less_equal(data, self.max),
+                             N.greater_equal(data, self.min))
+        indices = N.floor((data[mask] - self.min)/self.bin_width).astype(N.Int)
+        nbins = self.array.shape[0]
+        return np.minimum(indices, nbins-1), mask
 
     def _addData(self, data):
-        data = N.array(data, N.Float)
-        data = N.repeat(data, N.logical_and(N.less_equal(data, self.max),
-                                            N.greater_equal(data, self.min)))
-        data = N.floor((data - self.min)/self.bin_width).astype(N.Int)
+        data = np.asarray(data, N.Float)
+        indices, mask = self._binIndices(data)
         nbins = self.array.shape[0]
-        histo = N.int_sum(N.equal(N.arange(nbins)[:,N.NewAxis], data), -1)
-        histo[-1] = histo[-1] + N.int_sum(N.equal(nbins, data))
-        self.array[:, 1] =  self.array[:, 1] + histo
+        self.array[:, 1] += np.bincount(indices, minlength=nbins)
 
     def normalize(self, norm=1.):
         """
@@ -164,6 +198,75 @@ class Histogram:
         """
         self.normalize(norm/self.bin_width)
 
+    def merge(self, other):
+        """
+        Add the bin counts of another histogram with the same bins
+
+        @param other: a histogram
+        @type other: L{Histogram}
+        @raises ValueError: if the bins of the two histograms differ
+        """
+        if len(self) != len(other) or self.min != other.min \
+               or self.max != other.max:
+            raise ValueError("incompatible histograms")
+        self.array[:, 1] += other.array[:, 1]
+
+    def __add__(self, other):
+        result = copy.deepcopy(self)
+        result.merge(other)
+        return result
+
+    def emptyCopy(self):
+        """
+        @returns: a histogram with the same bins and zero counts
+        @rtype: same as self
+        """
+        result = copy.deepcopy(self)
+        result.array[:, 1] = 0.
+        return result
+
+    def __getstate__(self):
+        return (self.min, self.max, self.array[:, 1])
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # Pickled by an earlier version
+            self.__dict__.update(state)
+            return
+        min, max, counts = state
+        self._setup(None, len(counts), (min, max))
+        self.array[:, 1] = counts
+
+    def _addChunk(self, chunk):
+        self.addData(chunk)
+
+    def fromChunks(cls, chunks, nbins, range, workers=None, pool=None):
+        """
+        Construct a histogram from a sequence of data sets
+
+        @param chunks: data sets, each of which is a valid argument
+                       to L{addData}
+        @type chunks: any iterable, e.g. a generator
+        @param nbins: the number of bins
+        @type nbins: C{int}
+        @param range: a tuple of two values, specifying the lower and
+                      the upper end of the interval spanned by the bins
+        @type range: C{tuple}
+        @param workers: if not C{None}, the data sets are binned in
+                        parallel by a C{multiprocessing.Pool} with this
+                        number of processes. Each process returns the
+                        histogram of one data set, and these
+                        histograms are merged.
+        @type workers: C{int}
+        @param pool: a process pool used instead of creating one
+        @type pool: C{multiprocessing.Pool}
+        @returns: the histogram of all data sets
+        @rtype: L{Histogram}
+        """
+        return _accumulate(cls(N.zeros((0,), N.Float), nbins, range),
+                           chunks, workers, pool)
+    fromChunks = classmethod(fromChunks)
+
 
 class WeightedHistogram(Histogram):
 
@@ -202,7 +305,7 @@ class WeightedHistogram(Histogram):
         self._setup(data, nbins, range)
         self.addData(data, weights)
 
-    def addData(self, data, weights):
+    def addData(self, data, weights, chunk_size=None):
         """
         Add values to the originally supplied data sequence. Use this
         method to feed long data sequences in multiple parts to avoid
@@ -210,29 +313,314 @@ class WeightedHistogram(Histogram):
 
         @param data: a sequence of data points
         @type data: C{Numeric.array}
+        @param weights: a sequence of weights, same length as data
+        @type weights: C{Numeric.array}
+        @param chunk_size: the number of data points binned at a time.
+                           The default is the class attribute
+                           L{chunk_size}.
+        @type chunk_size: C{int}
         @Note: this does not affect the default range of the histogram,
                which is fixed when the histogram is created.
         """
         if len(data) != len(weights):
             raise ValueError("wrong number of weights")
-        n = (len(data)+999)/1000
-        for i in range(n):
-            self._addData(data[1000*i:1000*(i+1)], weights[1000*i:1000*(i+1)])
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        for i in range(0, len(data), chunk_size):
+            self._addData(data[i:i+chunk_size], weights[i:i+chunk_size])
 
     def _addData(self, data, weights):
-        data = N.array(data, N.Float)
-        weights = N.array(weights, N.Float)
-        mask = N.logical_and(N.less_equal(data, self.max),
-                             N.greater_equal(data, self.min))
-        data = N.repeat(data, mask)
-        weights = N.repeat(weights, mask)
-        data = N.floor((data - self.min)/self.bin_width).astype(N.Int)
+        data = np.asarray(data, N.Float)
+        weights = np.asarray(weights, N.Float)
+        indices, mask = self._binIndices(data)
         nbins = self.array.shape[0]
-        histo = N.add.reduce(weights*N.equal(N.arange(nbins)[:,N.NewAxis],
-                                             data), -1)
-        histo[-1] = histo[-1] + N.add.reduce(N.repeat(weights,
-                                                      N.equal(nbins, data)))
-        self.array[:, 1] =  self.array[:, 1] + histo
+        self.array[:, 1] += np.bincount(indices, weights[mask], nbins)
+
+    def _addChunk(self, chunk):
+        data, weights = chunk
+        self.addData(data, weights)
+
+    def fromChunks(cls, chunks, nbins, range, workers=None, pool=None):
+        """
+        Construct a histogram from a sequence of weighted data sets
+
+        @param chunks: (data, weights) pairs
+        @type chunks: any iterable, e.g. a generator
+        @param nbins: the number of bins
+        @type nbins: C{int}
+        @param range: a tuple of two values, specifying the lower and
+                      the upper end of the interval spanned by the bins
+        @type range: C{tuple}
+        @param workers: if not C{None}, the data sets are binned in
+                        parallel by a C{multiprocessing.Pool} with this
+                        number of processes
+        @type workers: C{int}
+        @param pool: a process pool used instead of creating one
+        @type pool: C{multiprocessing.Pool}
+        @returns: the histogram of all data sets
+        @rtype: L{WeightedHistogram}
+        """
+        empty = N.zeros((0,), N.Float)
+        return _accumulate(cls(empty, empty, nbins, range),
+                           chunks, workers, pool)
+    fromChunks = classmethod(fromChunks)
+
+
+class HistogramND:
+
+    """
+    Histogram in one or more variables with arbitrary bin boundaries
+
+    The bins along each axis are defined by a monotonically increasing
+    sequence of bin edges, which need not be equally spaced. Bin i
+    along an axis contains the values x with edges[i] <= x < edges[i+1],
+    except for the last bin, which includes its upper edge as well.
+
+    Data points outside the bins are not lost: the count array has
+    one additional bin at both ends of each axis, which collects
+    the points below the first edge (underflow) or above the last
+    edge (overflow) along that axis. These outlier bins are included
+    in the return value of L{getBinCounts} on request.
+
+    Unweighted histograms store their counts in an integer array,
+    weighted histograms in a float array.
+
+    Here is an example of a two-dimensional histogram:
+
+    >>> import numpy as np
+    >>> h = HistogramND([np.linspace(0., 1., 11), [0., 0.1, 0.5, 1.]])
+    >>> h.addData(np.random.random((100000, 2)))
+    >>> h.getBinCounts().shape
+    (10, 3)
+    >>> h.getBinCounts(outliers=True).shape
+    (12, 5)
+    """
+
+    chunk_size = 100000
+
+    def __init__(self, edges, data=None, weights=None, weighted=False):
+        """
+        @param edges: one sequence of bin edges per axis
+        @type edges: sequence of C{Numeric.array}
+        @param data: an optional initial set of data points
+        @type data: C{Numeric.array} of shape (N, d), or of shape (N,)
+                    for a histogram in one variable
+        @param weights: the weights of the initial data points. If
+                        weights are given, the histogram is weighted.
+        @type weights: C{Numeric.array} of shape (N,)
+        @param weighted: if C{True}, the histogram is weighted even
+                         if no initial weights are given
+        @type weighted: C{bool}
+        @raises ValueError: if the edges of an axis are not increasing
+        """
+        self.edges = []
+        for axis_edges in edges:
+            axis_edges = np.array(axis_edges, N.Float)
+            if axis_edges.ndim != 1 or len(axis_edges) < 2 \
+                   or np.any(axis_edges[1:] <= axis_edges[:-1]):
+                raise ValueError("bin edges must be increasing")
+            self.edges.append(axis_edges)
+        self.dimension = len(self.edges)
+        self.shape = tuple([len(e)-1 for e in self.edges])
+        self.weighted = weighted or weights is not None
+        if self.weighted:
+            self.array = np.zeros([n+2 for n in self.shape], N.Float)
+        else:
+            self.array = np.zeros([n+2 for n in self.shape], N.Int)
+        if data is not None:
+            self.addData(data, weights)
+
+    def addData(self, data, weights=None, chunk_size=None):
+        """
+        Add data points to the histogram. Use this method to feed long
+        data sequences in multiple parts to avoid memory shortages.
+
+        @param data: a sequence of data points
+        @type data: C{Numeric.array} of shape (N, d), or of shape (N,)
+                    for a histogram in one variable
+        @param weights: the weights of the data points. If no weights
+                        are given, each point has weight one.
+        @type weights: C{Numeric.array} of shape (N,)
+        @param chunk_size: the number of data points binned at a time.
+                           The default is the class attribute
+                           L{chunk_size}.
+        @type chunk_size: C{int}
+        @raises ValueError: if the shape of the data or of the weights
+                            does not match, or if weights are given
+                            for an unweighted histogram
+        """
+        data = np.asarray(data, N.Float)
+        if data.ndim == 1 and self.dimension == 1:
+            data = data[:, np.newaxis]
+        if data.ndim != 2 or data.shape[1] != self.dimension:
+            raise ValueError("data must have shape (N, %d)" % self.dimension)
+        if weights is not None:
+            if not self.weighted:
+                raise ValueError("histogram is not weighted")
+            weights = np.asarray(weights, N.Float)
+            if weights.shape != data.shape[:1]:
+                raise ValueError("wrong number of weights")
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        for i in range(0, len(data), chunk_size):
+            if weights is None:
+                self._addData(data[i:i+chunk_size], None)
+            else:
+                self._addData(data[i:i+chunk_size], weights[i:i+chunk_size])
+
+    def _addData(self, data, weights):
+        indices = []
+        for axis in range(self.dimension):
+            edges = self.edges[axis]
+            x = data[:, axis]
+            # Index 0 is the underflow bin, len(edges) the overflow bin
+            index = np.searchsorted(edges, x, 'right')
+            index[x == edges[-1]] = len(edges)-1
+            indices.append(index)
+        flat = np.ravel_multi_index(indices, self.array.shape)
+        counts = np.bincount(flat, weights, self.array.size)
+        self.array += counts.reshape(self.array.shape).astype(self.array.dtype)
+
+    def getBinCounts(self, outliers=False):
+        """
+        @param outliers: if C{True}, the returned array contains the
+                         underflow and overflow bins at both ends of
+                         each axis
+        @type outliers: C{bool}
+        @returns: the bin counts
+        @rtype: C{Numeric.array} of C{int} (unweighted) or
+                C{float} (weighted)
+        """
+        if outliers:
+            return self.array.copy()
+        return self.array[(slice(1, -1),)*self.dimension].copy()
+
+    def getOutlierCount(self):
+        """
+        @returns: the number (or total weight) of the data points
+                  outside the bins along at least one axis
+        @rtype: C{int} or C{float}
+        """
+        return self.array.sum() - \
+               self.array[(slice(1, -1),)*self.dimension].sum()
+
+    def getBinCenters(self):
+        """
+        @returns: the bin centers along each axis
+        @rtype: C{list} of C{Numeric.array}
+        """
+        return [0.5*(e[1:]+e[:-1]) for e in self.edges]
+
+    def getBinVolumes(self):
+        """
+        @returns: the volume of each bin, i.e. the product of
+                  the bin widths along all axes
+        @rtype: C{Numeric.array} of the same shape as the bin counts
+        """
+        volumes = np.ones(self.shape, N.Float)
+        for axis in range(self.dimension):
+            shape = [1]*self.dimension
+            shape[axis] = self.shape[axis]
+            volumes = volumes*np.diff(self.edges[axis]).reshape(shape)
+        return volumes
+
+    def getDensity(self):
+        """
+        @returns: the bin counts divided by the bin volumes and by
+                  the total count inside the bins, such that the
+                  integral of the density over all bins is one
+        @rtype: C{Numeric.array} of C{float}
+        """
+        counts = self.getBinCounts()
+        return counts/(counts.sum()*self.getBinVolumes())
+
+    def merge(self, other):
+        """
+        Add the bin counts of another histogram with the same bins
+
+        @param other: a histogram
+        @type other: L{HistogramND}
+        @raises ValueError: if the bins of the two histograms differ,
+                            or if other is weighted but self is not
+        """
+        if self.shape != other.shape or (other.weighted
+                                         and not self.weighted) \
+               or not np.all([np.all(e1 == e2) for e1, e2
+                              in zip(self.edges, other.edges)]):
+            raise ValueError("incompatible histograms")
+        self.array += other.array
+
+    def __add__(self, other):
+        if other.weighted and not self.weighted:
+            return other + self
+        result = copy.deepcopy(self)
+        result.merge(other)
+        return result
+
+    def emptyCopy(self):
+        """
+        @returns: a histogram with the same bins and zero counts
+        @rtype: L{HistogramND}
+        """
+        return self.__class__(self.edges, weighted=self.weighted)
+
+    def _addChunk(self, chunk):
+        if isinstance(chunk, tuple):
+            self.addData(*chunk)
+        else:
+            self.addData(chunk)
+
+    def fromChunks(cls, chunks, edges, weighted=False, workers=None,
+                   pool=None):
+        """
+        Construct a histogram from a sequence of data sets
+
+        @param chunks: data sets, each of which is either an array of
+                       data points or a (data, weights) tuple
+        @type chunks: any iterable, e.g. a generator
+        @param edges: one sequence of bin edges per axis
+        @type edges: sequence of C{Numeric.array}
+        @param weighted: if C{True}, the histogram is weighted
+        @type weighted: C{bool}
+        @param workers: if not C{None}, the data sets are binned in
+                        parallel by a C{multiprocessing.Pool} with this
+                        number of processes
+        @type workers: C{int}
+        @param pool: a process pool used instead of creating one
+        @type pool: C{multiprocessing.Pool}
+        @returns: the histogram of all data sets
+        @rtype: L{HistogramND}
+        """
+        return _accumulate(cls(edges, weighted=weighted),
+                           chunks, workers, pool)
+    fromChunks = classmethod(fromChunks)
+
+
+def _fillHistogram(task):
+    histogram, chunk = task
+    histogram._addChunk(chunk)
+    return histogram
+
+def _accumulate(histogram, chunks, workers, pool):
+    # Bin all chunks into histogram, in parallel if requested
+    if workers is None and pool is None:
+        for chunk in chunks:
+            histogram._addChunk(chunk)
+        return histogram
+    own_pool = pool is None
+    if own_pool:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers)
+    try:
+        empty = histogram.emptyCopy()
+        tasks = ((empty, chunk) for chunk in chunks)
+        for partial in pool.imap_unordered(_fillHistogram, tasks):
+            histogram.merge(partial)
+    finally:
+        if own_pool:
+            pool.close()
+            pool.join()
+    return histogram
 
 
 if __name__ == '__main__':
@@ -0,0 +1,363 @@
+# One-pass statistics for data streams.
+#
+
+"""
+One-pass statistics for data streams
+
+The functions in L{Scientific.Statistics} require the complete data
+set in memory. A L{RunningStatistics} object instead accumulates the
+mean and the central moments of a data set that is supplied in chunks,
+for example from a generator reading a long time series from a file.
+A L{QuantileSketch} estimates quantiles of such a data set in bounded
+memory. Accumulators and sketches for different parts of the data set
+can be merged, which permits computing the statistics of a data set
+in parallel.
+"""
+
+from Scientific import N
+import numpy as np
+import copy
+
+
+class RunningStatistics:
+
+    """
+    Accumulator for the mean and central moments of a data set
+
+    Data is added in chunks by L{addData}. The mean and the sums of
+    the powers of the deviations from the mean up to the order given
+    to the constructor are updated for each chunk using the pairwise
+    update formulas of Chan et al. (for the variance) and Pebay (for
+    higher moments), which are numerically stable and exact for any
+    division of the data into chunks. Two accumulators can be merged
+    in the same way.
+
+    If the data points are arrays of shape (k,) (i.e. the chunks have
+    shape (N, k)), the statistics are computed for each column
+    separately and all results are arrays of shape (k,).
+
+    The results agree with the functions of the same name in
+    L{Scientific.Statistics}: L{variance} divides by N-1, whereas
+    L{moment} and the normalized moments use the factor 1/N.
+
+    >>> s = RunningStatistics()
+    >>> for chunk in chunks:
+    ...     s.addData(chunk)
+    >>> s.mean(), s.standardDeviation(), s.skewness()
+    """
+
+    def __init__(self, data=None, order=4):
+        """
+        @param data: an optional initial set of data points
+        @type data: C{Numeric.array} of shape (N,) or (N, k)
+        @param order: the highest order of the central moments that are
+                      accumulated, at least 2
+        @type order: C{int}
+        """
+        if order < 2:
+            raise ValueError("order must be at least 2")
+        self.order = order
+        self.count = 0
+        self._mean = None
+        self._sums = None
+        if data is not None:
+            self.addData(data)
+
+    def addData(self, data):
+        """
+        Add data points
+
+        @param data: a sequence of data points
+        @type data: C{Numeric.array} of shape (N,) or (N, k)
+        @raises ValueError: if the shape of the data points differs from
+                            the shape of the data points added before
+        """
+        data = np.asarray(data, N.Float)
+        if data.ndim == 0:
+            data = data[np.newaxis]
+        if len(data) == 0:
+            return
+        mean = np.add.reduce(data)/len(data)
+        deviation = data-mean
+        sums = [None, None]
+        power = deviation
+        for p in range(2, self.order+1):
+            power = power*deviation
+            sums.append(np.add.reduce(power))
+        self._merge(len(data), mean, sums)
+
+    def merge(self, other):
+        """
+        Add the data points accumulated by another accumulator
+
+        @param other: an accumulator of the same order
+        @type other: L{RunningStatistics}
+        @raises ValueError: if the accumulators have different orders
+                            or data points of different shapes
+        """
+        if other.order != self.order:
+            raise ValueError("incompatible accumulators")
+        if other.count > 0:
+            self._merge(other.count, other._mean, other._sums)
+
+    def __add__(self, other):
+        result = copy.deepcopy(self)
+        result.merge(other)
+        return result
+
+    def _merge(self, n_b, mean_b, sums_b):
+        if self.count == 0:
+            self.count = n_b
+            self._mean = mean_b.copy()
+            self._sums = [None, None] + [s.copy() for s in sums_b[2:]]
+            return
+        if np.shape(mean_b) != np.shape(self._mean):
+            raise ValueError("data points must have shape %s"
+                             % str(np.shape(self._mean)))
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self._mean
+        sums_a = self._sums
+        sums = [None, None]
+        for p in range(2, self.order+1):
+            # Pebay (2008), equation (2.1)
+            m = sums_a[p] + sums_b[p] \
+                + (n_a*n_b*delta/n)**p * (1./n_b**(p-1)
+                                          - (-1./n_a)**(p-1))
+            binomial = 1.
+            for k in range(1, p-1):
+                binomial = binomial*(p-k+1)/k
+                m = m + binomial*delta**k \
+                    * ((-float(n_b)/n)**k*sums_a[p-k]
+                       + (float(n_a)/n)**k*sums_b[p-k])
+            sums.append(m)
+        self.count = n
+        self._mean = self._mean + delta*(float(n_b)/n)
+        self._sums = sums
+
+    def fromChunks(cls, chunks, order=4):
+        """
+        Construct an accumulator from a sequence of data sets
+
+        @param chunks: data sets, each of which is a valid argument
+                       to L{addData}
+        @type chunks: any iterable, e.g. a generator
+        @param order: the highest order of the central moments that are
+                      accumulated
+        @type order: C{int}
+        @returns: the accumulator for all data sets
+        @rtype: L{RunningStatistics}
+        """
+        statistics = cls(order=order)
+        for chunk in chunks:
+            statistics.addData(chunk)
+        return statistics
+    fromChunks = classmethod(fromChunks)
+
+    def _check(self, order=1):
+        if self.count == 0:
+            raise ValueError("no data")
+        if order > self.order:
+            raise ValueError("moments of order %d are not accumulated"
+                             % order)
+
+    def mean(self):
+        """
+        @returns: the mean of the data
+        @rtype: C{float} or C{Numeric.array}
+        """
+        self._check()
+        return self._mean.copy()
+
+    def variance(self):
+        """
+        @returns: the variance of the data, using the normalization
+                  factor 1/(N-1)
+        @rtype: C{float} or C{Numeric.array}
+        """
+        self._check(2)
+        return self._sums[2]/(self.count-1)
+
+    def standardDeviation(self):
+        """
+        @returns: the standard deviation of the data, using the
+                  normalization factor 1/(N-1)
+        @rtype: C{float} or C{Numeric.array}
+        """
+        return np.sqrt(self.variance())
+
+    def moment(self, order):
+        """
+        @param order: the order of the moment
+        @type order: C{int}
+        @returns: the central moment of the given order, using the
+                  normalization factor 1/N
+        @rtype: C{float} or C{Numeric.array}
+        """
+        self._check(order)
+        if order == 0:
+            return np.ones_like(self._mean)
+        if order == 1:
+            return np.zeros_like(self._mean)
+        return self._sums[order]/self.count
+
+    def normalizedMoment(self, order):
+        """
+        @param order: the order of the moment
+        @type order: C{int}
+        @returns: the central moment of the given order divided by the
+                  n-th power of the standard deviation (with the
+                  normalization factor 1/N)
+        @rtype: C{float} or C{Numeric.array}
+        """
+        return self.moment(order)/np.sqrt(self.moment(2)**order)
+
+    def skewness(self):
+        """
+        @returns: the skewness (third normalized moment)
+        @rtype: C{float} or C{Numeric.array}
+        """
+        return self.normalizedMoment(3)
+
+    def kurtosis(self):
+        """
+        @returns: the kurtosis (fourth normalized moment)
+        @rtype: C{float} or C{Numeric.array}
+        """
+        return self.normalizedMoment(4)
+
+
+class QuantileSketch:
+
+    """
+    Approximate quantiles of a data stream in bounded memory
+
+    The sketch summarizes the data by a sorted list of centroids (mean
+    value and number of points) as in the t-digest of Dunning and
+    Ertl. Centroids near the extremes of the distribution contain few
+    points and those near the median many points, such that the
+    accuracy of the quantiles is best in the tails. The number of
+    centroids is about half the compression parameter and grows only
+    logarithmically with the number of data points. The smallest and
+    largest data values are kept exactly.
+
+    Data is added in chunks by L{addData}, and two sketches can be
+    merged, e.g. to combine sketches built by different processes.
+
+    >>> sketch = QuantileSketch.fromChunks(chunks)
+    >>> sketch.quantile([0.01, 0.5, 0.99])
+    """
+
+    def __init__(self, data=None, compression=200):
+        """
+        @param data: an optional initial set of data points
+        @type data: C{Numeric.array}
+        @param compression: the accuracy parameter. Larger values give
+                            more accurate quantiles but require more
+                            memory and time.
+        @type compression: C{int}
+        """
+        self.compression = compression
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.means = np.zeros((0,), N.Float)
+        self.weights = np.zeros((0,), N.Float)
+        if data is not None:
+            self.addData(data)
+
+    def addData(self, data):
+        """
+        Add data points
+
+        @param data: a sequence of data points
+        @type data: C{Numeric.array}
+        """
+        data = np.ravel(np.asarray(data, N.Float))
+        if len(data) == 0:
+            return
+        self._merge(data, np.ones(data.shape), data.min(), data.max())
+
+    def merge(self, other):
+        """
+        Add the data points summarized by another sketch
+
+        @param other: a sketch
+        @type other: L{QuantileSketch}
+        """
+        if other.count > 0:
+            self._merge(other.means, other.weights, other.min, other.max)
+
+    def __add__(self, other):
+        result = copy.deepcopy(self)
+        result.merge(other)
+        return result
+
+    def _merge(self, means, weights, min, max):
+        if self.count == 0:
+            self.min = min
+            self.max = max
+        else:
+            self.min = np.minimum(self.min, min)
+            self.max = np.maximum(self.max, max)
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        order = np.argsort(means, kind='mergesort')
+        means = means[order]
+        weights = weights[order]
+        total = np.add.reduce(weights)
+        # Centroids are grouped by the integer part of the scale function
+        # k(q) = compression/z * log(q/(1-q)), evaluated at the center
+        # of each centroid, with the normalization z of Dunning (2019)
+        # that limits the number of centroids.
+        q = (np.add.accumulate(weights) - 0.5*weights)/total
+        z = 4.*np.log(np.maximum(total/self.compression, 1.)) + 24.
+        k = np.floor(self.compression/z*np.log(q/(1.-q)))
+        group = np.add.accumulate(np.concatenate([[0], k[1:] != k[:-1]]))
+        self.weights = np.bincount(group, weights)
+        self.means = np.bincount(group, weights*means)/self.weights
+        self.count = total
+
+    def fromChunks(cls, chunks, compression=200):
+        """
+        Construct a sketch from a sequence of data sets
+
+        @param chunks: data sets, each of which is a valid argument
+                       to L{addData}
+        @type chunks: any iterable, e.g. a generator
+        @param compression: the accuracy parameter
+        @type compression: C{int}
+        @returns: the sketch for all data sets
+        @rtype: L{QuantileSketch}
+        """
+        sketch = cls(compression=compression)
+        for chunk in chunks:
+            sketch.addData(chunk)
+        return sketch
+    fromChunks = classmethod(fromChunks)
+
+    def quantile(self, q):
+        """
+        @param q: one or several probabilities between 0 and 1
+        @type q: C{float} or C{Numeric.array}
+        @returns: the estimated quantile(s)
+        @rtype: C{float} or C{Numeric.array}
+        """
+        if self.count == 0:
+            raise ValueError("no data")
+        q = np.asarray(q, N.Float)
+        if np.any(q < 0.) or np.any(q > 1.):
+            raise ValueError("probabilities must be between 0 and 1")
+        # Interpolate between the centroids, placed at the center of
+        # the range of ranks they represent, and the extreme values.
+        ranks = np.add.accumulate(self.weights) - 0.5*self.weights
+        ranks = np.concatenate([[0.], ranks, [self.count]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(q*self.count, ranks, values)
+
+    def median(self):
+        """
+        @returns: the estimated median
+        @rtype: C{float}
+        """
+        return self.quantile(0.5)
@@ -10,6 +10,7 @@ Basic monovariate statistics
 """
 
 from Scientific import N
+import numpy as np
 
 #
 # Univariate statistics functions
@@ -93,6 +94,13 @@ def standardDeviation(data):
     """
     return N.sqrt(variance(data))
 
+def _select(data, indices):
+    # Return the data values at the given positions in sorted order,
+    # using a selection algorithm (linear time) where available.
+    if hasattr(np, 'partition'):
+        return np.partition(data, indices)[indices]
+    return N.sort(data)[indices]
+
 def median(data):
     """
     Median
@@ -102,17 +110,60 @@ def median(data):
     @returns: the median of the number sequence
     @rtype: number
     """
-    data = N.sort(N.array(data))
+    data = np.ravel(data)
     l = (len(data)-1)/2.
-    return (data[int(N.floor(l))]+data[int(N.ceil(l))])/2.
+    lower, upper = _select(data, [int(N.floor(l)), int(N.ceil(l))])
+    return (lower+upper)/2.
+
+def quantile(data, q):
+    """
+    Quantiles, interpolating linearly between data points
+
+    @param data: a sequence of numbers
+    @type data: C{list} or C{Numeric.array}
+    @param q: one or several probabilities between 0 and 1. For 0.5,
+              the result is the median.
+    @type q: C{float} or C{Numeric.array}
+    @returns: the quantile(s) of the number sequence
+    @rtype: number or C{Numeric.array}
+    """
+    data = np.ravel(data)
+    q = np.asarray(q, N.Float)
+    if np.any(q < 0.) or np.any(q > 1.):
+        raise ValueError("probabilities must be between 0 and 1")
+    position = q*(len(data)-1)
+    lower = np.floor(position).astype(N.Int)
+    upper = np.ceil(position).astype(N.Int)
+    indices = np.unique(np.concatenate([np.ravel(lower), np.ravel(upper)]))
+    values = _select(data, indices)
+    lower = values[np.searchsorted(indices, lower)]
+    upper = values[np.searchsorted(indices, upper)]
+    fraction = position-np.floor(position)
+    return (1.-fraction)*lower + fraction*upper
 
 def mode(data):
-    h = {}
-    for n in data:
-        try: h[n] = h[n]+1
-        except KeyError: h[n] = 1
-    a = map(lambda x: (x[1], x[0]), h.items())
-    return max(a)[1]
+    """
+    Mode (most frequent value)
+
+    @param data: a sequence of numbers
+    @type data: C{list} or C{Numeric.array}
+    @returns: the most frequent value in the number sequence. If
+              several values occur equally often, the largest one
+              is returned.
+    @rtype: number
+    """
+    data = np.ravel(data)
+    if data.dtype.kind in 'iu' and len(data) > 0 \
+           and data.max()-data.min() <= 2*len(data):
+        # Small integer range: count directly
+        offset = data.min()
+        counts = np.bincount(data-offset)
+        return offset + len(counts)-1-np.argmax(counts[::-1])
+    # Count the runs of equal values in the sorted data
+    data = np.sort(data)
+    starts = np.concatenate([[0], np.flatnonzero(data[1:] != data[:-1])+1])
+    counts = np.diff(np.concatenate([starts, [len(data)]]))
+    return data[starts[len(counts)-1-np.argmax(counts[::-1])]]
 
 def normalizedMoment(data, order):
     """
@@ -163,7 +214,9 @@ def kurtosis(data):
 
 def correlation(data1, data2):
     """
-    Calculates the correlation coefficient between two data sequences
+    Calculates the correlation coefficient between two data sequences.
+    For time correlation functions, see L{autoCorrelation} and
+    L{crossCorrelation}.
 
     @param data1: first data sequence
     @type data1: C{Numeric.array} or C{list}
@@ -182,3 +235,8 @@ def correlation(data1, data2):
     return N.add.reduce(data1*data2) / \
            N.sqrt(N.add.reduce(data1*data1) \
                         * N.add.reduce(data2*data2))
+
+#
+# Time correlation functions
+#
+from Scientific.Signals.Correlation import autoCorrelation, crossCorrelation
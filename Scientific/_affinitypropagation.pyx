@@ -1,5 +1,5 @@
 # Implementation of Affinity Propagation in Cython
-# Accelerates DataSet.findCluster by a factor of 5.
+# One iteration takes a time proportional to the number of similarities.
 #
 # Written by Konrad Hinsen
 #
@@ -7,44 +7,95 @@
 import numpy as np
 cimport numpy as np
 
+cdef extern from "math.h":
+    double HUGE_VAL
+
 def _affinityPropagation(dataset, np.ndarray s, np.ndarray a,
-                         np.ndarray r, float damping):
-    cdef np.ndarray as
-    cdef np.ndarray r_new
-    cdef np.ndarray a_new
-    cdef np.ndarray rpos
-    cdef np.ndarray ind_array
-    cdef long *ind
-    cdef double *dptr
-    cdef double v
-    cdef int i
-    cdef int j
+                         np.ndarray r, double damping):
+    cdef np.ndarray row_pointers_array
+    cdef np.ndarray rows_array
+    cdef np.ndarray columns_array
+    cdef np.ndarray diagonal_array
+    cdef np.ndarray r_new_array
+    cdef np.ndarray a_new_array
+    cdef np.ndarray column_sum_array
+    cdef long *row_pointers
+    cdef long *rows
+    cdef long *columns
+    cdef long *diagonal
+    cdef double *sp
+    cdef double *ap
+    cdef double *rp
+    cdef double *r_new
+    cdef double *a_new
+    cdef double *column_sum
+    cdef double v, max1, max2, rpos
+    cdef long jmax
+    cdef int nitems
+    cdef int nsimilarities
+    cdef int i, j, k
+
+    nitems = dataset.nitems
+    nsimilarities = dataset.nsimilarities
+    row_pointers_array = np.ascontiguousarray(dataset.row_pointers, np.int_)
+    rows_array = np.ascontiguousarray(dataset.row_indices, np.int_)
+    columns_array = np.ascontiguousarray(dataset.column_indices, np.int_)
+    diagonal_array = np.ascontiguousarray(dataset.diagonal_indices, np.int_)
+    s = np.ascontiguousarray(s, np.float)
+    a = np.ascontiguousarray(a, np.float)
+    r = np.ascontiguousarray(r, np.float)
+    r_new_array = np.zeros((nsimilarities,), np.float)
+    a_new_array = np.zeros((nsimilarities,), np.float)
+    column_sum_array = np.zeros((nitems,), np.float)
+    row_pointers = <long *>row_pointers_array.data
+    rows = <long *>rows_array.data
+    columns = <long *>columns_array.data
+    diagonal = <long *>diagonal_array.data
+    sp = <double *>s.data
+    ap = <double *>a.data
+    rp = <double *>r.data
+    r_new = <double *>r_new_array.data
+    a_new = <double *>a_new_array.data
+    column_sum = <double *>column_sum_array.data
 
-    as = a + s
-    r_new = np.zeros((dataset.nsimilarities,), np.float)
-    for i from 0 <= i < dataset.nsimilarities:
-        ind_array = dataset.r_update_indices[i]
-        ind = <long *>ind_array.data
-        dptr = <double *>as.data
-        v = dptr[ind[0]]
-        for j from 1 <= j < ind_array.shape[0]:
-            if dptr[ind[j]] > v:
-                v = dptr[ind[j]]
-        r_new[i] = s[i] - v
-    r = damping*r + (1-damping)*r_new
+    # Responsibilities: s(i, k) minus the largest value of a+s over
+    # the other entries of row i, obtained from the largest and the
+    # second largest value in the row.
+    for i from 0 <= i < nitems:
+        max1 = -HUGE_VAL
+        max2 = -HUGE_VAL
+        jmax = -1
+        for j from row_pointers[i] <= j < row_pointers[i+1]:
+            v = ap[j] + sp[j]
+            if v > max1:
+                max2 = max1
+                max1 = v
+                jmax = j
+            elif v > max2:
+                max2 = v
+        for j from row_pointers[i] <= j < row_pointers[i+1]:
+            if j == jmax:
+                v = sp[j] - max2
+            else:
+                v = sp[j] - max1
+            r_new[j] = damping*rp[j] + (1-damping)*v
 
-    rpos = np.maximum(0., r)
-    a_new = np.take(r, dataset.a_update_indices_1)
-    a_new[-dataset.nitems:] = 0.
-    for i from 0 <= i < dataset.nsimilarities:
-        ind_array = dataset.a_update_indices_2[i]
-        ind = <long *>ind_array.data
-        dptr = <double *>rpos.data
-        v = dptr[ind[0]]
-        for j from 1 <= j < ind_array.shape[0]:
-            v = v + dptr[ind[j]]
-        a_new[i] = a_new[i] + v
-    a_new[:-dataset.nitems] = np.minimum(0., a_new[:-dataset.nitems])
-    a = damping*a + (1-damping)*a_new
+    # Availabilities: sums of the positive responsibilities over the
+    # columns, without the self terms.
+    for j from 0 <= j < nsimilarities:
+        if rows[j] != columns[j] and r_new[j] > 0.:
+            column_sum[columns[j]] = column_sum[columns[j]] + r_new[j]
+    for j from 0 <= j < nsimilarities:
+        k = columns[j]
+        if rows[j] == k:
+            v = column_sum[k]
+        else:
+            rpos = r_new[j]
+            if rpos < 0.:
+                rpos = 0.
+            v = r_new[diagonal[k]] + column_sum[k] - rpos
+            if v > 0.:
+                v = 0.
+        a_new[j] = damping*ap[j] + (1-damping)*v
 
-    return a, r
+    return a_new_array, r_new_array
@@ -7,6 +7,7 @@
 
 import unittest
 from Scientific.Clustering.AffinityPropagation import DataSet
+from Scientific.Clustering import AffinityPropagation
 from Scientific import N
 
 
@@ -62,5 +63,69 @@ class APTest(unittest.TestCase):
             data.findClusters(threshold)
             self.assert_(N.logical_and.reduce(data.exemplar == result))
 
+    def testInputForms(self):
+        n = len(self.points)
+        array = N.zeros((n, n), N.Float)
+        triples = []
+        for i in range(n):
+            for k in range(n):
+                if i != k:
+                    array[i, k] = self.simfunc(self.points[i], self.points[k])
+                    if i < k:
+                        triples.append((i, k, array[i, k]))
+        data1 = DataSet(self.points, array, minimal_similarity=-20.)
+        data2 = DataSet(self.points, triples, symmetric=True,
+                        minimal_similarity=-20.)
+        for data in [data1, data2]:
+            self.assertEqual(data.nsimilarities,
+                             N.int_sum(N.ravel(array >= -20.)))
+            self.assertEqual(list(data.row_pointers),
+                             [0]+list(N.add.accumulate(N.add.reduce(
+                                 array >= -20., 1))))
+            for i in range(n):
+                first = data.row_pointers[i]
+                last = data.row_pointers[i+1]
+                columns = list(data.column_indices[first:last])
+                self.assertEqual(columns, sorted(columns))
+                self.assertTrue(i in columns)
+        self.assertEqual(list(data1.similarities), list(data2.similarities))
+        self.assertEqual(data1.median_similarity, data2.median_similarity)
+        for threshold, result in self.results[1:]:
+            data1.findClusters(threshold)
+            data2.findClusters(threshold)
+            self.assert_(N.logical_and.reduce(data1.exemplar
+                                              == data2.exemplar))
+        self.assertRaises(ValueError, DataSet, self.points, [(0, n, -1.)])
+        self.assertRaises(ValueError, DataSet, self.points, [(1, 1, -1.)])
+
+    def testIsolatedItem(self):
+        points = N.concatenate([self.points, [[100., 100.]]])
+        data = DataSet(points, self.simfunc, symmetric=True,
+                       minimal_similarity=-100.)
+        data.findClusters(-50.)
+        self.assertEqual(data.exemplar[-1], len(points)-1)
+
+    def testScaledUp(self):
+        # Four shifted copies of the points form four separate groups
+        # of clusters.
+        points = N.concatenate([self.points + N.array([x, y])
+                                for x in [0., 50.] for y in [0., 50.]])
+        data = DataSet(points, self.simfunc, symmetric=True,
+                       minimal_similarity=-1000.)
+        data.findClusters(-50.)
+        n = len(self.points)
+        for i in range(4):
+            self.assert_(N.logical_and.reduce(data.exemplar[i*n:(i+1)*n]
+                                              == self.results[0][1]+i*n))
+        # The compiled kernel, if available, agrees with the array version
+        s = N.sin(N.arange(data.nsimilarities))-1.
+        a = 0.1*N.cos(N.arange(data.nsimilarities))
+        r = N.zeros(s.shape, N.Float)
+        a1, r1 = AffinityPropagation._affinityPropagation(data, s, a, r, 0.5)
+        a2, r2 = AffinityPropagation._affinityPropagationArrays(data, s, a,
+                                                                r, 0.5)
+        self.assertTrue(N.maximum.reduce(abs(a1-a2)) < 1.e-12)
+        self.assertTrue(N.maximum.reduce(abs(r1-r2)) < 1.e-12)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,84 @@
+#
+# Tests for Scientific.Signals.Correlation
+#
+
+import unittest
+from Scientific.Signals.Correlation import autoCorrelation, \
+     crossCorrelation, CorrelationAccumulator
+from Scientific import N
+
+
+def directCorrelation(x, y, nsteps):
+    n = len(x)
+    return N.array([N.add.reduce(x[t:]*N.conjugate(y[:n-t]))/(n-t)
+                    for t in range(nsteps)])
+
+
+class CorrelationTest(unittest.TestCase):
+
+    def setUp(self):
+        t = N.arange(500)
+        self.x = N.sin(0.1*t) + 0.3*N.cos(1.7*t**1.1)
+        self.y = N.exp(0.05j*t) + 0.2*N.sin(2.3*t)
+
+    def assertArraysClose(self, a, b, tolerance=1.e-12):
+        self.assertEqual(N.shape(a), N.shape(b))
+        self.assertTrue(N.maximum.reduce(abs(N.ravel(a-b))) < tolerance)
+
+    def testAuto(self):
+        c = autoCorrelation(self.x)
+        self.assertEqual(c.dtype, N.Float)
+        self.assertArraysClose(c, directCorrelation(self.x, self.x, 500))
+        c = autoCorrelation(self.y, 50)
+        self.assertArraysClose(c, directCorrelation(self.y, self.y, 50))
+        c = autoCorrelation(self.x, 10, 'biased')
+        self.assertArraysClose(c, directCorrelation(self.x, self.x, 10)
+                                  * (500.-N.arange(10))/500.)
+        c = autoCorrelation(N.array([1., 2., 3.]), normalization=None)
+        self.assertArraysClose(c, N.array([14., 8., 3.]))
+        self.assertRaises(ValueError, autoCorrelation, self.x, 501)
+        self.assertRaises(ValueError, autoCorrelation, self.x, 5, 'none')
+
+    def testCross(self):
+        c = crossCorrelation(self.x, self.y, 100)
+        self.assertArraysClose(c, directCorrelation(self.x, self.y, 100))
+        c = crossCorrelation(self.y, self.x, 100)
+        self.assertArraysClose(c, directCorrelation(self.y, self.x, 100))
+        self.assertRaises(ValueError, crossCorrelation, self.x, self.y[1:])
+
+    def testSeveralSeries(self):
+        series = N.array([self.x, 2.*self.x, self.x**2])
+        c = autoCorrelation(series, 20)
+        self.assertEqual(c.shape, (3, 20))
+        for i in range(3):
+            self.assertArraysClose(c[i], directCorrelation(series[i],
+                                                           series[i], 20))
+        c = crossCorrelation(series, series[::-1], 20)
+        for i in range(3):
+            self.assertArraysClose(c[i], directCorrelation(series[i],
+                                                           series[2-i], 20))
+
+    def testAccumulator(self):
+        for nsteps, size in [(1, 10), (30, 7), (30, 100), (500, 64)]:
+            acc = CorrelationAccumulator(nsteps)
+            cross = CorrelationAccumulator(nsteps)
+            for i in range(0, 500, size):
+                acc.addData(self.x[i:i+size])
+                cross.addData(self.x[i:i+size], self.y[i:i+size])
+            self.assertEqual(acc.length, 500)
+            self.assertArraysClose(acc.correlation(),
+                                   autoCorrelation(self.x, nsteps))
+            self.assertArraysClose(cross.correlation('biased'),
+                                   crossCorrelation(self.x, self.y, nsteps,
+                                                    'biased'))
+        series = N.array([self.x, self.x**2])
+        acc = CorrelationAccumulator(10)
+        for i in range(0, 500, 33):
+            acc.addData(series[:, i:i+33])
+        self.assertArraysClose(acc.correlation(), autoCorrelation(series, 10))
+        self.assertRaises(ValueError, acc.addData, self.x)
+        self.assertRaises(ValueError, CorrelationAccumulator(10).correlation)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#
+# Tests for Scientific.Functions.DenseDerivatives and the array mode
+# of Scientific.Functions.FirstDerivatives
+#
+
+import unittest
+from Scientific.Functions import Derivatives, DenseDerivatives
+from Scientific.Functions import FirstDerivatives
+from Scientific import N
+
+
+class DenseDerivativesTest(unittest.TestCase):
+
+    """
+    Compare DenseDerivatives to Derivatives
+    """
+
+    functions = [lambda x, y: N.sqrt(x*y),
+                 lambda x, y: N.exp(x)*N.sin(y)/(x+y),
+                 lambda x, y: x**3 - 2*y**2.5 + 1./x,
+                 lambda x, y: N.arctan2(y, x)*N.log(x),
+                 lambda x, y: N.tan(x/10.) + N.arcsin(y/10.)
+                              + N.arctan(x*y),
+                 lambda x, y: N.tanh(x-y)*N.cosh(y/5.) - abs(x-y),
+                 lambda x, y: x**y - 3/y]
+
+    def compare(self, function, values, order):
+        ref = function(*[Derivatives.DerivVar(v, i, order)
+                         for i, v in enumerate(values)])
+        dense = function(*[DenseDerivatives.DerivVar(v, i, order)
+                           for i, v in enumerate(values)])
+        for n in range(order+1):
+            diff = N.ravel(N.array(ref[n]) - dense[n])
+            self.assertTrue(N.alltrue(N.fabs(diff) < 1.e-10))
+
+    def testFunctions(self):
+        for order in [1, 2, 3]:
+            for function in self.functions:
+                self.compare(function, [0.7, 1.3], order)
+                self.compare(function, [1.7, 0.3], order)
+
+    def testVariableCount(self):
+        x = DenseDerivatives.DerivVar(2., 0, 2)
+        z = DenseDerivatives.DerivVar(3., 4, 2)
+        f = x*z + x
+        self.assertEqual(f[2].shape, (5, 5))
+        self.assertEqual(list(f[1]), [4., 0., 0., 0., 2.])
+        self.assertEqual(f[2][0, 4], 1.)
+        self.assertEqual(f[2][4, 0], 1.)
+
+
+class FirstDerivativesArrayTest(unittest.TestCase):
+
+    """
+    Compare the array mode of FirstDerivatives to the list mode
+    """
+
+    functions = [lambda x, a, b: a*N.exp(-b*x),
+                 lambda x, a, b: (a/(1.+x*b))**b + N.sqrt(a*x+1.),
+                 lambda x, a, b: N.arctan2(a, b*x+1.) - abs(a-x),
+                 lambda x, a, b: N.sin(x)*a + N.cos(b)/(x+a)]
+
+    x = N.array([0., 0.5, 1., 2.5])
+
+    def compare(self, function, params):
+        nvars = len(params)
+        args = [FirstDerivatives.DerivVar(p, i, 1, nvars)
+                for i, p in enumerate(params)]
+        result = function(self.x, *args)
+        self.assertEqual(result[1].shape, (len(self.x), nvars))
+        for i in range(len(self.x)):
+            ref = function(self.x[i],
+                           *[FirstDerivatives.DerivVar(p, j)
+                             for j, p in enumerate(params)])
+            self.assertAlmostEqual(result[0][i], ref[0], 12)
+            diff = N.array(ref[1]) - result[1][i]
+            self.assertTrue(N.alltrue(N.fabs(diff) < 1.e-12))
+
+    def testFunctions(self):
+        for function in self.functions:
+            self.compare(function, [2., 0.5])
+            self.compare(function, [0.3, 1.7])
+
+    def testDerivFn(self):
+        f = FirstDerivatives.DerivFn(lambda u, v: u*v,
+                                     lambda u, v: v, lambda u, v: u)
+        a = FirstDerivatives.DerivVar(2., 0, 1, 2)
+        b = FirstDerivatives.DerivVar(3., 1, 1, 2)
+        r = f(a*self.x, b)
+        self.assertTrue(N.alltrue(r[0] == 6.*self.x))
+        self.assertTrue(N.alltrue(r[1][:, 0] == 3.*self.x))
+        self.assertTrue(N.alltrue(r[1][:, 1] == 2.*self.x))
+        g = FirstDerivatives.NumDerivFn(lambda u: u**3, 1.e-4)
+        r = g(a*self.x)
+        diff = r[1][:, 0] - 3.*a.value**2*self.x**3
+        self.assertTrue(N.alltrue(N.fabs(diff) < 1.e-6))
+
+    def testDerivVector(self):
+        v = FirstDerivatives.DerivVector(1., 2., 3., 1, 5)
+        l = v.length()
+        self.assertEqual(l[1].shape, (5,))
+        self.assertAlmostEqual(l[1][2], 2./N.sqrt(14.), 14)
+        self.assertEqual(l[1][0], 0.)
+
+    def testSignAndComparison(self):
+        a = FirstDerivatives.DerivVar(2., 0, 1, 2)
+        s = (a*(self.x-0.7)).sign()
+        self.assertEqual(list(s[0]), [-1., -1., 1., 1.])
+        self.assertEqual(s[1].shape, (len(self.x), 2))
+        self.assertTrue(N.alltrue(N.ravel(s[1] == 0.)))
+        self.assertRaises(ValueError, (a*self.x).sign)
+        self.assertEqual(a.sign()[0], 1.)
+        b = a*self.x
+        self.assertRaises(ValueError, bool, b)
+        self.assertRaises(ValueError, cmp, b, a)
+        self.assertRaises(ValueError, cmp, a, b)
+        self.assertTrue(a)
+        self.assertTrue(a < FirstDerivatives.DerivVar(3., 1, 1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+#
+# Tests for Scientific.Functions.FindRoot
+#
+
+import unittest
+from Scientific.Functions.FindRoot import newtonRaphson, batchedNewtonRaphson
+from Scientific import N
+
+
+def func(x):
+    return (2*x*N.cos(x) - N.sin(x))*N.cos(x) - x + N.pi/4.0
+
+
+class FindRootTest(unittest.TestCase):
+
+    def testSingle(self):
+        self.assertAlmostEqual(newtonRaphson(func, 0., 1., 1.e-12),
+                               0.9528478646549419, 12)
+
+    def testBatch(self):
+        roots, iterations, converged = \
+               batchedNewtonRaphson(func, 0., N.array([1., 1.2, 0.5]),
+                                    1.e-12)
+        self.assertEqual(list(converged), [True, True, False])
+        self.assertAlmostEqual(roots[0], 0.9528478646549419, 12)
+        self.assertAlmostEqual(roots[1], 0.9528478646549419, 12)
+        self.assertTrue(roots[2] != roots[2])
+        self.assertEqual(iterations[2], 0)
+        self.assertTrue(iterations[0] > 0)
+
+    def testParameters(self):
+        c = N.array([[0.5, 2., 10.], [30., 50., 100.]])
+        for derivative in [None, lambda x, c: 3*x**2+1]:
+            roots, iterations, converged = \
+                   batchedNewtonRaphson(lambda x, c: x**3 + x - c,
+                                        N.zeros(c.shape), 10., 1.e-12,
+                                        derivative, c)
+            self.assertEqual(roots.shape, c.shape)
+            self.assertTrue(N.alltrue(N.ravel(converged)))
+            error = N.fabs(N.ravel(roots**3 + roots - c))
+            self.assertTrue(N.alltrue(error < 1.e-10))
+
+    def testIterationLimit(self):
+        roots, iterations, converged = \
+               batchedNewtonRaphson(lambda x: x*x-2., N.zeros((3,)), 2.,
+                                    1.e-12, max_iterations=2)
+        self.assertFalse(N.sometrue(converged))
+        self.assertTrue(N.alltrue(iterations == 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
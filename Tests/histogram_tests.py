@@ -0,0 +1,177 @@
+#
+# Tests for Scientific.Statistics.Histogram
+#
+
+import unittest
+from Scientific.Statistics.Histogram import Histogram, WeightedHistogram, \
+     HistogramND
+from Scientific import N
+import numpy as np
+import cPickle, operator
+
+
+class HistogramTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = N.sin(N.arange(5000)*0.7)
+        self.weights = N.cos(N.arange(5000)*0.3)**2
+
+    def reference(self, data, weights, nbins, range):
+        counts = N.zeros((nbins,), N.Float)
+        width = (range[1]-range[0])/nbins
+        for x, w in zip(data, weights):
+            if range[0] <= x <= range[1]:
+                counts[min(int((x-range[0])/width), nbins-1)] += w
+        return counts
+
+    def testCounts(self):
+        range = (-0.5, 0.75)
+        h = Histogram(self.data, 20, range)
+        reference = self.reference(self.data, N.ones(self.data.shape),
+                                   20, range)
+        self.assertEqual(list(h.getBinCounts()), list(reference))
+        h = Histogram(self.data, 20)
+        self.assertEqual(N.add.reduce(h.getBinCounts()), len(self.data))
+
+    def testBoundaries(self):
+        h = Histogram(N.array([0., 0.5, 1., 1., 1.5, -0.1]), 4, (0., 1.))
+        self.assertEqual(list(h.getBinCounts()), [1., 0., 1., 2.])
+
+    def testChunks(self):
+        h1 = Histogram(self.data, 30, (-1., 1.))
+        h2 = Histogram(self.data[:1], 30, (-1., 1.))
+        h2.addData(self.data[1:], chunk_size=7)
+        self.assertEqual(list(h1.getBinCounts()), list(h2.getBinCounts()))
+
+    def testWeighted(self):
+        range = (-0.5, 0.75)
+        h = WeightedHistogram(self.data, self.weights, 20, range)
+        reference = self.reference(self.data, self.weights, 20, range)
+        for x, y in zip(h.getBinCounts(), reference):
+            self.assertAlmostEqual(x, y, 10)
+        h2 = WeightedHistogram(self.data[:0], self.weights[:0], 20, range)
+        h2.addData(self.data, self.weights, chunk_size=99)
+        for x, y in zip(h2.getBinCounts(), reference):
+            self.assertAlmostEqual(x, y, 10)
+        self.assertRaises(ValueError, h.addData, self.data, self.weights[1:])
+
+
+class HistogramNDTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = N.array([N.sin(N.arange(5000)*0.7),
+                             N.cos(N.arange(5000)*1.3)**3]).T
+        self.weights = N.cos(N.arange(5000)*0.3)**2
+        self.edges = [N.array([-0.5, -0.2, 0., 0.1, 0.5, 0.9]),
+                      N.array([-1., -0.5, 0., 0.25, 1.])]
+
+    def testCounts(self):
+        h = HistogramND(self.edges, self.data)
+        reference = np.histogramdd(self.data, self.edges)[0]
+        counts = h.getBinCounts()
+        self.assertEqual(counts.dtype, N.Int)
+        self.assertEqual(counts.shape, (5, 4))
+        self.assertTrue(N.alltrue(N.ravel(counts == reference)))
+        all_counts = h.getBinCounts(outliers=True)
+        self.assertEqual(all_counts.shape, (7, 6))
+        self.assertEqual(all_counts.sum(), len(self.data))
+        self.assertEqual(h.getOutlierCount(),
+                         len(self.data)-counts.sum())
+        h2 = HistogramND(self.edges)
+        h2.addData(self.data, chunk_size=333)
+        self.assertTrue(N.alltrue(N.ravel(h2.getBinCounts(True)
+                                          == all_counts)))
+
+    def testWeighted(self):
+        h = HistogramND(self.edges, self.data, self.weights)
+        reference = np.histogramdd(self.data, self.edges,
+                                   weights=self.weights)[0]
+        counts = h.getBinCounts()
+        self.assertEqual(counts.dtype, N.Float)
+        self.assertTrue(np.allclose(counts, reference))
+        self.assertAlmostEqual(h.getBinCounts(True).sum(),
+                               N.add.reduce(self.weights), 10)
+        self.assertRaises(ValueError, HistogramND(self.edges).addData,
+                          self.data, self.weights)
+
+    def testOneDimensional(self):
+        h = HistogramND([[0., 1., 3.]], N.array([-1., 0., 1., 2.9, 3., 4.]))
+        self.assertEqual(list(h.getBinCounts()), [1, 3])
+        self.assertEqual(list(h.getBinCounts(outliers=True)), [1, 1, 3, 1])
+        self.assertEqual(list(h.getBinCenters()[0]), [0.5, 2.])
+        self.assertEqual(list(h.getDensity()), [0.25, 0.375])
+        self.assertRaises(ValueError, HistogramND, [[0., 1., 1.]])
+        self.assertRaises(ValueError, h.addData, N.zeros((3, 2)))
+
+
+class MergeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.chunks = [N.sin(N.arange(1000*i, 1000*(i+1))*0.7)
+                       for i in range(5)]
+        self.data = N.concatenate(self.chunks)
+
+    def testMerge(self):
+        h = Histogram(self.data, 20, (-1., 1.))
+        h1 = Histogram(self.chunks[0], 20, (-1., 1.))
+        h2 = h1.emptyCopy()
+        self.assertEqual(N.add.reduce(h2.getBinCounts()), 0.)
+        for chunk in self.chunks[1:]:
+            h2.addData(chunk)
+        total = h1 + h2
+        self.assertEqual(list(total.getBinCounts()), list(h.getBinCounts()))
+        self.assertEqual(N.add.reduce(h1.getBinCounts()), 1000.)
+        h1.merge(h2)
+        self.assertEqual(list(h1.getBinCounts()), list(h.getBinCounts()))
+        self.assertRaises(ValueError, h1.merge, Histogram(self.data, 20))
+        total = reduce(operator.add, [Histogram(chunk, 20, (-1., 1.))
+                                      for chunk in self.chunks])
+        self.assertEqual(list(total.getBinCounts()), list(h.getBinCounts()))
+
+    def testPickle(self):
+        h = Histogram(self.data, 20, (-1., 1.))
+        h2 = cPickle.loads(cPickle.dumps(h, 2))
+        self.assertEqual(h2.bin_width, h.bin_width)
+        self.assertEqual(list(h2.getBinIndices()), list(h.getBinIndices()))
+        self.assertEqual(list(h2.getBinCounts()), list(h.getBinCounts()))
+        h = HistogramND([[-1., 0., 1.], [0., 1.]],
+                        N.transpose([self.data, self.data**2]))
+        h2 = cPickle.loads(cPickle.dumps(h, 2))
+        self.assertEqual(h2.getBinCounts(True).tolist(),
+                         h.getBinCounts(True).tolist())
+        # Histogram pickled by the former implementation
+        pickled = (
+            '\x80\x02(cScientific.Statistics.Histogram\nHistogram\nq\x01oq'
+            '\x02}q\x03(U\x03maxq\x04G?\xf0\x00\x00\x00\x00\x00\x00U\x05arr'
+            'ayq\x05cnumpy.core.multiarray\n_reconstruct\nq\x06cnumpy\nndar'
+            'ray\nq\x07K\x00\x85U\x01b\x87Rq\x08(K\x01K\x04K\x02\x86cnumpy'
+            '\ndtype\nq\tU\x02f8K\x00K\x01\x87Rq\n(K\x03U\x01<NNNJ\xff\xff'
+            '\xff\xffJ\xff\xff\xff\xffK\x00tb\x89U@\x00\x00\x00\x00\x00\x00'
+            '\xc0?\x00\x00\x00\x00\x00\x00\xf0?\x00\x00\x00\x00\x00\x00\xd8'
+            '?\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xe4?'
+            '\x00\x00\x00\x00\x00\x00\xf0?\x00\x00\x00\x00\x00\x00\xec?\x00'
+            '\x00\x00\x00\x00\x00\x00@tbU\tbin_widthq\x0bG?\xd0\x00\x00\x00'
+            '\x00\x00\x00U\x03minq\x0cG\x00\x00\x00\x00\x00\x00\x00\x00ub.')
+        h = cPickle.loads(pickled)
+        self.assertEqual(list(h.getBinCounts()), [1., 0., 1., 2.])
+        self.assertEqual(h.bin_width, 0.25)
+
+    def testFromChunks(self):
+        h = Histogram(self.data, 20, (-1., 1.))
+        for workers in [None, 2]:
+            h2 = Histogram.fromChunks(iter(self.chunks), 20, (-1., 1.),
+                                      workers=workers)
+            self.assertEqual(list(h2.getBinCounts()), list(h.getBinCounts()))
+            h2 = HistogramND.fromChunks(iter(self.chunks), [[-1., 0., 1.]],
+                                        workers=workers)
+            self.assertEqual(list(h2.getBinCounts()),
+                             [N.int_sum(self.data < 0.),
+                              N.int_sum(self.data >= 0.)])
+        h2 = WeightedHistogram.fromChunks([(c, 2.*N.ones(c.shape))
+                                           for c in self.chunks],
+                                          20, (-1., 1.), workers=2)
+        self.assertEqual(list(h2.getBinCounts()), list(2.*h.getBinCounts()))
+
+
+if __name__ == '__main__':
+    unittest.main()
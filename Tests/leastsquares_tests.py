@@ -0,0 +1,107 @@
+#
+# Tests for Scientific.Functions.LeastSquares
+#
+
+import unittest
+from Scientific.Functions.LeastSquares import leastSquaresFit, \
+     batchedLeastSquaresFit, batchedPolynomialLeastSquaresFit
+from Scientific import N
+
+
+def model(param, t):
+    return param[0]*N.exp(-param[1]/t)
+
+def jacobian(param, t):
+    e = N.exp(-param[1]/t)
+    return N.transpose(N.array([e, -param[0]*e/t]))
+
+
+class LeastSquaresTest(unittest.TestCase):
+
+    t = N.array([100., 200., 300., 400.])
+    y = N.array([4.999e-8, 5.307e+2, 1.289e+6, 6.559e+7])
+    sigma = N.array([1., 2., 1., 0.5])
+    initial = (1e13, 4700.)
+
+    def compare(self, result, reference):
+        for p, p_ref in zip(result[0], reference[0]):
+            self.assertAlmostEqual(p/p_ref, 1., 10)
+        self.assertAlmostEqual(result[1]/reference[1], 1., 10)
+
+    def testArrayData(self):
+        reference = leastSquaresFit(model, self.initial,
+                                    zip(self.t, self.y, self.sigma))
+        self.assertAlmostEqual(reference[0][1], 4715.47, 2)
+        result = leastSquaresFit(model, self.initial,
+                                 (self.t, self.y, self.sigma),
+                                 vectorized=True)
+        self.compare(result, reference)
+        result = leastSquaresFit(model, self.initial,
+                                 (self.t, self.y, self.sigma),
+                                 vectorized=True, jacobian=jacobian)
+        self.compare(result, reference)
+
+    def testJacobianShape(self):
+        for bad in [lambda p, t: jacobian(p, t)[:1],
+                    lambda p, t: N.transpose(jacobian(p, t))]:
+            self.assertRaises(ValueError, leastSquaresFit, model,
+                              self.initial, (self.t, self.y, self.sigma),
+                              vectorized=True, jacobian=bad)
+        # Derivatives independent of the data point are broadcast
+        result = leastSquaresFit(lambda p, t: p[0]+0.*t, (1.,),
+                                 (self.t, 5.+0.*self.t), vectorized=True,
+                                 jacobian=lambda p, t: N.array([1.]))
+        self.assertAlmostEqual(result[0][0], 5., 6)
+
+    def testDefaultSigma(self):
+        reference = leastSquaresFit(model, self.initial,
+                                    zip(self.t, self.y))
+        result = leastSquaresFit(model, self.initial, (self.t, self.y),
+                                 vectorized=True)
+        self.compare(result, reference)
+
+
+class BatchedLeastSquaresTest(unittest.TestCase):
+
+    t = N.arange(30)*0.1
+    a = 1. + N.arange(12)/12.
+    b = 0.5 + (N.arange(12) % 5)*0.2
+    y = a[:, N.NewAxis]*N.exp(-b[:, N.NewAxis]*t) + 0.2 \
+        + 0.01*N.sin(N.reshape(N.arange(12*30), (12, 30)))
+
+    @staticmethod
+    def model(param, t):
+        return param[0]*N.exp(-param[1]*t) + param[2]
+
+    def testBatch(self):
+        p, chi_sq, converged = \
+           batchedLeastSquaresFit(self.model, (1., 1., 0.),
+                                  (self.t, self.y, 0.01))
+        self.assertTrue(N.alltrue(converged))
+        for k in range(len(self.y)):
+            ref = leastSquaresFit(self.model, (1., 1., 0.),
+                                  zip(self.t, self.y[k], 30*[0.01]))
+            for i in range(3):
+                self.assertAlmostEqual(p[k, i], ref[0][i], 10)
+            self.assertAlmostEqual(chi_sq[k]/ref[1], 1., 10)
+        t = N.resize(self.t, self.y.shape)
+        p_threads, chi_sq_threads, converged = \
+           batchedLeastSquaresFit(self.model, (1., 1., 0.),
+                                  (t, self.y, 0.01), nthreads=3)
+        self.assertTrue(N.alltrue(converged))
+        self.assertTrue(N.alltrue(N.fabs(N.ravel(p_threads-p)) < 1.e-12))
+        p, chi_sq, converged = \
+           batchedLeastSquaresFit(self.model, (1., 1., 0.),
+                                  (self.t, self.y, 0.01), max_iterations=1)
+        self.assertFalse(N.sometrue(converged))
+
+    def testPolynomial(self):
+        y = 2.*self.t[N.NewAxis, :] + N.arange(3.)[:, N.NewAxis]
+        p, chi_sq, converged = \
+           batchedPolynomialLeastSquaresFit((0., 0.), (self.t, y))
+        self.assertTrue(N.alltrue(N.fabs(N.ravel(p[:, 1]-2.)) < 1.e-4))
+        self.assertTrue(N.alltrue(N.fabs(p[:, 0]-N.arange(3.)) < 1.e-4))
+
+
+if __name__ == '__main__':
+    unittest.main()
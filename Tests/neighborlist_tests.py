@@ -0,0 +1,85 @@
+#
+# Tests for Scientific.Geometry.NeighborList
+#
+
+import unittest
+import numpy as np
+from Scientific.Geometry.NeighborList import NeighborList, unitCellVectors
+from Scientific.Geometry.Objects3D import SCLattice
+from Scientific.Geometry import Vector
+
+
+class NeighborListTest(unittest.TestCase):
+
+    """
+    Test NeighborList
+    """
+
+    def setUp(self):
+        np.random.seed(42)
+        self.points = 10.*np.random.random((300, 3))
+
+    def referencePairs(self, points, cutoff, box=None):
+        d = points[np.newaxis, :, :] - points[:, np.newaxis, :]
+        if box is not None:
+            f = np.dot(d, np.linalg.inv(box))
+            d = np.dot(f-np.around(f), box)
+        r = np.sqrt(np.add.reduce(d**2, axis=-1))
+        i, j = np.nonzero(r < cutoff)
+        return set([(a, b) for a, b in zip(i, j) if a < b])
+
+    def checkPairs(self, box):
+        nlist = NeighborList(self.points, 1.5, skin=0.4, cell=box)
+        pairs = [tuple(p) for p in nlist.pairs()]
+        self.assertEqual(len(pairs), len(set(pairs)))
+        self.assertEqual(set(pairs),
+                         self.referencePairs(self.points, 1.5, box))
+        moved = self.points + 0.2*(np.random.random(self.points.shape)-0.5)
+        self.assertFalse(nlist.update(moved))
+        pairs = [tuple(p) for p in nlist.pairs(1.2)]
+        self.assertEqual(set(pairs), self.referencePairs(moved, 1.2, box))
+        self.assertTrue(nlist.update(moved+1.))
+        pairs = [tuple(p) for p in nlist.pairs()]
+        self.assertEqual(set(pairs), self.referencePairs(moved+1., 1.5, box))
+
+    def testNonPeriodic(self):
+        self.checkPairs(None)
+
+    def testOrthorhombic(self):
+        self.checkPairs(np.diag([10., 10., 4.]))
+
+    def testTriclinic(self):
+        box = np.array([v.array
+                        for v in unitCellVectors(10., 11., 12.,
+                                                 80., 95., 100.)])
+        self.checkPairs(box)
+
+    def testRadiusQuery(self):
+        nlist = NeighborList(self.points, 1.5, cell=3*[10.])
+        center = Vector(9.5, 0.2, 5.)
+        d = self.points - center.array
+        d -= 10.*np.around(d/10.)
+        expected = np.nonzero(np.add.reduce(d**2, axis=1) < 2.**2)[0]
+        self.assertEqual(list(nlist.neighbors(center, 2.)), list(expected))
+
+    def testSpreadPoints(self):
+        # Memory use must not depend on the volume spanned by the points
+        points = np.array([[0., 0., 0.], [0.5, 0., 0.], [3000., 3000., 3000.],
+                           [3000., 3000., 3000.8], [-5000., 1.e6, 0.]])
+        nlist = NeighborList(points, 1.)
+        self.assertEqual(sorted([tuple(p) for p in nlist.pairs()]),
+                         [(0, 1), (2, 3)])
+        self.assertEqual(list(nlist.neighbors(points[2], 2.)), [2, 3])
+        self.assertEqual(list(nlist.neighbors(Vector(0.2, 0., 0.))), [0, 1])
+        self.assertEqual(len(nlist.neighbors(Vector(-1., -1., -1.))), 0)
+
+    def testLattice(self):
+        lattice = SCLattice(1., 5)
+        nlist = NeighborList(lattice.points, 1.01, cell=lattice)
+        self.assertEqual(len(nlist.pairs()), 3*len(lattice))
+        self.assertRaises(ValueError,
+                          lambda: NeighborList(lattice.points, 2.6,
+                                               cell=lattice))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#
+# Tests for the lattices in Scientific.Geometry.Objects3D
+#
+
+import unittest
+from Scientific.Geometry.Objects3D import RhombicLattice, BravaisLattice, \
+     SCLattice
+from Scientific.Geometry import Vector, isVector
+from Scientific import N
+
+
+class LatticeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cell = [Vector(0., 0., 0.), Vector(0.5, 0.5, 0.)]
+        self.vectors = (Vector(1., 0., 0.), Vector(0., 2., 0.),
+                        Vector(0.3, 0., 1.))
+        self.cells = (2, 3, 2)
+        self.base = Vector(0.1, -0.2, 0.3)
+
+    def referencePoints(self):
+        points = []
+        for i in range(self.cells[0]):
+            for j in range(self.cells[1]):
+                for k in range(self.cells[2]):
+                    for p in self.cell:
+                        points.append(self.base + p + i*self.vectors[0]
+                                      + j*self.vectors[1] + k*self.vectors[2])
+        return points
+
+    def testPoints(self):
+        lattice = RhombicLattice(self.cell, self.vectors, self.cells,
+                                 base=self.base)
+        reference = self.referencePoints()
+        self.assertEqual(lattice.points.shape, (len(reference), 3))
+        self.assertEqual(len(lattice), len(reference))
+        for i in range(len(reference)):
+            self.assertTrue(isVector(lattice[i]))
+            self.assertTrue((lattice[i]-reference[i]).length() < 1.e-12)
+            self.assertTrue(N.alltrue(abs(lattice.points[i]
+                                          - reference[i].array) < 1.e-12))
+        self.assertEqual(len(lattice[2:5]), 3)
+
+    def testElements(self):
+        lattice = SCLattice(0.5, 2)
+        self.assertFalse('elements' in lattice.__dict__)
+        self.assertEqual(len(lattice.elements), 8)
+        self.assertTrue(isVector(lattice.elements[7]))
+        lattice[0] = 'x'
+        self.assertEqual(lattice[0], 'x')
+        self.assertEqual(lattice.elements[0], 'x')
+
+    def testFunctions(self):
+        reference = self.referencePoints()
+        # Function accepting arrays: one call for all points
+        array_function = lambda p: N.sin(p[..., 0]) + p[..., 2]**2
+        lattice = RhombicLattice(self.cell, self.vectors, self.cells,
+                                 array_function, self.base, True)
+        self.assertTrue(isinstance(lattice.values, N.ArrayType))
+        for i in range(len(reference)):
+            self.assertAlmostEqual(lattice[i],
+                                   array_function(reference[i].array), 12)
+        per_point = RhombicLattice(self.cell, self.vectors, self.cells,
+                                   lambda p: N.sin(p[0]) + p[2]**2,
+                                   self.base)
+        self.assertEqual(type(per_point.values), type([]))
+        for i in range(len(reference)):
+            self.assertAlmostEqual(per_point[i], lattice[i], 12)
+        # By default, functions are called once per point with a Vector
+        # argument, also if they would accept an array.
+        for function in [lambda p: p.length(), lambda p: 2.*p,
+                         lambda p: N.exp(-p*p)]:
+            calls = []
+            def counting_function(p, function=function, calls=calls):
+                calls.append(p)
+                return function(p)
+            lattice = RhombicLattice(self.cell, self.vectors, self.cells,
+                                     counting_function, self.base)
+            self.assertEqual(len(calls), len(reference))
+            self.assertEqual(type(lattice.values), type([]))
+            for i in range(len(reference)):
+                difference = lattice[i] - function(reference[i])
+                if isVector(difference):
+                    difference = difference.length()
+                self.assertTrue(abs(difference) < 1.e-12)
+        lattice = SCLattice(1.0, 3, lambda p: N.exp(-p*p))
+        self.assertAlmostEqual(lattice[1], N.exp(-1.), 12)
+        self.assertRaises(ValueError, BravaisLattice, self.vectors,
+                          self.cells, lambda p: 1., None, True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#
+# Tests for Scientific.Physics.PhysicalQuantities
+#
+
+import unittest
+from Scientific.Physics.PhysicalQuantities import PhysicalQuantity, \
+     PhysicalQuantityArray, PhysicalUnit, _findUnit, _evalUnit, _unit_table
+from Scientific.Physics import PhysicalQuantities
+from Scientific import N
+import numpy as np
+
+
+class UnitParserTest(unittest.TestCase):
+
+    expressions = ['m', ' m/s ', 'kg*m**2/s**2', '1/s', '(5./9.)*K',
+                   'm**-1', '-2*m', '2*pi*rad', 'J/mol/K',
+                   'kcal/(mol*Ang**2)', '1e3*m', 'm**2**2', '7/2']
+
+    def testGrammar(self):
+        for expression in self.expressions:
+            expression = expression.strip()
+            unit = _evalUnit(expression)
+            reference = eval(expression, dict(_unit_table))
+            self.assertEqual(unit, reference)
+            if isinstance(reference, PhysicalUnit):
+                self.assertEqual(unit.name(), reference.name())
+
+    def testErrors(self):
+        for expression in ['m+', 'm s', '(m', 'm)', 'm$', '']:
+            self.assertRaises(SyntaxError, _evalUnit, expression)
+        self.assertRaises(NameError, _evalUnit, 'furlong/fortnight')
+        self.assertRaises(TypeError, _findUnit, 'pi')
+
+    def testInterning(self):
+        self.assertTrue(_findUnit('m/s') is _findUnit('m/s'))
+        self.assertTrue(_findUnit('m/s') is _findUnit('m / s'))
+        self.assertEqual(_findUnit('Hz'), _findUnit('1/s'))
+        self.assertEqual(hash(_findUnit('Hz')), hash(_findUnit('1/s')))
+        self.assertEqual(_findUnit('Hz').name(), 'Hz')
+        self.assertEqual(_findUnit('Bq').name(), 'Bq')
+        self.assertNotEqual(_findUnit('m'), _findUnit('s'))
+        self.assertNotEqual(_findUnit('K'), _findUnit('degC'))
+        cache = {_findUnit('J'): 1}
+        self.assertEqual(cache[_findUnit('kg*m**2/s**2')], 1)
+
+    def testCacheSize(self):
+        # Interned units count towards the bound of the unit cache
+        for i in range(3*PhysicalQuantities._unit_cache_size):
+            _findUnit('%d*m/s' % i)
+            self.assertTrue(len(PhysicalQuantities._unit_cache)
+                            <= PhysicalQuantities._unit_cache_size)
+        self.assertTrue(_findUnit('m/s') is _findUnit(' m/s'))
+
+    def testOffsetUnits(self):
+        # Units differing only by their offset are not equal (earlier
+        # versions considered K and degC equal)
+        kelvin = _findUnit('K')
+        celsius = _findUnit('degC')
+        self.assertEqual(kelvin.factor, celsius.factor)
+        self.assertNotEqual(kelvin, celsius)
+        self.assertFalse(kelvin == celsius)
+        self.assertEqual(celsius, PhysicalUnit('degC', 1.0,
+                                               celsius.powers, 273.15))
+        self.assertEqual(kelvin.conversionTupleTo(kelvin), (1., 0.))
+        self.assertEqual(celsius.conversionTupleTo(kelvin), (1., 273.15))
+        self.assertFalse(_findUnit('m') == _findUnit('s'))
+
+
+class ConversionTest(unittest.TestCase):
+
+    def testConversion(self):
+        for i in range(2):
+            q = PhysicalQuantity(1., 'km/h').inUnitsOf('m/s')
+            self.assertAlmostEqual(q.value, 1./3.6, 14)
+            q = PhysicalQuantity('100 degC').inUnitsOf('degF')
+            self.assertAlmostEqual(q.value, 212., 12)
+            self.assertEqual(_findUnit('km').conversionFactorTo(
+                                                      _findUnit('m')), 1000.)
+        self.assertRaises(TypeError, _findUnit('m').conversionFactorTo,
+                          _findUnit('s'))
+        self.assertRaises(TypeError, _findUnit('degC').conversionFactorTo,
+                          _findUnit('degF'))
+        q = PhysicalQuantity(3.5, 'h').inUnitsOf('h', 'min')
+        self.assertEqual([x.value for x in q], [3., 30.])
+
+
+class PhysicalQuantityArrayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.array([-40., 0., 25., 100.])
+        self.array = PhysicalQuantityArray(self.values, 'degC')
+
+    def testConversion(self):
+        converted = self.array.inUnitsOf('degF')
+        self.assertTrue(isinstance(converted, PhysicalQuantityArray))
+        for i in range(len(self.values)):
+            reference = PhysicalQuantity(self.values[i], 'degC')
+            self.assertAlmostEqual(converted.value[i],
+                                   reference.inUnitsOf('degF').value, 12)
+        base = PhysicalQuantityArray(self.values, 'km/h').inBaseUnits()
+        self.assertEqual(base.unit.name(), 'm/s')
+        self.assertTrue(np.allclose(base.value, self.values/3.6))
+        h, m = PhysicalQuantityArray([3.5, -1.25], 'h').inUnitsOf('h', 'min')
+        self.assertEqual(list(h.value), [3., -1.])
+        self.assertEqual(list(m.value), [30., -15.])
+
+    def testArithmetic(self):
+        d = PhysicalQuantityArray([1., 2., 3.], 'km')
+        t = PhysicalQuantityArray([0.5, 1., 1.5], 'h')
+        v = (d/t).inUnitsOf('m/s')
+        self.assertTrue(np.allclose(v.value, 1./1.8))
+        s = PhysicalQuantity(1., 'm') + d
+        self.assertTrue(isinstance(s, PhysicalQuantityArray))
+        self.assertTrue(np.allclose(s.value, [1001., 2001., 3001.]))
+        s = d + PhysicalQuantity(1., 'm')
+        self.assertTrue(np.allclose(s.value, [1.001, 2.001, 3.001]))
+        s = np.array([1., 2., 3.])*d
+        self.assertTrue(isinstance(s, PhysicalQuantityArray))
+        self.assertEqual(list(s.value), [1., 4., 9.])
+        ratio = d/PhysicalQuantity(1., 'm')
+        self.assertEqual(list(ratio), [1000., 2000., 3000.])
+        self.assertEqual(list((d*d).sqrt().value), [1., 2., 3.])
+        angles = PhysicalQuantityArray([0., 90.], 'deg')
+        self.assertTrue(np.allclose(angles.sin(), [0., 1.]))
+        self.assertRaises(TypeError, d.sin)
+        self.assertRaises(TypeError, d.__add__, t)
+
+    def testIndexing(self):
+        a = self.array
+        self.assertTrue(isinstance(a[1], PhysicalQuantity))
+        self.assertEqual(a[2].value, 25.)
+        self.assertEqual(len(a[1:]), 3)
+        self.assertEqual(a[1:].unit, a.unit)
+        a[0] = PhysicalQuantity(273.15, 'K')
+        self.assertAlmostEqual(a.value[0], 0., 12)
+        self.assertEqual([q.value for q in a], list(a.value))
+        self.assertEqual(list(a > PhysicalQuantity(10., 'degC')),
+                         [False, False, True, True])
+
+    def testReductions(self):
+        a = PhysicalQuantityArray(np.arange(6.).reshape((2, 3)), 'g')
+        self.assertEqual(a.sum().value, 15.)
+        self.assertEqual(a.sum().unit.name(), 'g')
+        self.assertEqual(list(a.sum(0).value), [3., 5., 7.])
+        self.assertEqual(a.mean().value, 2.5)
+        self.assertEqual(list(a.mean(1).value), [1., 4.])
+        self.assertEqual(a.min().value, 0.)
+        self.assertEqual(list(a.max(0).value), [3., 4., 5.])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#
+# Tests for Scientific.Functions.Polynomial
+#
+
+import unittest
+from Scientific.Functions.Polynomial import Polynomial, polynomialZeros, \
+     PolynomialFit, _fitPolynomial
+from Scientific import N
+
+
+class PolynomialTest(unittest.TestCase):
+
+    def testEvaluation(self):
+        p1 = Polynomial([1., 0.3, 1., -0.4])
+        x = -1.9
+        self.assertAlmostEqual(p1(x), ((-0.4*x+1.)*x+0.3)*x+1., 14)
+        p2 = Polynomial([[1., 0.3], [-0.2, 0.5]])
+        y = 0.3
+        self.assertAlmostEqual(p2(x, y), 1. + 0.3*y - 0.2*x + 0.5*x*y, 14)
+        x = N.array([-1.9, 0., 0.5, 2.])
+        y = N.array([[0.3], [1.2]])
+        values = p2(x, y)
+        self.assertEqual(values.shape, (2, 4))
+        for i in range(2):
+            for j in range(4):
+                self.assertAlmostEqual(values[i, j],
+                                       p2(float(x[j]), float(y[i, 0])), 14)
+
+    def testZeros(self):
+        coefficients = N.array([[1., 0.3, 1., -0.4],
+                                [-6., 11., -6., 1.]])
+        zeros = polynomialZeros(coefficients)
+        self.assertEqual(zeros.shape, (2, 3))
+        for k in range(2):
+            p = Polynomial(coefficients[k])
+            for z in zeros[k]:
+                self.assertTrue(abs(p(z)) < 1.e-12)
+        self.assertTrue(N.alltrue(N.fabs(N.sort(zeros[1].real)
+                                         - [1., 2., 3.]) < 1.e-12))
+
+    def testFit(self):
+        fit = _fitPolynomial(2, [1., 2., 3., 4.], [2., 4., 8., 14.])
+        self.assertTrue(N.alltrue(N.fabs(fit.coeff - [2., -1., 1.])
+                                  < 1.e-12))
+        points = [(x, y) for x in [0., 0.5, 1., 1.5] for y in [0., 1., 2.]]
+        values = [1. + 2.*x*y - y*y for x, y in points]
+        fit = _fitPolynomial((1, 2), points, values)
+        self.assertTrue(N.alltrue(N.fabs(N.ravel(fit.coeff -
+                                  [[1., 0., -1.], [0., 2., 0.]])) < 1.e-12))
+
+    def testRepeatedFit(self):
+        points = [(x, y) for x in [0., 0.5, 1., 1.5] for y in [0., 1., 2.]]
+        fit = PolynomialFit((1, 2), points)
+        for a in [1., -2.]:
+            values = [a + x - a*x*y*y for x, y in points]
+            coeff = fit(values).coeff
+            self.assertTrue(N.alltrue(N.fabs(N.ravel(coeff -
+                                      [[a, 0., 0.], [1., 0., -a]])) < 1.e-12))
+            self.assertTrue(N.alltrue(N.fabs(N.ravel(coeff -
+                _fitPolynomial((1, 2), points, values).coeff)) < 1.e-12))
+        self.assertRaises(ValueError, fit, [1., 2.])
+        self.assertRaises(ValueError, PolynomialFit, 3, [1., 2., 3.])
+        # Rank-deficient design matrix
+        fit = PolynomialFit(2, [1., 1., 1., 2.])
+        p = fit([1., 1., 1., 3.])
+        self.assertAlmostEqual(p(1.), 1., 10)
+        self.assertAlmostEqual(p(2.), 3., 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#
+# Tests for Scientific.Physics.Potential
+#
+
+import unittest
+from Scientific.Physics.Potential import ArrayPotential, \
+     PotentialWithGradientsAndForceConstants
+from Scientific.Geometry import Vector
+from Scientific import N
+
+
+def lennardJones(r1, r2, epsilon, sigma):
+    s6 = (sigma*sigma/((r2-r1)*(r2-r1)))**3
+    return 4.*epsilon*(s6*s6-s6)
+
+def angle(r1, r2, r3, k):
+    d1 = r1-r2
+    d2 = r3-r2
+    c = d1*d2/N.sqrt((d1*d1)*(d2*d2))
+    return k*(c+0.5)**2
+
+
+class ArrayPotentialTest(unittest.TestCase):
+
+    positions = N.array([[0., 0., 0.], [1.1, 0., 0.],
+                         [0., 1.2, 0.3], [0.9, 1.1, -0.2]])
+    pairs = N.array([[0, 1], [0, 2], [1, 2], [2, 3], [1, 3]])
+    angles = N.array([[0, 1, 2], [1, 2, 3]])
+
+    def reference(self, *r):
+        e = 0.
+        for i, j in self.pairs:
+            e = e + lennardJones(r[i], r[j], 1., 1.)
+        for (i, j, k), kf in zip(self.angles, [0.5, 2.]):
+            e = e + angle(r[i], r[j], r[k], kf)
+        return e
+
+    def testPotential(self):
+        ref = PotentialWithGradientsAndForceConstants(self.reference)
+        e_ref, g_ref, fc_ref = ref(*[Vector(x) for x in self.positions])
+        g_ref = N.array([g.array for g in g_ref])
+        for fc_type in [None, 'dense', 'sparse']:
+            lj = ArrayPotential(lennardJones, fc_type)
+            bend = ArrayPotential(angle, fc_type)
+            result1 = lj(self.positions, self.pairs, 1., 1.)
+            result2 = bend(self.positions, self.angles, N.array([0.5, 2.]))
+            self.assertAlmostEqual(result1[0]+result2[0], e_ref, 12)
+            diff = result1[1] + result2[1] - g_ref
+            self.assertTrue(N.alltrue(N.fabs(N.ravel(diff)) < 1.e-12))
+            if fc_type is None:
+                self.assertEqual(len(result1), 2)
+                continue
+            fc = []
+            for result in [result1, result2]:
+                if fc_type == 'dense':
+                    fc.append(result[2])
+                else:
+                    indices, blocks = result[2]
+                    dense = N.zeros(fc_ref.shape, N.Float)
+                    for (i, j), b in zip(indices, blocks):
+                        dense[3*i:3*i+3, 3*j:3*j+3] = b
+                    fc.append(dense)
+            diff = fc[0] + fc[1] - fc_ref
+            self.assertTrue(N.alltrue(N.fabs(N.ravel(diff)) < 1.e-8))
+
+
+if __name__ == '__main__':
+    unittest.main()
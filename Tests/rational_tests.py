@@ -0,0 +1,62 @@
+#
+# Tests for Scientific.Functions.Rational
+#
+
+import unittest
+from Scientific.Functions.Rational import RationalFunction, partialFractions
+from Scientific.Functions.Polynomial import Polynomial
+from Scientific import N
+
+
+class RationalFunctionTest(unittest.TestCase):
+
+    numerator = [1., 2., 0.5, 3.]
+    denominator = [2., -1., 1.]
+
+    def reference(self, z):
+        return Polynomial(self.numerator)(z) \
+               / Polynomial(self.denominator)(z)
+
+    def testEvaluation(self):
+        r = RationalFunction(self.numerator, self.denominator)
+        self.assertAlmostEqual(r(0.3), self.reference(0.3), 14)
+        z = N.exp(1j*N.arange(5.))*N.array([0.5, 1., 2., 10., 1.e3])
+        values = r(z)
+        for i in range(len(z)):
+            self.assertTrue(abs(values[i]/self.reference(z[i])-1.) < 1.e-13)
+        r = RationalFunction(N.ones((400,)), N.ones((401,)))
+        self.assertAlmostEqual(r(N.array([1.e3]))[0], 1.e-3, 15)
+
+    def testPartialFractions(self):
+        r = RationalFunction(self.numerator, self.denominator)
+        poly, poles, residues = r.partialFractions()
+        self.assertTrue(N.alltrue(N.fabs(poly.coeff - [3.5, 3.]) < 1.e-14))
+        for x in [0.7, -2., 3.+1.j]:
+            value = poly(x) + N.add.reduce(residues/(x-poles))
+            self.assertTrue(abs(value-r(x)) < 1.e-12)
+        numerators = N.array([[1., 2.], [0.5, -1.]])
+        denominators = N.array([[6., -5., 1.], [1., 0., 2.]])
+        poly, poles, residues = partialFractions(numerators, denominators)
+        self.assertEqual(residues.shape, (2, 2))
+        for k in range(2):
+            r = RationalFunction(numerators[k], denominators[k])
+            value = N.add.reduce(residues[k]/(0.3-poles[k]))
+            self.assertTrue(abs(value-r(0.3)) < 1.e-12)
+
+    def testOldPickle(self):
+        # Instances pickled by earlier versions lack the cached zeros
+        # and poles
+        import pickle
+        reference = RationalFunction(self.numerator, self.denominator)
+        r = RationalFunction(self.numerator, self.denominator)
+        del r._zeros
+        del r._poles
+        r = pickle.loads(pickle.dumps(r, 2))
+        self.assertEqual(list(r.zeros()), list(reference.zeros()))
+        self.assertEqual(list(r.poles()), list(reference.poles()))
+        self.assertEqual(list(r.partialFractions()[2]),
+                         list(reference.partialFractions()[2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
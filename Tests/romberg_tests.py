@@ -0,0 +1,95 @@
+#
+# Tests for Scientific.Functions.Romberg
+#
+
+import unittest
+from Scientific.Functions.Romberg import trapezoid, romberg, gaussKronrod
+from Scientific import N
+import numpy as np
+
+
+class RombergTest(unittest.TestCase):
+
+    interval = (0., N.pi/3.)
+    exact = N.log(2.)
+
+    def testVectorized(self):
+        self.assertEqual(trapezoid(N.tan, self.interval, 100),
+                         trapezoid(N.tan, self.interval, 100, True))
+        r = romberg(N.tan, self.interval)
+        self.assertAlmostEqual(r, self.exact, 10)
+        self.assertEqual(r, romberg(N.tan, self.interval, vectorized=True))
+
+    def testBatch(self):
+        upper = N.array([1., 2., 3.])
+        r = romberg(N.sin, (0., upper), vectorized=True)
+        for i in range(3):
+            self.assertAlmostEqual(r[i], 1.-N.cos(upper[i]), 7)
+        k = N.array([1., 2., 3.])[:, N.NewAxis]
+        r = romberg(lambda x: N.sin(k*x), (0., N.pi), vectorized=True)
+        for i in range(3):
+            self.assertAlmostEqual(r[i], [2., 0., 2./3.][i], 7)
+
+    def testSingularity(self):
+        # Endpoint singularities yield the same result as the scalar
+        # version instead of an endless refinement.
+        r = romberg(N.log, (0., 1.), vectorized=True)
+        self.assertEqual(r, romberg(N.log, (0., 1.)))
+        self.assertEqual(r, -np.inf)
+        r = romberg(N.log, (N.array([0., 1.]), 2.), vectorized=True)
+        self.assertEqual(r[0], -np.inf)
+        self.assertAlmostEqual(r[1], 2.*N.log(2.)-1., 7)
+        # Integrands that do not converge raise an error
+        self.assertRaises(ValueError, romberg,
+                          lambda x: N.sin(1./(x+1.e-300)), (0., 1.),
+                          1.e-12, True)
+
+
+class GaussKronrodTest(unittest.TestCase):
+
+    def testIntegrals(self):
+        for vectorized in [False, True]:
+            r, error = gaussKronrod(N.tan, (0., N.pi/3.),
+                                    vectorized=vectorized)
+            self.assertAlmostEqual(r, N.log(2.), 13)
+            self.assertTrue(error < 1.e-10)
+            r, error = gaussKronrod(lambda x: 1./N.sqrt(x), (0., 1.),
+                                    vectorized=vectorized)
+            self.assertAlmostEqual(r, 2., 9)
+
+    def testBatch(self):
+        upper = N.array([1., 2., 3.])
+        r, error = gaussKronrod(N.sin, (0., upper), vectorized=True)
+        self.assertEqual(r.shape, (3,))
+        for i in range(3):
+            self.assertAlmostEqual(r[i], 1.-N.cos(upper[i]), 12)
+        k = N.array([1., 2., 3.])
+        for vectorized in [False, True]:
+            r, error = gaussKronrod(lambda x, p: N.sin(p*x), (0., N.pi),
+                                    vectorized=vectorized, parameters=k)
+            for i in range(3):
+                self.assertAlmostEqual(r[i], [2., 0., 2./3.][i], 12)
+
+    def testNonFinite(self):
+        # A singular integrand must not prevent termination
+        save = np.seterr(divide='ignore', invalid='ignore')
+        try:
+            r, error = gaussKronrod(lambda x: 1./x, (-1., 1.),
+                                    vectorized=True)
+            self.assertFalse(np.isfinite(r) and np.isfinite(error))
+            r, error = gaussKronrod(lambda x: 1./x, (N.array([-1., 1.]), 2.),
+                                    vectorized=True)
+            self.assertFalse(error[0] < 1.e-10)
+            self.assertAlmostEqual(r[1], N.log(2.), 12)
+        finally:
+            np.seterr(**save)
+
+    def testMaxIntervals(self):
+        r, error = gaussKronrod(lambda x: N.sin(1./x), (1.e-8, 1.),
+                                accuracy=1.e-30, max_intervals=50,
+                                vectorized=True)
+        self.assertTrue(error > 1.e-30)
+
+
+if __name__ == '__main__':
+    unittest.main()
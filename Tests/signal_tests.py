@@ -7,7 +7,8 @@
 
 import unittest
 from Scientific.Signals.Models import AutoRegressiveModel, \
-                                      AveragedAutoRegressiveModel
+                                      AveragedAutoRegressiveModel, \
+                                      burgCoefficients
 from Scientific import N
 
 
@@ -44,6 +45,89 @@ class ARModelTest(unittest.TestCase):
         self.assertAlmostEqual(memory[3], 0.00425970654789, 10)
         self.assertAlmostEqual(model.predictStep(), 7.85423644046e-05, 10)
 
+    def testHighOrder(self):
+        t = N.arange(2000)
+        signal = N.sin(0.05*t) + N.cos(0.31*t) + 0.3*N.sin(1.7*t**1.05)
+        model = AutoRegressiveModel(40, signal, 0.1)
+        omega = N.arange(0., 30., 0.01)
+        spectrum = model.spectrum(omega).values
+        sum = 1.
+        for i in range(1, len(model.coeff)+1):
+            sum = sum - model.coeff[-i]*N.exp(-1j*i*model.delta_t*omega)
+        reference = 0.5*model.delta_t*model.sigsq/(sum*N.conjugate(sum)).real
+        self.assertTrue(N.alltrue(N.fabs(spectrum/reference-1.) < 1.e-8))
+        correlation = model.correlation(50).values
+        self.assertTrue(model.correlation(50).values is not correlation)
+        self.assertEqual(list(model.correlation(50).values),
+                         list(correlation))
+        self.assertAlmostEqual(correlation[0], model.variance, 2)
+        friction = model.frictionConstant()
+        mz = model.memoryFunctionZ()(1.)*model.delta_t
+        self.assertTrue(abs(mz/friction-1.) < 1.e-3)
+        memory = model.memoryFunction(20).values
+        self.assertEqual(list(model.memoryFunction(20).values), list(memory))
+
+    def testAveragedCache(self):
+        signal = N.exp(-N.arange(10))
+        model = AutoRegressiveModel(5, signal)
+        average = AveragedAutoRegressiveModel(5, 1.)
+        average.add(model)
+        c1 = average.correlation(3).values
+        p1 = average.poles()
+        average.add(AutoRegressiveModel(5, signal[::-1]))
+        self.assertTrue(average.poles() is not p1)
+        self.assertNotEqual(average.correlation(3).values[0], c1[0])
+        self.assertAlmostEqual(c1[0], model.correlation(3).values[0], 12)
+
+    def testOldPickle(self):
+        # Models pickled by earlier versions lack the cache attributes
+        import pickle
+        signal = N.exp(-N.arange(10))
+        reference = AutoRegressiveModel(5, signal)
+        model = AutoRegressiveModel(5, signal)
+        for attr in ['_cache', '_pole_factors', '_beta']:
+            delattr(model, attr)
+        model = pickle.loads(pickle.dumps(model, 2))
+        self.assertEqual(list(model.spectrum(N.array([0., 1.])).values),
+                         list(reference.spectrum(N.array([0., 1.])).values))
+        self.assertEqual(list(model.correlation(3).values),
+                         list(reference.correlation(3).values))
+        self.assertEqual(list(model.memoryFunction(4).values),
+                         list(reference.memoryFunction(4).values))
+        self.assertEqual(model.frictionConstant(),
+                         reference.frictionConstant())
+
+    def testBatchedBurg(self):
+        t = N.arange(300)
+        data = N.array([N.sin(0.1*(i+1)*t) + 0.2*N.cos((1.3+0.01*i)*t**1.1)
+                        for i in range(7)])
+        for options in [{}, {'nthreads': 3}, {'nthreads': 2, 'chunk_size': 5}]:
+            coeff, parcor, sigsq, variance = burgCoefficients(data, 6,
+                                                              **options)
+            self.assertEqual(coeff.shape, (7, 6))
+            self.assertEqual(parcor.shape, (7, 6))
+            for i in range(7):
+                model = AutoRegressiveModel(6, data[i])
+                self.assertTrue(N.alltrue(N.fabs(coeff[i]-model.coeff)
+                                          < 1.e-12))
+                self.assertTrue(N.alltrue(N.fabs(parcor[i]-model.parcor)
+                                          < 1.e-12))
+                self.assertAlmostEqual(sigsq[i], model.sigsq, 12)
+                self.assertAlmostEqual(variance[i], model.variance, 12)
+        complex_data = data[:2] + 1j*data[2:4]
+        coeff = burgCoefficients(complex_data, 3)[0]
+        model = AutoRegressiveModel(3, complex_data[1])
+        self.assertTrue(N.alltrue(abs(coeff[1]-model.coeff) < 1.e-12))
+        average = AveragedAutoRegressiveModel(6, 1.)
+        average.addSeries(data[:3])
+        reference = AveragedAutoRegressiveModel(6, 1.)
+        for i in range(3):
+            reference.add(AutoRegressiveModel(6, data[i]))
+        self.assertTrue(N.alltrue(N.fabs(average.coeff-reference.coeff)
+                                  < 1.e-12))
+        self.assertAlmostEqual(average.sigsq, reference.sigsq, 12)
+        self.assertRaises(ValueError, burgCoefficients, data[0], 3)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,106 @@
+#
+# Tests for Scientific.Statistics
+#
+
+import unittest
+from Scientific.Statistics.RunningStatistics import RunningStatistics, \
+     QuantileSketch
+from Scientific import Statistics
+from Scientific import N
+import cPickle
+
+
+class RunningStatisticsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.data = 10.+N.sin(N.arange(10000)*0.7)**3+0.1*N.arange(10000)**0.5
+
+    def chunks(self):
+        for i in range(0, len(self.data), 999):
+            yield self.data[i:i+999]
+
+    def assertClose(self, a, b):
+        self.assertTrue(abs(a-b) <= 1.e-10*max(abs(a), abs(b)), (a, b))
+
+    def testMoments(self):
+        s = RunningStatistics.fromChunks(self.chunks(), order=5)
+        self.assertEqual(s.count, len(self.data))
+        for name in ['mean', 'variance', 'standardDeviation',
+                     'skewness', 'kurtosis']:
+            self.assertClose(getattr(s, name)(),
+                             getattr(Statistics, name)(self.data))
+        self.assertClose(s.normalizedMoment(5),
+                         Statistics.normalizedMoment(self.data, 5))
+        mean = Statistics.mean(self.data)
+        self.assertClose(s.moment(3), Statistics.moment(self.data, 3, mean))
+        self.assertRaises(ValueError, s.moment, 6)
+        self.assertRaises(ValueError, RunningStatistics().mean)
+
+    def testMerge(self):
+        s1 = RunningStatistics(self.data[:10])
+        s2 = RunningStatistics(self.data[10:])
+        s = s1 + s2
+        self.assertEqual(s1.count, 10)
+        s1.merge(s2)
+        s1.merge(RunningStatistics())
+        for r in [s, s1, cPickle.loads(cPickle.dumps(s1, 2))]:
+            self.assertClose(r.variance(), Statistics.variance(self.data))
+            self.assertClose(r.kurtosis(), Statistics.kurtosis(self.data))
+        self.assertRaises(ValueError, s.merge, RunningStatistics(order=3))
+
+    def testColumns(self):
+        data = N.transpose(N.array([self.data, self.data**2, -self.data]))
+        s = RunningStatistics()
+        s.addData(data[:5000])
+        s.addData(data[5000:])
+        for i in range(3):
+            self.assertClose(s.mean()[i], Statistics.mean(data[:, i]))
+            self.assertClose(s.variance()[i], Statistics.variance(data[:, i]))
+            self.assertClose(s.skewness()[i], Statistics.skewness(data[:, i]))
+        self.assertRaises(ValueError, s.addData, self.data)
+
+
+class QuantileTest(unittest.TestCase):
+
+    def testMedian(self):
+        for n in [1, 2, 3, 10, 101]:
+            data = N.sin(N.arange(n)*0.7)
+            sorted = N.sort(data)
+            reference = (sorted[(n-1)/2]+sorted[n/2])/2.
+            self.assertEqual(Statistics.median(data), reference)
+            self.assertEqual(Statistics.quantile(data, 0.5), reference)
+            self.assertEqual(Statistics.quantile(data, 0.), sorted[0])
+            self.assertEqual(Statistics.quantile(data, 1.), sorted[-1])
+        self.assertEqual(Statistics.median([3, 1, 2]), 2.)
+        q = Statistics.quantile([4., 1., 3., 2., 5.], [0.1, 0.25, 0.9])
+        self.assertEqual([round(x, 12) for x in q], [1.4, 2., 4.6])
+        self.assertRaises(ValueError, Statistics.quantile, [1., 2.], 1.5)
+
+    def testMode(self):
+        self.assertEqual(Statistics.mode([1, 2, 2, 3, 3, 0]), 3)
+        self.assertEqual(Statistics.mode([-5, -5, 7]), -5)
+        self.assertEqual(Statistics.mode(N.array([0.5, 1.5, 1.5, 2.])), 1.5)
+        self.assertEqual(Statistics.mode([10**9, 1, 10**9]), 10**9)
+
+    def testSketch(self):
+        data = N.tan(N.arange(100000)*0.7)/(1.+N.arange(100000)%7)
+        q = N.array([0.001, 0.01, 0.1, 0.5, 0.9, 0.99, 0.999])
+        chunks = [data[i:i+1000] for i in range(0, len(data), 1000)]
+        sketch = QuantileSketch.fromChunks(chunks)
+        merged = reduce(lambda a, b: a+b,
+                        [QuantileSketch(data[i:i+10000])
+                         for i in range(0, len(data), 10000)])
+        for s in [sketch, merged]:
+            self.assertEqual(s.count, len(data))
+            self.assertTrue(len(s.means) < 200)
+            # Compare in terms of rank
+            ranks = N.searchsorted(N.sort(data), s.quantile(q))
+            self.assertTrue(N.alltrue(N.fabs(ranks/1.e5-q) < 0.005))
+            self.assertEqual(s.quantile(0.), N.minimum.reduce(data))
+            self.assertEqual(s.quantile(1.), N.maximum.reduce(data))
+        self.assertEqual(QuantileSketch([1., 2., 3., 4.]).median(), 2.5)
+        self.assertRaises(ValueError, QuantileSketch().median)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+#
+# Tests for Scientific.Geometry.TensorAnalysis
+#
+
+import unittest
+from Scientific.Geometry.TensorAnalysis import ScalarField, VectorField, \
+     streamFieldValues
+from Scientific import N
+
+
+class TensorFieldTest(unittest.TestCase):
+
+    def setUp(self):
+        self.axes = [N.arange(0., 1., 0.1), N.arange(0., 0.8, 0.1),
+                     N.arange(0., 1.2, 0.2)]
+        x = self.axes[0][:, N.NewAxis, N.NewAxis]
+        y = self.axes[1][N.NewAxis, :, N.NewAxis]
+        z = self.axes[2][N.NewAxis, N.NewAxis, :]
+        self.scalar = N.sin(3.*x)*N.cos(2.*y) + x*z**2
+        self.vector = N.zeros(self.scalar.shape + (3,), N.Float)
+        self.vector[..., 0] = x*y + 0.*z
+        self.vector[..., 1] = N.sin(y)*z + 0.*x
+        self.vector[..., 2] = x**2 + y*z
+        self.points = N.array([[0.05, 0.1, 0.3], [0.9, 0.7, 1.],
+                               [0.33, 0.25, 0.77], [0., 0., 0.]])
+
+    def assertArraysClose(self, a, b, tolerance=1.e-12):
+        self.assertEqual(N.shape(a), N.shape(b))
+        self.assertTrue(N.maximum.reduce(N.ravel(abs(a-b))) < tolerance)
+
+    def testValuesAt(self):
+        field = ScalarField(self.axes, self.scalar)
+        values = field.valuesAt(self.points)
+        self.assertArraysClose(values, N.array([field(p)
+                                                for p in self.points]))
+        field = VectorField(self.axes, self.vector)
+        values = field.valuesAt(self.points)
+        self.assertArraysClose(values, N.array([field(p).array
+                                                for p in self.points]))
+        self.assertRaises(ValueError, field.valuesAt, N.array([[2., 0., 0.]]))
+
+    def testGradient(self):
+        for period in [(None, None, None), (1., None, 1.2)]:
+            field = ScalarField(self.axes, self.scalar, period=period)
+            axes, gradient = field.gradientValues()
+            derivatives = [field.derivative(i) for i in range(3)]
+            # The derivatives along each axis are defined on larger
+            # grids; compare at the common grid points.
+            for i in range(3):
+                reference = derivatives[i].valuesAt(
+                    N.array([[x, y, z] for x in axes[0] for y in axes[1]
+                             for z in axes[2]]))
+                self.assertArraysClose(N.ravel(gradient[..., i]), reference)
+            grad = field.gradient()
+            for i in range(3):
+                self.assertArraysClose(grad.values[..., i], gradient[..., i])
+            vector = VectorField(self.axes, self.vector, period=period)
+            div = vector.divergence()
+            axes, gradient = vector.gradientValues()
+            self.assertArraysClose(div.values, gradient[..., 0, 0]
+                                   + gradient[..., 1, 1]
+                                   + gradient[..., 2, 2])
+
+    def testPeriodicDerivative(self):
+        h = 0.05
+        axis = N.arange(0., 1., h)
+        x = axis[:, N.NewAxis, N.NewAxis]
+        values = N.sin(2.*N.pi*x) + N.zeros((1, 4, 4), N.Float)
+        field = ScalarField([axis, N.arange(4.), N.arange(4.)], values,
+                            period=(1., None, None))
+        # Central differences of sin(2 pi x) with step h
+        reference = N.cos(2.*N.pi*axis)*N.sin(2.*N.pi*h)/h
+        self.assertArraysClose(field.derivative(0).values[:, 1, 1],
+                               reference)
+        self.assertArraysClose(field.gradient().values[:, 0, 0, 0],
+                               reference)
+
+    def testModifiedValues(self):
+        field = ScalarField(self.axes, self.scalar.copy())
+        gradient = field.gradientValues()[1].copy()
+        field.values[...] = 2.*field.values
+        self.assertArraysClose(field.gradientValues()[1], 2.*gradient)
+
+    def frames(self):
+        for i in range(4):
+            yield self.points*(1.-0.05*i) + 0.01*i
+
+    def testStreamValues(self):
+        field = VectorField(self.axes, self.vector)
+        results = list(field.streamValues(self.frames(), copy=True))
+        self.assertEqual(len(results), 4)
+        for points, values in zip(self.frames(), results):
+            self.assertArraysClose(values, N.array([field(p).array
+                                                    for p in points]))
+        # Without copy, the same array is reused for all frames
+        arrays = [values for values in field.streamValues(self.frames())]
+        self.assertTrue(arrays[0] is arrays[-1])
+        self.assertArraysClose(arrays[-1], results[-1])
+
+    def testStreamFieldValues(self):
+        scalar = ScalarField(self.axes, self.scalar, default=-1.)
+        vector = VectorField(self.axes, self.vector)
+        frames = [self.points, N.array([[0.5, 0.5, 0.5], [2., 0., 0.]])]
+        results = list(streamFieldValues([scalar], frames, copy=True))
+        self.assertArraysClose(results[1][0],
+                               N.array([scalar(p) for p in frames[1]]))
+        self.assertEqual(results[1][0][1], -1.)
+        for points, (s, v) in zip(frames[:1],
+                                  streamFieldValues([scalar, vector],
+                                                    frames[:1], True)):
+            self.assertArraysClose(s, N.array([scalar(p) for p in points]))
+            self.assertArraysClose(v, N.array([vector(p).array
+                                               for p in points]))
+        self.assertRaises(ValueError, list,
+                          streamFieldValues([vector], frames))
+        other = ScalarField([a+1. for a in self.axes], self.scalar)
+        self.assertRaises(ValueError, list,
+                          streamFieldValues([scalar, other], frames))
+
+
+if __name__ == '__main__':
+    unittest.main()